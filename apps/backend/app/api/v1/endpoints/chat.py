@@ -1,17 +1,230 @@
-import json
 import time
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException
+from contextlib import aclosing
+from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import StreamingResponse
-from app.schemas.chat import ChatRequest, ChatResponse, ModelName
-from app.services.llm_service import AzureOpenAIService, DeepSeekService
+from app.core.config import settings
+from app.core import sse
+from app.core.metrics import registry
+from app.core.sse import cancel_on_disconnect, coalesce
+from app.schemas.chat import (
+    ChatRequest,
+    ChatResponse,
+    ConversationResponse,
+    DualChatRequest,
+    DualChatResponse,
+    ModelName,
+)
+from app.services.cache import CachedLLMService, ResponseCache
+from app.services.coalescing import CoalescingLLMService, SingleFlight
+from app.services.concurrency import AdaptiveLimiter, ConcurrencyLimitedLLMService
+from app.services.conversation_sqlite import SQLiteConversationStore
+from app.services.conversations import Conversation, ConversationStore, MemoryConversationStore, add_context
+from app.services.hedging import HedgedLLMService, HedgePolicy
+from app.services.http_client import create_http_client, prewarm
+from app.services.llm_service import STREAM_ERROR_PREFIX, AzureOpenAIService, BaseLLMService, DeepSeekService
+from app.services.rate_limit import DeploymentRateLimiter, RateLimitedLLMService
+from app.services.semantic_cache import SemanticCache, SemanticCachedLLMService
+from app.services.stream_hub import FanOutLLMService, StreamHub
+from app.services.stream_resume import ResumableStreams
+from app.services.timing import StreamTimer, timing_registry
+from app.services.tokenizer import get_tokenizer
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-azure_service = AzureOpenAIService()
-deepseek_service = DeepSeekService()
+azure_provider = AzureOpenAIService()
+deepseek_provider = DeepSeekService()
+_http_clients = []
+
+
+async def open_providers() -> None:
+    """Give each provider its own pooled HTTP client and pre-warm it; called on startup."""
+    # Load BPE vocabularies off the event loop now rather than on the first request.
+    warmups = [asyncio.to_thread(get_tokenizer, model) for model in ModelName]
+    for provider in (azure_provider, deepseek_provider):
+        http_client = create_http_client()
+        _http_clients.append(http_client)
+        provider.open(http_client)
+        if settings.HTTP_PREWARM and provider.client is not None:
+            warmups.append(prewarm(http_client, provider.endpoint))
+    await asyncio.gather(*warmups)
+
+
+async def close_providers() -> None:
+    for provider in (azure_provider, deepseek_provider):
+        await provider.aclose()
+    for http_client in _http_clients:
+        await http_client.aclose()
+    _http_clients.clear()
+
+
+def _limiter(name: str) -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        name,
+        initial_limit=settings.CONCURRENCY_INITIAL_LIMIT,
+        min_limit=settings.CONCURRENCY_MIN_LIMIT,
+        max_limit=settings.CONCURRENCY_MAX_LIMIT,
+        max_queue=settings.CONCURRENCY_MAX_QUEUE,
+        queue_timeout=settings.CONCURRENCY_QUEUE_TIMEOUT_SECONDS,
+        latency_tolerance=settings.CONCURRENCY_LATENCY_TOLERANCE,
+        backoff=settings.CONCURRENCY_BACKOFF,
+    )
+
+
+concurrency_limiters = {
+    ModelName.GPT4: _limiter("Azure AI Foundry"),
+    ModelName.DEEPSEEK: _limiter("DeepSeek"),
+}
+azure_upstream: BaseLLMService = azure_provider
+deepseek_upstream: BaseLLMService = deepseek_provider
+if settings.CONCURRENCY_LIMIT_ENABLED:
+    azure_upstream = ConcurrencyLimitedLLMService(azure_provider, concurrency_limiters[ModelName.GPT4])
+    deepseek_upstream = ConcurrencyLimitedLLMService(deepseek_provider, concurrency_limiters[ModelName.DEEPSEEK])
+
+rate_limiters = {
+    ModelName.GPT4: DeploymentRateLimiter(
+        "Azure AI Foundry",
+        tpm=settings.AZURE_TPM,
+        rpm=settings.AZURE_RPM,
+        max_wait=settings.RATE_LIMIT_MAX_WAIT_SECONDS,
+        max_queue=settings.RATE_LIMIT_MAX_QUEUE,
+    ),
+    ModelName.DEEPSEEK: DeploymentRateLimiter(
+        "DeepSeek",
+        tpm=settings.DEEPSEEK_TPM,
+        rpm=settings.DEEPSEEK_RPM,
+        max_wait=settings.RATE_LIMIT_MAX_WAIT_SECONDS,
+        max_queue=settings.RATE_LIMIT_MAX_QUEUE,
+    ),
+}
+if settings.AZURE_TPM or settings.AZURE_RPM:
+    azure_upstream = RateLimitedLLMService(
+        azure_upstream, rate_limiters[ModelName.GPT4], settings.RATE_LIMIT_EXPECTED_COMPLETION_TOKENS
+    )
+if settings.DEEPSEEK_TPM or settings.DEEPSEEK_RPM:
+    deepseek_upstream = RateLimitedLLMService(
+        deepseek_upstream, rate_limiters[ModelName.DEEPSEEK], settings.RATE_LIMIT_EXPECTED_COMPLETION_TOKENS
+    )
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
+semantic_cache = None
+if settings.SEMANTIC_CACHE_ENABLED:
+    semantic_cache = SemanticCache(
+        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        dim=settings.SEMANTIC_CACHE_DIM,
+        max_chars=settings.SEMANTIC_CACHE_MAX_CHARS,
+    )
+single_flight = SingleFlight()
+stream_hub = StreamHub(queue_size=settings.STREAM_FANOUT_QUEUE_SIZE)
+resumable_streams = ResumableStreams(
+    max_streams=settings.STREAM_RESUME_MAX_STREAMS,
+    max_bytes=settings.STREAM_RESUME_MAX_BYTES,
+    max_stream_bytes=settings.STREAM_RESUME_MAX_STREAM_BYTES,
+    ttl_seconds=settings.STREAM_RESUME_TTL_SECONDS,
+    idle_timeout=settings.STREAM_RESUME_IDLE_SECONDS,
+)
+
+
+def _conversation_store() -> ConversationStore:
+    memory = MemoryConversationStore(
+        max_bytes=settings.CONVERSATION_MAX_BYTES,
+        max_turns=settings.CONVERSATION_MAX_TURNS,
+        ttl_seconds=settings.CONVERSATION_TTL_SECONDS,
+    )
+    if settings.CONVERSATION_STORE == "sqlite":
+        return SQLiteConversationStore(
+            settings.CONVERSATION_SQLITE_PATH,
+            cache=memory,
+            ttl_seconds=settings.CONVERSATION_TTL_SECONDS,
+            batch_size=settings.CONVERSATION_WRITE_BATCH_SIZE,
+        )
+    return memory
+
+
+conversations = _conversation_store()
+context_budgets = {
+    ModelName.GPT4: settings.AZURE_CONTEXT_BUDGET_TOKENS,
+    ModelName.DEEPSEEK: settings.DEEPSEEK_CONTEXT_BUDGET_TOKENS,
+}
+hedge_policy = HedgePolicy(
+    percentile=settings.HEDGING_PERCENTILE,
+    min_delay=settings.HEDGING_MIN_DELAY_SECONDS,
+    default_delay=settings.HEDGING_DEFAULT_DELAY_SECONDS,
+    budget_ratio=settings.HEDGING_BUDGET_RATIO,
+)
+
+
+def _build_service(service: BaseLLMService, backup: BaseLLMService) -> BaseLLMService:
+    """Wrap a provider with the shared hedging, coalescing, fan-out and caching layers."""
+    if settings.HEDGING_ENABLED:
+        service = HedgedLLMService(service, backup, hedge_policy)
+    if settings.COALESCE_ENABLED:
+        service = CoalescingLLMService(service, single_flight, settings.COALESCE_WAIT_TIMEOUT_SECONDS)
+    if settings.STREAM_FANOUT_ENABLED:
+        service = FanOutLLMService(service, stream_hub)
+    if semantic_cache is not None:
+        service = SemanticCachedLLMService(service, semantic_cache)
+    if settings.RESPONSE_CACHE_ENABLED:
+        service = CachedLLMService(service, response_cache)
+    return service
+
+
+azure_service = _build_service(azure_upstream, backup=deepseek_upstream)
+deepseek_service = _build_service(deepseek_upstream, backup=azure_upstream)
+
+
+@registry.collector
+def _collect_metrics():
+    """Expose the service layers' own counters at scrape time."""
+    providers = {ModelName.GPT4: azure_provider, ModelName.DEEPSEEK: deepseek_provider}
+    yield "response_cache_requests_total", "counter", "Response cache lookups by result.", [
+        ({"result": "hit"}, response_cache.hits),
+        ({"result": "miss"}, response_cache.misses),
+    ]
+    yield "response_cache_bytes", "gauge", "Bytes held by the response cache.", [({}, response_cache.size_bytes)]
+    if semantic_cache is not None:
+        yield "semantic_cache_requests_total", "counter", "Semantic cache lookups by result.", [
+            ({"result": "hit"}, semantic_cache.hits),
+            ({"result": "miss"}, semantic_cache.misses),
+        ]
+        yield "semantic_cache_entries", "gauge", "Entries held by the semantic cache.", [({}, len(semantic_cache))]
+    yield "concurrency_limit", "gauge", "Current adaptive concurrency limit per model.", [
+        ({"model": model.value}, int(limiter.limit)) for model, limiter in concurrency_limiters.items()
+    ]
+    yield "concurrency_in_flight", "gauge", "Upstream calls in flight per model.", [
+        ({"model": model.value}, limiter.in_flight) for model, limiter in concurrency_limiters.items()
+    ]
+    yield "concurrency_queued", "gauge", "Calls waiting for a concurrency slot per model.", [
+        ({"model": model.value}, limiter.queued) for model, limiter in concurrency_limiters.items()
+    ]
+    yield "concurrency_rejected_total", "counter", "Calls rejected by the concurrency limiter per model.", [
+        ({"model": model.value}, limiter.rejected) for model, limiter in concurrency_limiters.items()
+    ]
+    yield "rate_limit_shed_total", "counter", "Calls shed locally by the TPM/RPM limiter per model.", [
+        ({"model": model.value}, limiter.shed) for model, limiter in rate_limiters.items()
+    ]
+    yield "upstream_streams_cancelled_total", "counter", "Upstream streams closed early by a client.", [
+        ({"model": model.value}, provider.stream_stats.cancelled) for model, provider in providers.items()
+    ]
+    yield "upstream_tokens_saved_total", "counter", "Estimated completion tokens saved by early stream close.", [
+        ({"model": model.value}, provider.stream_stats.tokens_saved) for model, provider in providers.items()
+    ]
+    yield "hedges_fired_total", "counter", "Backup requests fired by hedging.", [({}, hedge_policy.hedges_fired)]
+    yield "hedges_won_total", "counter", "Hedged requests answered first by the backup.", [
+        ({}, hedge_policy.hedges_won)
+    ]
+    yield "resumable_streams", "gauge", "Streams held for Last-Event-ID resumption.", [({}, len(resumable_streams))]
+    yield "conversations", "gauge", "Server-side conversations held in memory.", [({}, len(conversations))]
 
 
 def _get_service(model: ModelName):
@@ -20,41 +233,253 @@ def _get_service(model: ModelName):
     return deepseek_service
 
 
+async def _conversation(conversation_id: Optional[str]) -> Optional[Conversation]:
+    """Look up a request's conversation; 404 when it was never created or has expired."""
+    if conversation_id is None:
+        return None
+    conversation = await conversations.get(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found or expired. Please start a new one.")
+    return conversation
+
+
+def _record(conversation: Optional[Conversation], message: str, replies: Dict[ModelName, str]) -> None:
+    """Append a finished exchange; nothing is stored when every model failed."""
+    if conversation is None or not replies:
+        return
+    conversations.append(conversation, "user", message)
+    for model, reply in replies.items():
+        conversations.append(conversation, "assistant", reply, model=model.value)
+
+
+def _finished_reply(chunks: List[str]) -> Optional[str]:
+    """The streamed reply, or None when it is empty or ended on an in-band provider error."""
+    reply = "".join(chunks)
+    # Searched in the joined text: SSE coalescing may have merged the error into a content chunk.
+    if not reply or STREAM_ERROR_PREFIX in reply:
+        return None
+    return reply
+
+
+async def _timed(chunks, timer: StreamTimer):
+    async with aclosing(chunks) as stream:
+        async for chunk in stream:
+            timer.token()
+            yield chunk
+
+
+def _deltas(service: BaseLLMService, request: ChatRequest, timer: StreamTimer):
+    """The service's token stream, timed per delta and coalesced when SSE_COALESCE_WINDOW_MS is set."""
+    return coalesce(
+        _timed(service.get_streaming_completion(request), timer),
+        window=settings.SSE_COALESCE_WINDOW_MS / 1000,
+        max_bytes=settings.SSE_COALESCE_MAX_BYTES,
+    )
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
 @router.post("/completions", response_model=ChatResponse)
-async def chat_completion(request: ChatRequest):
+async def chat_completion(request: ChatRequest, response: Response):
     service = _get_service(request.model)
-    return await service.get_completion(request)
+    conversation = await _conversation(request.conversation_id)
+    if conversation is not None:
+        add_context(request, conversation, context_budgets[request.model])
+    result = await service.get_completion(request)
+    response.headers["X-Cache"] = "HIT" if result.get("cached") else "MISS"
+    if conversation is not None:
+        _record(conversation, request.message, {request.model: result["reply"]})
+        result = {**result, "conversation_id": conversation.id}
+    return result
 
 
 @router.post("/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """Stream one model's answer, replaying cached replies; a reconnect with Last-Event-ID replays missed frames."""
     service = _get_service(request.model)
+    conversation = await _conversation(request.conversation_id)
+    if conversation is not None:
+        add_context(request, conversation, context_budgets[request.model])
 
     async def event_generator():
-        start_time = time.time()
+        timer = StreamTimer()
+        delta = sse.DeltaEncoder()
+        reply = []
         try:
-            async for chunk in service.get_streaming_completion(request):
-                # SSE format: data: {json}\n\n
-                payload = json.dumps({"type": "delta", "content": chunk})
-                yield f"data: {payload}\n\n"
+            # A cached reply is replayed without going upstream; a fresh one is cached once it completes.
+            cached = service.get_cached_completion(request)
+            if cached is not None:
+                chunks = _timed(sse.replay(cached["reply"], settings.CACHE_REPLAY_WORDS_PER_SECOND), timer)
+            else:
+                chunks = _deltas(service, request, timer)
+            async with aclosing(chunks) as stream:
+                async for chunk in stream:
+                    reply.append(chunk)
+                    # SSE format: data: {json}\n\n
+                    yield delta(chunk)
 
-            latency = time.time() - start_time
-            done_payload = json.dumps({
+            timings = timer.summary()
+            if cached is None:
+                timing_registry.record(request.model.value, "client", timings)
+            done = {
                 "type": "done",
-                "latency": round(latency, 3),
+                "latency": timings["total"],
                 "model": request.model.value,
-            })
-            yield f"data: {done_payload}\n\n"
+                "timings": timings,
+                "cached": cached is not None,
+            }
+            if conversation is not None:
+                finished = _finished_reply(reply)
+                _record(conversation, request.message, {request.model: finished} if finished is not None else {})
+                done["conversation_id"] = conversation.id
+            yield sse.encode(done)
+        except HTTPException as e:
+            yield sse.encode({"type": "error", "content": e.detail})
         except Exception:
             logger.exception("Stream error for model %s", request.model.value)
-            error_payload = json.dumps({"type": "error", "content": "An error occurred during streaming."})
-            yield f"data: {error_payload}\n\n"
+            yield sse.encode({"type": "error", "content": "An error occurred during streaming."})
+
+    if not settings.STREAM_RESUME_ENABLED:
+        frames = event_generator()
+        headers = SSE_HEADERS
+    else:
+        resumed = resumable_streams.find(http_request.headers.get("last-event-id"))
+        if resumed is not None:
+            stream, after = resumed
+            logger.info("Resuming stream %s after frame %d", stream.id, after)
+        else:
+            stream, after = resumable_streams.start(event_generator()), 0
+        frames = resumable_streams.attach(stream, after)
+        headers = {**SSE_HEADERS, "X-Stream-Id": stream.id}
+
+    return StreamingResponse(
+        cancel_on_disconnect(http_request.receive, frames),
+        media_type="text/event-stream",
+        headers=headers,
+    )
+
+
+def _dual_requests(
+    request: DualChatRequest, conversation: Optional[Conversation], models
+) -> Dict[ModelName, ChatRequest]:
+    """One request per model, each with the conversation history that model has seen."""
+    requests = {model: request.for_model(model) for model in models}
+    if conversation is not None:
+        for model, model_request in requests.items():
+            add_context(model_request, conversation, context_budgets[model])
+    return requests
+
+
+@router.post("/dual", response_model=DualChatResponse)
+async def dual_completion(request: DualChatRequest):
+    """Query both models concurrently; the request takes as long as the slower one."""
+    models = (ModelName.GPT4, ModelName.DEEPSEEK)
+    conversation = await _conversation(request.conversation_id)
+    requests = _dual_requests(request, conversation, models)
+    start_time = time.perf_counter()
+    results = await asyncio.gather(
+        *(_get_service(model).get_completion(requests[model]) for model in models),
+        return_exceptions=True,
+    )
+
+    response = DualChatResponse(latency=round(time.perf_counter() - start_time, 3))
+    for model, result in zip(models, results):
+        if isinstance(result, HTTPException):
+            response.errors[model] = result.detail
+        elif isinstance(result, BaseException):
+            logger.error("Dual completion failed for model %s: %r", model.value, result)
+            response.errors[model] = "An unexpected error occurred."
+        else:
+            response.responses[model] = ChatResponse(**result)
+
+    if not response.responses:
+        raise HTTPException(status_code=502, detail="Both models failed. Please try again.")
+    if conversation is not None:
+        _record(conversation, request.message, {model: result.reply for model, result in response.responses.items()})
+        for result in response.responses.values():
+            result.conversation_id = conversation.id
+    return response
+
+
+@router.post("/dual/stream")
+async def dual_stream(request: DualChatRequest, http_request: Request):
+    """Multiplex both models' token streams into one SSE channel, tagging each frame with its model."""
+    models = (ModelName.GPT4, ModelName.DEEPSEEK)
+    conversation = await _conversation(request.conversation_id)
+    requests = _dual_requests(request, conversation, models)
+    replies: Dict[ModelName, str] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+
+    # Queue items are (frame, is_final) so the consumer knows when a model has finished.
+    async def pump(model: ModelName) -> None:
+        timer = StreamTimer()
+        delta = sse.DeltaEncoder(model=model.value)
+        reply = []
+        try:
+            async with aclosing(_deltas(_get_service(model), requests[model], timer)) as stream:
+                async for chunk in stream:
+                    reply.append(chunk)
+                    await queue.put((delta(chunk), False))
+            timings = timer.summary()
+            timing_registry.record(model.value, "client", timings)
+            finished = _finished_reply(reply)
+            if finished is not None:
+                replies[model] = finished
+            done = {"type": "done", "model": model.value, "latency": timings["total"], "timings": timings}
+            if conversation is not None:
+                done["conversation_id"] = conversation.id
+            await queue.put((sse.encode(done), True))
+        except HTTPException as e:
+            await queue.put((sse.encode({"type": "error", "model": model.value, "content": e.detail}), True))
+        except Exception:
+            logger.exception("Dual stream error for model %s", model.value)
+            error = {"type": "error", "model": model.value, "content": "An error occurred during streaming."}
+            await queue.put((sse.encode(error), True))
+
+    async def event_generator():
+        start_time = time.perf_counter()
+        tasks = [asyncio.ensure_future(pump(model)) for model in models]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                frame, final = await queue.get()
+                if final:
+                    remaining -= 1
+                yield frame
+            _record(conversation, request.message, replies)
+            yield sse.encode({"type": "end", "latency": round(time.perf_counter() - start_time, 3)})
+        finally:
+            for task in tasks:
+                task.cancel()
 
     return StreamingResponse(
-        event_generator(),
+        cancel_on_disconnect(http_request.receive, event_generator()),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-        },
+        headers=SSE_HEADERS,
+    )
+
+
+@router.post("/conversations", response_model=ConversationResponse, status_code=201)
+async def create_conversation():
+    """Start a server-side conversation; send its id with each message instead of the full history."""
+    conversation = await conversations.create()
+    return ConversationResponse(conversation_id=conversation.id)
+
+
+@router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
+async def get_conversation(conversation_id: str):
+    conversation = await _conversation(conversation_id)
+    return ConversationResponse(
+        conversation_id=conversation.id, turns=[turn.to_dict() for turn in conversation.turns]
     )
+
+
+@router.delete("/conversations/{conversation_id}", status_code=204)
+async def delete_conversation(conversation_id: str):
+    if not await conversations.delete(conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found or expired. Please start a new one.")
+    return Response(status_code=204)
@@ -0,0 +1,38 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.core.profiler import ProfilerBusy, profiler
+
+router = APIRouter()
+
+
+def require_debug_enabled() -> None:
+    if not settings.DEBUG_ENDPOINTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Allow only requests carrying the configured ADMIN_TOKEN; without one configured, nobody is admin."""
+    if not settings.PROFILER_ENABLED or not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+
+@router.get("/loop", dependencies=[Depends(require_debug_enabled)])
+async def loop_stalls():
+    """Current event-loop lag and the most recent stalls, each with the stacks sampled while it was blocked."""
+    return loop_monitor.snapshot()
+
+
+@router.post("/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile(seconds: float = Query(default=10.0, gt=0)):
+    """Sample all threads and asyncio tasks for ``seconds`` and return collapsed stacks."""
+    seconds = min(seconds, settings.PROFILER_MAX_SECONDS)
+    try:
+        return await profiler.profile(seconds)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
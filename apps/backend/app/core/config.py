@@ -1,6 +1,6 @@
 from pathlib import Path
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Union
+from typing import List, Literal, Union
 from pydantic import AnyHttpUrl, field_validator
 
 # Root .env: app/core/config.py → app/core → app → backend → apps → project root
@@ -23,6 +23,10 @@ class Settings(BaseSettings):
             return v
         raise ValueError(v)
 
+    # Logging: write records from a background thread so the event loop never blocks on stdout
+    LOG_ASYNC: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+
     # Azure AI Foundry — gpt-4o-mini
     AZURE_KEY: str | None = None
     AZURE_ENDPOINT: str | None = None
@@ -34,6 +38,116 @@ class Settings(BaseSettings):
     DEEPSEEK_API_KEY: str | None = None
     DEEPSEEK_DEPLOYMENT: str = "DeepSeek-R1"
 
+    # Context window and completion cap per deployment; max_tokens is sized to what the prompt leaves
+    AZURE_CONTEXT_WINDOW: int = 128000
+    AZURE_MAX_COMPLETION_TOKENS: int = 4096
+    DEEPSEEK_CONTEXT_WINDOW: int = 128000
+    DEEPSEEK_MAX_COMPLETION_TOKENS: int = 32768
+    # Local BPE vocabularies for exact token counts (.tiktoken needs tiktoken, tokenizer.json needs tokenizers)
+    AZURE_TOKENIZER_PATH: str | None = None
+    DEEPSEEK_TOKENIZER_PATH: str | None = None
+    TOKENIZER_TIKTOKEN_ENCODING: Literal["o200k_base", "cl100k_base"] = "o200k_base"
+
+    # Upstream HTTP connection pool (one shared client per provider)
+    HTTP2_ENABLED: bool = True
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_PREWARM: bool = True
+
+    # SSE frame coalescing: buffer deltas for up to this window (0 = one frame per delta)
+    SSE_COALESCE_WINDOW_MS: float = 0.0
+    SSE_COALESCE_MAX_BYTES: int = 1024
+
+    # Exact-match response cache
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: float = 300.0
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    # /chat/stream cache hits: 0 sends the reply as one frame, otherwise it is paced word by word
+    CACHE_REPLAY_WORDS_PER_SECOND: float = 0.0
+
+    # Semantic cache (opt-in): also serve near-paraphrases, matched by local hashed n-gram embeddings
+    SEMANTIC_CACHE_ENABLED: bool = False
+    # Cosine similarity needed for a hit; below ~0.9 different questions start to match
+    SEMANTIC_CACHE_THRESHOLD: float = 0.9
+    SEMANTIC_CACHE_TTL_SECONDS: float = 300.0
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 10000
+    SEMANTIC_CACHE_DIM: int = 256
+    SEMANTIC_CACHE_MAX_CHARS: int = 2000
+
+    # Single-flight coalescing of identical in-flight completions
+    COALESCE_ENABLED: bool = True
+    COALESCE_WAIT_TIMEOUT_SECONDS: float = 75.0
+
+    # Share one upstream stream among concurrent identical /chat/stream requests
+    STREAM_FANOUT_ENABLED: bool = True
+    STREAM_FANOUT_QUEUE_SIZE: int = 256
+
+    # Resumable /chat/stream: recent frames are kept so a reconnect with Last-Event-ID can replay them
+    STREAM_RESUME_ENABLED: bool = True
+    STREAM_RESUME_TTL_SECONDS: float = 120.0
+    STREAM_RESUME_IDLE_SECONDS: float = 15.0
+    STREAM_RESUME_MAX_STREAMS: int = 512
+    STREAM_RESUME_MAX_BYTES: int = 32 * 1024 * 1024
+    STREAM_RESUME_MAX_STREAM_BYTES: int = 1024 * 1024
+
+    # Server-side conversations: requests carry a conversation_id and only the new turn
+    # "memory" keeps them per process; "sqlite" shares them across workers via a local WAL database
+    CONVERSATION_STORE: Literal["memory", "sqlite"] = "memory"
+    CONVERSATION_SQLITE_PATH: str = "data/conversations.db"
+    CONVERSATION_WRITE_BATCH_SIZE: int = 256
+    CONVERSATION_TTL_SECONDS: float = 3600.0
+    # In-memory LRU budget; with sqlite this is the hot cache in front of the database
+    CONVERSATION_MAX_BYTES: int = 64 * 1024 * 1024
+    CONVERSATION_MAX_TURNS: int = 200
+    # Prompt token budget per model; the oldest turns are left out once history exceeds it
+    AZURE_CONTEXT_BUDGET_TOKENS: int = 16000
+    DEEPSEEK_CONTEXT_BUDGET_TOKENS: int = 16000
+
+    # Hedged requests: race the other provider when the primary is slow (opt-in)
+    HEDGING_ENABLED: bool = False
+    HEDGING_PERCENTILE: float = 95.0
+    HEDGING_MIN_DELAY_SECONDS: float = 0.5
+    HEDGING_DEFAULT_DELAY_SECONDS: float = 2.0
+    HEDGING_BUDGET_RATIO: float = 0.1
+
+    # Per-provider adaptive concurrency limit (AIMD) with a bounded wait queue (opt-in)
+    CONCURRENCY_LIMIT_ENABLED: bool = False
+    CONCURRENCY_INITIAL_LIMIT: int = 16
+    CONCURRENCY_MIN_LIMIT: int = 2
+    CONCURRENCY_MAX_LIMIT: int = 64
+    CONCURRENCY_MAX_QUEUE: int = 64
+    CONCURRENCY_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    CONCURRENCY_LATENCY_TOLERANCE: float = 2.5
+    CONCURRENCY_BACKOFF: float = 0.75
+
+    # Client-side TPM/RPM quota per deployment; unset means no local limit
+    AZURE_TPM: int | None = None
+    AZURE_RPM: int | None = None
+    DEEPSEEK_TPM: int | None = None
+    DEEPSEEK_RPM: int | None = None
+    RATE_LIMIT_MAX_WAIT_SECONDS: float = 5.0
+    RATE_LIMIT_MAX_QUEUE: int = 256
+    # Completion tokens reserved per call before dispatch (capped at max_tokens); the real usage is reconciled after
+    RATE_LIMIT_EXPECTED_COMPLETION_TOKENS: int = 1024
+
+    # Prometheus /metrics endpoint and the event-loop lag sampler feeding it
+    METRICS_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_SECONDS: float = 0.1
+    # Blocks longer than this are recorded with stack samples (0 disables the watchdog)
+    LOOP_MONITOR_SLOW_THRESHOLD_SECONDS: float = 0.1
+
+    # /api/v1/debug diagnostics (loop stalls with stacks); exposes code paths, keep off in public deployments
+    DEBUG_ENDPOINTS_ENABLED: bool = False
+
+    # Admin-only sampling profiler at /api/v1/debug/profile; needs ADMIN_TOKEN sent as X-Admin-Token
+    PROFILER_ENABLED: bool = False
+    PROFILER_INTERVAL_MS: float = 10.0
+    PROFILER_MAX_SECONDS: float = 60.0
+    ADMIN_TOKEN: str | None = None
+
     model_config = SettingsConfigDict(
         case_sensitive=True,
         env_file=str(ENV_FILE),
@@ -2,13 +2,88 @@
 Centralized logging configuration for the backend.
 """
 
+import copy
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
+_listener: Optional["DrainingQueueListener"] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
 
-def setup_logging(level: Optional[str] = None) -> None:
-    """Configure application-wide logging."""
+# Renders tracebacks at enqueue time, while the frames are still alive.
+_traceback_formatter = logging.Formatter()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to a bounded queue without ever blocking the caller.
+
+    Records are formatted on the listener thread; when the queue is full the
+    record is dropped and counted instead.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Snapshot ``record`` so nothing it references is mutated or kept alive in the queue.
+
+        Like the stdlib ``prepare`` the message and arguments are merged and the
+        traceback rendered to text, but without running the full formatter here.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """A QueueListener whose ``stop`` also works when the queue is full.
+
+    The stdlib listener enqueues its stop sentinel with ``put_nowait`` and so
+    raises ``queue.Full``; this one waits up to ``stop_timeout`` seconds for
+    the thread to make room, and gives up on a stuck thread instead of hanging.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]", *handlers: logging.Handler,
+                 respect_handler_level: bool = False, stop_timeout: float = 5.0):
+        super().__init__(log_queue, *handlers, respect_handler_level=respect_handler_level)
+        self.stop_timeout = stop_timeout
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel, timeout=self.stop_timeout)
+
+    def stop(self) -> None:
+        try:
+            self.enqueue_sentinel()
+        except queue.Full:
+            # A handler is stuck; the thread is a daemon, so leave it behind.
+            sys.stderr.write("Logging queue did not drain within %.0fs; abandoning queued records\n"
+                             % self.stop_timeout)
+        else:
+            self._thread.join()
+        self._thread = None
+
+
+def setup_logging(level: Optional[str] = None, use_queue: bool = False, queue_size: int = 10000) -> None:
+    """Configure application-wide logging.
+
+    With ``use_queue`` the root logger only enqueues records, and a background
+    thread formats and writes them, so logging never blocks the event loop.
+    """
+    global _listener, _queue_handler
     log_level = getattr(logging, (level or "INFO").upper(), logging.INFO)
 
     formatter = logging.Formatter(
@@ -23,10 +98,42 @@ def setup_logging(level: Optional[str] = None) -> None:
     root_logger.setLevel(log_level)
 
     # Remove existing handlers to avoid duplicates
+    shutdown_logging()
     root_logger.handlers.clear()
-    root_logger.addHandler(handler)
+    if use_queue:
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+        _queue_handler = DroppingQueueHandler(log_queue)
+        _listener = DrainingQueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        root_logger.addHandler(_queue_handler)
+    else:
+        root_logger.addHandler(handler)
 
     # Suppress noisy third-party loggers
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
     logging.getLogger("openai").setLevel(logging.WARNING)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background logging thread, if any."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    # Anything logged after shutdown goes straight to the real handlers.
+    root_logger = logging.getLogger()
+    if _queue_handler in root_logger.handlers:
+        root_logger.removeHandler(_queue_handler)
+        for handler in _listener.handlers:
+            root_logger.addHandler(handler)
+    if _queue_handler is not None and _queue_handler.dropped:
+        logging.getLogger(__name__).warning(
+            "Dropped %d log records because the logging queue was full", _queue_handler.dropped
+        )
+    _listener = None
+    _queue_handler = None
+
+
+def dropped_log_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
@@ -0,0 +1,153 @@
+"""
+Event-loop lag monitor and slow-callback detector.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STACK_DEPTH = 40
+
+loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a task sleeping for a fixed interval.", buckets=LAG_BUCKETS
+)
+slow_callbacks = registry.counter(
+    "event_loop_slow_callbacks_total", "Times the event loop was blocked for longer than the slow threshold."
+)
+
+
+@dataclass
+class SlowCallback:
+    """One stretch where the loop was blocked, with the loop thread's stacks sampled meanwhile."""
+
+    started_at: float
+    duration: float
+    # Collapsed stack ("outer;...;inner") -> number of samples that saw it.
+    stacks: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "duration": round(self.duration, 4),
+            "stacks": [
+                {"stack": stack, "samples": count}
+                for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1])
+            ],
+        }
+
+
+def collapse_stack(frame: Any, limit: int = STACK_DEPTH) -> str:
+    """Format a frame and its callers as one ``outer;...;inner`` line, as flamegraph tools expect."""
+    entries = traceback.extract_stack(frame, limit=limit)
+    return ";".join(f"{entry.name} ({entry.filename}:{entry.lineno})" for entry in entries)
+
+
+class LoopLagMonitor:
+    """Sleeps for ``interval`` in a loop and records how much later than asked it woke up.
+
+    Any callback that holds the loop (blocking I/O, a large synchronous
+    ``json.dumps``) shows up directly as lag, since every SSE stream waits
+    behind it too. A watchdog thread notices when the loop is overdue by more
+    than ``slow_threshold`` and samples the loop thread's stack while it is
+    still blocked, so the culprit is captured rather than just the delay.
+    The most recent ``history`` slow callbacks are kept for the debug endpoint.
+    """
+
+    def __init__(self, interval: float = 0.5, slow_threshold: float = 0.1, history: int = 50):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.recent: Deque[SlowCallback] = deque(maxlen=history)
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread: Optional[int] = None
+        # Monotonic time the sampling task is due to wake; read by the watchdog.
+        self._due: Optional[float] = None
+        self._stacks: Dict[str, int] = {}
+        self._stacks_lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._task = asyncio.ensure_future(self._run())
+        if self.slow_threshold > 0:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "slow_threshold": self.slow_threshold,
+            "last_lag": round(self.last_lag, 4),
+            "max_lag": round(self.max_lag, 4),
+            "slow_callbacks": [entry.to_dict() for entry in reversed(self.recent)],
+        }
+
+    async def _run(self) -> None:
+        while True:
+            start = time.monotonic()
+            self._due = start + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - start - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            loop_lag.observe(lag)
+            if self.slow_threshold > 0 and lag >= self.slow_threshold:
+                self._record_slow(lag)
+            elif self._stacks:
+                # Sampled right at the threshold but the stall ended below it.
+                with self._stacks_lock:
+                    self._stacks = {}
+
+    def _record_slow(self, lag: float) -> None:
+        with self._stacks_lock:
+            stacks, self._stacks = self._stacks, {}
+        entry = SlowCallback(started_at=time.time() - lag, duration=lag, stacks=stacks)
+        self.recent.append(entry)
+        slow_callbacks.inc()
+        culprit = max(stacks, key=stacks.get).rsplit(";", 1)[-1] if stacks else "unknown (not sampled)"
+        logger.warning("Event loop blocked for %.0fms; innermost frame: %s", lag * 1000, culprit)
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.slow_threshold / 2):
+            due = self._due
+            if due is None or time.monotonic() - due < self.slow_threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = collapse_stack(frame)
+            with self._stacks_lock:
+                self._stacks[stack] = self._stacks.get(stack, 0) + 1
+
+
+loop_monitor = LoopLagMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL_SECONDS,
+    slow_threshold=settings.LOOP_MONITOR_SLOW_THRESHOLD_SECONDS,
+)
@@ -0,0 +1,95 @@
+"""
+Built-in statistical profiler producing collapsed stacks for flamegraph tools.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from typing import Dict
+
+from app.core.config import settings
+from app.core.loop_monitor import STACK_DEPTH, collapse_stack
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+class SamplingProfiler:
+    """Samples every thread's stack, and every asyncio task's await chain, for a fixed duration.
+
+    Thread stacks are read from a background thread every ``interval``
+    seconds via ``sys._current_frames``, so the event loop pays nothing for
+    them. Task stacks can only be read safely from the loop itself, so they
+    are sampled there at the coarser ``task_interval``. Output is one
+    ``root;frame;...;frame count`` line per distinct stack, as consumed by
+    flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self, interval: float = 0.01, task_interval: float = 0.1):
+        self.interval = interval
+        self.task_interval = task_interval
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def profile(self, seconds: float) -> str:
+        if self._running:
+            raise ProfilerBusy("A profile is already running.")
+        self._running = True
+        thread_counts: Dict[str, int] = {}
+        task_counts: Dict[str, int] = {}
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample_threads, args=(thread_counts, stop), name="profiler", daemon=True
+        )
+        try:
+            sampler.start()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                self._sample_tasks(task_counts)
+                await asyncio.sleep(min(self.task_interval, max(0.0, deadline - time.monotonic())))
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+            self._running = False
+
+        counts = {**thread_counts, **task_counts}
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+    def _sample_threads(self, counts: Dict[str, int], stop: threading.Event) -> None:
+        own = threading.get_ident()
+        while not stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = f"thread:{names.get(ident, ident)};{collapse_stack(frame)}"
+                counts[stack] = counts.get(stack, 0) + 1
+
+    @staticmethod
+    def _sample_tasks(counts: Dict[str, int]) -> None:
+        current = asyncio.current_task()
+        for task in asyncio.all_tasks():
+            if task is current:
+                continue
+            frames = task.get_stack(limit=STACK_DEPTH)
+            if not frames:
+                continue
+            chain = ";".join(
+                f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_lineno})" for frame in frames
+            )
+            stack = f"task:{_coro_name(task)};{chain}"
+            counts[stack] = counts.get(stack, 0) + 1
+
+
+def _coro_name(task: "asyncio.Task") -> str:
+    # Task names are unique ("Task-123"); group by coroutine instead.
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", None) or type(coro).__name__
+
+
+profiler = SamplingProfiler(interval=settings.PROFILER_INTERVAL_MS / 1000)
@@ -0,0 +1,210 @@
+"""
+Server-Sent Events helpers.
+
+Frames are produced as ready-to-send ``bytes`` so Starlette does not have to
+re-encode them. JSON payloads use orjson when it is installed and fall back
+to the standard library otherwise.
+"""
+
+import asyncio
+import json
+import logging
+import re
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, AsyncIterator, List, Optional
+
+from starlette.types import Receive
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+if orjson is not None:
+    dumps = orjson.dumps
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+
+logger = logging.getLogger(__name__)
+
+_ID = b"id: "
+_EVENT = b"event: "
+_RETRY = b"retry: "
+_DATA = b"data: "
+_NL = b"\n"
+_END = b"\n\n"
+
+
+def _fields(id: Optional[str], event: Optional[str], retry: Optional[int]) -> bytes:
+    parts = []
+    if id is not None:
+        parts += [_ID, id.encode("utf-8"), _NL]
+    if event is not None:
+        parts += [_EVENT, event.encode("utf-8"), _NL]
+    if retry is not None:
+        parts += [_RETRY, str(retry).encode("ascii"), _NL]
+    return b"".join(parts)
+
+
+def encode(data: Any, id: Optional[str] = None, event: Optional[str] = None, retry: Optional[int] = None) -> bytes:
+    """Encode one SSE frame whose ``data`` field is ``data`` serialized as JSON."""
+    if id is None and event is None and retry is None:
+        return _DATA + dumps(data) + _END
+    return _fields(id, event, retry) + _DATA + dumps(data) + _END
+
+
+class DeltaEncoder:
+    """Encodes ``{"type": "delta", ..., "content": ...}`` frames for one stream.
+
+    Everything except the content is constant for a stream, so it is
+    serialized once up front and each frame only encodes the new text.
+    """
+
+    def __init__(self, **fields: Any):
+        static = b"".join(dumps(key) + b":" + dumps(value) + b"," for key, value in fields.items())
+        self._prefix = _DATA + b'{"type":"delta",' + static + b'"content":'
+        self._suffix = b"}" + _END
+
+    def __call__(self, content: str, id: Optional[str] = None) -> bytes:
+        if id is None:
+            return self._prefix + dumps(content) + self._suffix
+        return _ID + id.encode("utf-8") + _NL + self._prefix + dumps(content) + self._suffix
+
+
+async def coalesce(chunks: AsyncIterator[str], window: float, max_bytes: int) -> AsyncGenerator[str, None]:
+    """Merge bursts of small chunks so each SSE frame carries more than one token.
+
+    The first chunk is passed through immediately so time to first token is
+    unchanged. After that, chunks are buffered and flushed as one when
+    ``window`` seconds have passed since the first buffered chunk or the
+    buffer reaches ``max_bytes``. A ``window`` of 0 disables coalescing.
+    """
+    if window <= 0:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    buffer: List[str] = []
+    size = 0
+    deadline: Optional[float] = None
+    pending: Optional["asyncio.Future[str]"] = None
+    first = True
+    try:
+        while True:
+            if pending is None and deadline is None:
+                # Nothing buffered: no flush to schedule, so wait directly.
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+            else:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if not done:
+                    yield "".join(buffer)
+                    buffer.clear()
+                    size = 0
+                    deadline = None
+                    continue
+                task, pending = pending, None
+                try:
+                    chunk = task.result()
+                except StopAsyncIteration:
+                    break
+
+            if first:
+                first = False
+                yield chunk
+                continue
+
+            buffer.append(chunk)
+            size += len(chunk.encode("utf-8"))
+            if deadline is None:
+                deadline = loop.time() + window
+            if size >= max_bytes:
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+                deadline = None
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+_WORD = re.compile(r"\s*\S+|\s+")
+
+
+async def replay(text: str, words_per_second: float = 0.0) -> AsyncGenerator[str, None]:
+    """Yield a stored reply as deltas: whole when ``words_per_second`` is 0, otherwise word by word at that pace."""
+    if words_per_second <= 0:
+        yield text
+        return
+    interval = 1 / words_per_second
+    for index, word in enumerate(_WORD.findall(text)):
+        if index:
+            await asyncio.sleep(interval)
+        yield word
+
+
+_CLOSED = object()
+
+
+async def cancel_on_disconnect(receive: Receive, frames: AsyncGenerator[bytes, None]) -> AsyncGenerator[bytes, None]:
+    """Relay ``frames`` until the client disconnects, then cancel their production.
+
+    Frames are produced on a separate task while this generator watches the
+    ASGI ``receive`` channel for ``http.disconnect``. A disconnect is therefore
+    noticed even while the model is silent (e.g. DeepSeek-R1 reasoning), not
+    only when the next frame fails to send, and cancelling the producer
+    unwinds the service chain down to the upstream stream, which is closed.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+
+    async def produce() -> None:
+        try:
+            async with aclosing(frames) as source:
+                async for frame in source:
+                    await queue.put(frame)
+            await queue.put(_CLOSED)
+        except Exception as e:
+            await queue.put(e)
+
+    async def watch() -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        if not producer.done():
+            logger.info("Client disconnected mid-stream; cancelling generation")
+            producer.cancel()
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(_CLOSED)
+
+    producer = asyncio.ensure_future(produce())
+    watcher = asyncio.ensure_future(watch())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _CLOSED:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        watcher.cancel()
+        producer.cancel()
+        await asyncio.gather(watcher, producer, return_exceptions=True)
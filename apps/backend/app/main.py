@@ -1,18 +1,38 @@
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from app.api.v1.endpoints import chat
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.api.v1.endpoints import chat, debug
 from app.core.config import settings
-from app.core.logging import setup_logging
+from app.core.logging import dropped_log_records, setup_logging, shutdown_logging
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import registry
+from app.middleware.metrics import MetricsMiddleware
 from app.middleware.request_logging import RequestLoggingMiddleware
+from app.services.timing import timing_registry
 
 # Configure structured logging
-setup_logging()
+setup_logging(use_queue=settings.LOG_ASYNC, queue_size=settings.LOG_QUEUE_SIZE)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await chat.open_providers()
+    await chat.conversations.open()
+    if settings.METRICS_ENABLED or settings.DEBUG_ENDPOINTS_ENABLED:
+        loop_monitor.start()
+    yield
+    await loop_monitor.stop()
+    await chat.conversations.aclose()
+    await chat.close_providers()
+    shutdown_logging()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # CORS - allow frontend origins
@@ -43,8 +63,11 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 
 app.add_middleware(RequestLoggingMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 app.include_router(chat.router, prefix=f"{settings.API_V1_STR}/chat", tags=["chat"])
+app.include_router(debug.router, prefix=f"{settings.API_V1_STR}/debug", tags=["debug"], include_in_schema=False)
 
 
 @app.get("/")
@@ -60,4 +83,21 @@ async def health_check():
             "azure_openai": bool(settings.AZURE_KEY and settings.AZURE_ENDPOINT),
             "deepseek": bool(settings.DEEPSEEK_ENDPOINT and (settings.DEEPSEEK_API_KEY or settings.AZURE_KEY)),
         },
+        "concurrency": {model.value: limiter.stats() for model, limiter in chat.concurrency_limiters.items()},
+        "rate_limits": {model.value: limiter.stats() for model, limiter in chat.rate_limiters.items()},
+        "timings": timing_registry.snapshot(),
     }
+
+
+@registry.collector
+def _collect_log_drops():
+    yield "log_records_dropped_total", "counter", "Log records dropped because the queue was full.", [
+        ({}, dropped_log_records())
+    ]
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not settings.METRICS_ENABLED:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,60 @@
+"""
+Request metrics middleware.
+"""
+
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import registry
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by method, route and status code.", ("method", "route", "status")
+)
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request duration including the full response body.", ("method", "route")
+)
+active_streams = registry.gauge("sse_active_streams", "Server-Sent Event responses currently open.", ("route",))
+
+
+class MetricsMiddleware:
+    """Counts requests and times them per route template, and tracks open SSE streams.
+
+    The route template (e.g. ``/api/v1/chat/stream``) is used rather than the
+    raw path so label cardinality stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        stream = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, stream
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for key, value in message.get("headers", ()):
+                    if key == b"content-type" and value.startswith(b"text/event-stream"):
+                        stream = active_streams.labels(_route(scope))
+                        stream.inc()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if stream is not None:
+                stream.dec()
+            route = _route(scope)
+            http_requests.labels(scope["method"], route, str(status_code)).inc()
+            http_duration.labels(scope["method"], route).observe(time.perf_counter() - start)
+
+
+def _route(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
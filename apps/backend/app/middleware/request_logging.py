@@ -4,26 +4,56 @@ Request / response logging middleware.
 
 import logging
 import time
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Logs every request with method, path, status code, and duration."""
+class RequestLoggingMiddleware:
+    """Logs every request with method, path, status code, timings and bytes sent.
+
+    Implemented as a plain ASGI middleware that wraps ``send``, so it adds no
+    extra task or memory stream per request and the duration it logs covers
+    the full response body, including long-lived SSE streams.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
         start = time.perf_counter()
-        response = await call_next(request)
-        duration_ms = (time.perf_counter() - start) * 1000
-
-        logger.info(
-            "%s %s -> %s (%.1fms)",
-            request.method,
-            request.url.path,
-            response.status_code,
-            duration_ms,
-        )
-        return response
+        status_code = 500
+        headers_ms = None
+        first_byte_ms = None
+        bytes_sent = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, headers_ms, first_byte_ms, bytes_sent
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers_ms = (time.perf_counter() - start) * 1000
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                if body and first_byte_ms is None:
+                    first_byte_ms = (time.perf_counter() - start) * 1000
+                bytes_sent += len(body)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            logger.info(
+                "%s %s -> %s (%.1fms, headers %.1fms, first byte %.1fms, %d bytes)",
+                scope["method"],
+                scope["path"],
+                status_code,
+                duration_ms,
+                headers_ms if headers_ms is not None else duration_ms,
+                first_byte_ms if first_byte_ms is not None else duration_ms,
+                bytes_sent,
+            )
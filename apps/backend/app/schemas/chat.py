@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Optional, Dict, Any, List
 from enum import Enum
 
 
@@ -17,6 +17,34 @@ class ChatRequest(BaseModel):
         max_length=4000,
         description="System prompt for the model",
     )
+    conversation_id: Optional[str] = Field(
+        default=None,
+        max_length=64,
+        description="Continue a server-side conversation; only the new turn is sent",
+    )
+    # Earlier turns of the conversation, filled in server-side; never read from the body.
+    _history: List[Dict[str, str]] = PrivateAttr(default_factory=list)
+    _history_tokens: int = PrivateAttr(default=0)
+
+    def to_messages(self) -> List[Dict[str, str]]:
+        """The chat ``messages`` list sent upstream: system prompt, history, then the new turn."""
+        return [
+            {"role": "system", "content": self.system_prompt or ""},
+            *self._history,
+            {"role": "user", "content": self.message},
+        ]
+
+
+class Timings(BaseModel):
+    """Per-request timings in seconds; fields that do not apply are None."""
+
+    connect: Optional[float] = None
+    ttft: Optional[float] = None
+    total: Optional[float] = None
+    tokens: Optional[int] = None
+    tokens_per_second: Optional[float] = None
+    gap_p50: Optional[float] = None
+    gap_p95: Optional[float] = None
 
 
 class ChatResponse(BaseModel):
@@ -24,3 +52,45 @@ class ChatResponse(BaseModel):
     model: str
     usage: Optional[Dict[str, Any]] = None
     latency: Optional[float] = None
+    timings: Optional[Timings] = None
+    cached: bool = False
+    conversation_id: Optional[str] = None
+
+
+class DualChatRequest(BaseModel):
+    message: str = Field(..., min_length=1, max_length=32000, description="User message")
+    system_prompt: Optional[str] = Field(
+        default="You are a helpful assistant.",
+        max_length=4000,
+        description="System prompt for both models",
+    )
+    conversation_id: Optional[str] = Field(
+        default=None,
+        max_length=64,
+        description="Continue a server-side conversation; each model sees its own earlier replies",
+    )
+
+    def for_model(self, model: ModelName) -> ChatRequest:
+        return ChatRequest(
+            message=self.message,
+            system_prompt=self.system_prompt,
+            model=model,
+            conversation_id=self.conversation_id,
+        )
+
+
+class DualChatResponse(BaseModel):
+    responses: Dict[ModelName, ChatResponse] = {}
+    errors: Dict[ModelName, str] = {}
+    latency: Optional[float] = None
+
+
+class ConversationTurn(BaseModel):
+    role: str
+    content: str
+    model: Optional[str] = None
+
+
+class ConversationResponse(BaseModel):
+    conversation_id: str
+    turns: List[ConversationTurn] = []
@@ -0,0 +1,189 @@
+"""
+Exact-match response cache for LLM completions.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Callable, Dict, Optional
+
+from app.schemas.chat import ChatRequest
+from app.services.llm_service import STREAM_ERROR_PREFIX, BaseLLMService
+from app.services.timing import completion_timings
+
+logger = logging.getLogger(__name__)
+
+
+def make_request_key(deployment: str, request: ChatRequest) -> str:
+    """Hash the fields that determine a completion into a fixed-size key."""
+    raw = json.dumps(
+        [deployment, request.to_messages()],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+async def capture_stream(
+    chunks: AsyncGenerator[str, None], deployment: str, save: Callable[[Dict[str, Any]], None]
+) -> AsyncGenerator[str, None]:
+    """Relay a token stream and hand ``save`` a completion-shaped result once it finishes cleanly.
+
+    Nothing is saved when the stream raises, ends on an in-band error
+    message, or is closed early by its consumer.
+    """
+    start_time = time.perf_counter()
+    reply = []
+    async with aclosing(chunks) as stream:
+        async for chunk in stream:
+            reply.append(chunk)
+            yield chunk
+    if not reply or reply[-1].startswith(STREAM_ERROR_PREFIX):
+        return
+    latency = time.perf_counter() - start_time
+    save({
+        "reply": "".join(reply),
+        "model": deployment,
+        "usage": None,
+        "latency": round(latency, 3),
+        # Streamed chunks carry roughly one token each.
+        "timings": completion_timings(latency, len(reply)),
+    })
+
+
+def cache_hit(value: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+    """A stored result as served from cache, timed from ``start_time``."""
+    latency = round(time.perf_counter() - start_time, 6)
+    return {
+        **value,
+        "latency": latency,
+        # The stored timings describe the original upstream call, not this hit.
+        "timings": {"ttft": latency, "total": latency},
+        "cached": True,
+    }
+
+
+@dataclass
+class _CacheEntry:
+    value: Dict[str, Any]
+    size: int
+    expires_at: float
+
+
+class ResponseCache:
+    """Bounded LRU cache with per-entry TTL and a total byte budget.
+
+    All access happens on the event loop, so no locking is needed.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        size = len(key) + len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _CacheEntry(value, size, time.monotonic() + self.ttl_seconds)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+class CachedLLMService(BaseLLMService):
+    """Serves repeated completions from a ResponseCache before calling the wrapped service.
+
+    Streams are not served from the cache here: callers check
+    ``get_cached_completion`` first so they can replay a hit and say so.
+    Streams that complete are stored, so a repeated prompt costs nothing
+    upstream whether it is streamed or not.
+    """
+
+    def __init__(self, inner: BaseLLMService, cache: ResponseCache):
+        self.inner = inner
+        self.cache = cache
+        self.deployment = inner.deployment
+
+    async def get_completion(self, request: ChatRequest) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        key = make_request_key(self.deployment, request)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cache_hit(cached, start_time)
+
+        result = await self.inner.get_completion(request)
+        # A hit from an inner cache layer is reported as such and not stored again.
+        if result.get("cached"):
+            return result
+        self.cache.set(key, result)
+        return {**result, "cached": False}
+
+    def get_cached_completion(self, request: ChatRequest) -> Optional[Dict[str, Any]]:
+        start_time = time.perf_counter()
+        cached = self.cache.get(make_request_key(self.deployment, request))
+        if cached is not None:
+            return cache_hit(cached, start_time)
+        return self.inner.get_cached_completion(request)
+
+    async def get_streaming_completion(self, request: ChatRequest) -> AsyncGenerator[str, None]:
+        key = make_request_key(self.deployment, request)
+        chunks = capture_stream(
+            self.inner.get_streaming_completion(request), self.deployment, lambda result: self.cache.set(key, result)
+        )
+        async with aclosing(chunks) as stream:
+            async for chunk in stream:
+                yield chunk
@@ -0,0 +1,96 @@
+"""
+Single-flight coalescing of identical in-flight completion requests.
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.schemas.chat import ChatRequest
+from app.services.cache import make_request_key
+from app.services.llm_service import BaseLLMService
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key; concurrent callers share its result.
+
+    The shared call runs as its own task, so a cancelled or timed-out caller
+    never cancels the work other callers are still waiting on. The upstream
+    call is only cancelled once every waiter has gone away.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+            self._calls[key] = call
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(call.task), timeout)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is left to consume the result.
+                self._forget(key, call)
+                call.task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "followers": self.followers}
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _finish(self, key: str, call: _Call) -> None:
+        self._forget(key, call)
+        if not call.task.cancelled():
+            # Mark the exception as retrieved even if every waiter left early.
+            call.task.exception()
+
+
+class CoalescingLLMService(BaseLLMService):
+    """Collapses concurrent identical completions onto a single upstream call."""
+
+    def __init__(self, inner: BaseLLMService, flight: SingleFlight, wait_timeout: Optional[float] = None):
+        self.inner = inner
+        self.flight = flight
+        self.wait_timeout = wait_timeout
+        self.deployment = inner.deployment
+
+    async def get_completion(self, request: ChatRequest) -> Dict[str, Any]:
+        key = make_request_key(self.deployment, request)
+        try:
+            result = await self.flight.do(key, lambda: self.inner.get_completion(request), self.wait_timeout)
+        except asyncio.TimeoutError:
+            logger.error("Timed out waiting for coalesced %s completion", self.deployment)
+            raise HTTPException(status_code=504, detail="Request timed out. Please try again.")
+        return dict(result)
+
+    async def get_streaming_completion(self, request: ChatRequest) -> AsyncGenerator[str, None]:
+        async for chunk in self.inner.get_streaming_completion(request):
+            yield chunk
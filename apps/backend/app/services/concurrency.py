@@ -0,0 +1,220 @@
+"""
+Per-provider bulkhead with an adaptive (AIMD) concurrency limit.
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Deque, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.schemas.chat import ChatRequest
+from app.services.llm_service import BaseLLMService
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """Bounds concurrent upstream calls for one provider.
+
+    Callers beyond the current limit wait in a bounded FIFO queue; once the
+    queue is full, or a caller has waited ``queue_timeout`` seconds, the call
+    is rejected with a 503 instead of piling up. The limit itself follows
+    AIMD: it is multiplied by ``backoff`` on a 429, or when the smoothed
+    recent latency for a call kind exceeds ``latency_tolerance`` times the
+    median of its last ``baseline_window`` samples. Each healthy call adds
+    ``1 / limit``: up to ``max_limit`` while the limit is in use, and back up
+    to ``initial_limit`` when it is not, so a limit lowered during a burst
+    recovers once the load is gone.
+
+    Latency samples must not depend on reply length, or a long answer on an
+    idle service would look like overload: callers pass TTFT for streams and
+    seconds per output token for completions.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        max_queue: int = 64,
+        queue_timeout: float = 10.0,
+        latency_tolerance: float = 2.5,
+        backoff: float = 0.75,
+        baseline_window: int = 100,
+        smoothing: float = 0.2,
+    ):
+        self.name = name
+        self.initial_limit = initial_limit
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.baseline_window = baseline_window
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._recent: Dict[str, float] = {}
+        self.accepted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.decreases = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.accepted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise self._overloaded()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if waiter.done():
+                # A slot was handed over just as the caller went away.
+                self._release_slot()
+            else:
+                self._drop_waiter(waiter)
+            raise
+
+        if not waiter.done():
+            self._drop_waiter(waiter)
+            self.timeouts += 1
+            raise self._overloaded()
+        self.accepted += 1
+
+    def release(self, kind: str, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """Return a slot and feed the outcome of the call into the limit."""
+        saturated = self.in_flight >= int(self.limit)
+        if overloaded:
+            self._decrease("rate limited")
+        elif latency is not None:
+            samples = self._samples.setdefault(kind, deque(maxlen=self.baseline_window))
+            baseline = statistics.median(samples) if samples else None
+            recent = self._recent.get(kind, latency)
+            recent += self.smoothing * (latency - recent)
+            self._recent[kind] = recent
+            samples.append(latency)
+            if baseline and recent > baseline * self.latency_tolerance:
+                self._decrease(f"{kind} latency {recent:.3g}s over baseline {baseline:.3g}s")
+                # Start over from the baseline so one slow spell backs off once, not on every call.
+                self._recent[kind] = baseline
+            elif saturated:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            elif self.limit < self.initial_limit:
+                self.limit = min(float(self.initial_limit), self.limit + 1 / self.limit)
+        self._release_slot()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "decreases": self.decreases,
+        }
+
+    def _decrease(self, reason: str) -> None:
+        new_limit = max(float(self.min_limit), self.limit * self.backoff)
+        if int(new_limit) < int(self.limit):
+            logger.info("%s concurrency limit %d -> %d (%s)", self.name, int(self.limit), int(new_limit), reason)
+        self.limit = new_limit
+        self.decreases += 1
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _drop_waiter(self, waiter: "asyncio.Future[None]") -> None:
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _overloaded(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail=f"{self.name} is at capacity. Please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+
+class ConcurrencyLimitedLLMService(BaseLLMService):
+    """Runs every upstream call for a provider through its AdaptiveLimiter."""
+
+    def __init__(self, inner: BaseLLMService, limiter: AdaptiveLimiter):
+        self.inner = inner
+        self.limiter = limiter
+        self.name = inner.name
+        self.deployment = inner.deployment
+        self.model = inner.model
+        self.context_window = inner.context_window
+        self.max_tokens = inner.max_tokens
+
+    async def get_completion(self, request: ChatRequest) -> Dict[str, Any]:
+        await self.limiter.acquire()
+        start = time.monotonic()
+        latency = None
+        overloaded = False
+        try:
+            result = await self.inner.get_completion(request)
+            tokens = _completion_tokens(result)
+            if tokens:
+                latency = (time.monotonic() - start) / tokens
+            return result
+        except HTTPException as e:
+            overloaded = e.status_code == 429
+            raise
+        finally:
+            self.limiter.release("completion", latency, overloaded)
+
+    async def get_streaming_completion(self, request: ChatRequest) -> AsyncGenerator[str, None]:
+        await self.limiter.acquire()
+        start = time.monotonic()
+        ttft = None
+        overloaded = False
+        stream = self.inner.get_streaming_completion(request)
+        try:
+            async for chunk in stream:
+                if ttft is None:
+                    ttft = time.monotonic() - start
+                yield chunk
+        except HTTPException as e:
+            overloaded = e.status_code == 429
+            raise
+        finally:
+            await stream.aclose()
+            self.limiter.release("ttft", ttft, overloaded)
+
+
+def _completion_tokens(result: Dict[str, Any]) -> Optional[int]:
+    """Output tokens of a completion result, from its usage or its timings."""
+    usage = result.get("usage") or {}
+    timings = result.get("timings") or {}
+    return usage.get("completion_tokens") or timings.get("tokens")
@@ -0,0 +1,303 @@
+"""
+SQLite conversation store shared by every worker on the host.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.services.conversations import Conversation, ConversationStore, MemoryConversationStore, Turn
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at);
+CREATE TABLE IF NOT EXISTS turns (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    model TEXT,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+"""
+
+# Fixed statement texts, so each connection prepares them once and reuses them from its statement cache.
+INSERT_CONVERSATION = "INSERT OR REPLACE INTO conversations (id, updated_at) VALUES (?, ?)"
+# Skipped when the conversation was deleted meanwhile, so no orphan turns are left behind.
+INSERT_TURN = (
+    "INSERT OR IGNORE INTO turns (conversation_id, seq, role, content, tokens, model) "
+    "SELECT ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM conversations WHERE id = ?)"
+)
+TOUCH_CONVERSATION = "UPDATE conversations SET updated_at = ? WHERE id = ?"
+TRIM_TURNS = "DELETE FROM turns WHERE conversation_id = ? AND seq < ?"
+DELETE_TURNS = "DELETE FROM turns WHERE conversation_id = ?"
+DELETE_CONVERSATION = "DELETE FROM conversations WHERE id = ?"
+SELECT_CONVERSATION = "SELECT updated_at FROM conversations WHERE id = ?"
+SELECT_TURNS = (
+    "SELECT seq, role, content, tokens, model FROM turns WHERE conversation_id = ? AND seq >= ? ORDER BY seq"
+)
+SELECT_EXPIRED = "SELECT id FROM conversations WHERE updated_at < ? LIMIT 500"
+
+# Writer queue items are (kind, args, future or None); _STOP ends the writer.
+_STOP = ("stop", (), None)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Conversations persisted to a local SQLite database in WAL mode, behind an in-memory cache.
+
+    Writes go through a queue to one writer thread, which commits everything
+    queued so far in a single transaction: appends from concurrent requests
+    share a commit, and ``append`` itself is a cache update plus a queue put.
+    Creates and deletes wait for their commit so another worker sees them at
+    once. Reads run in worker threads and fetch only the turns newer than the
+    cached copy, so turns appended by other workers on the same database are
+    picked up without reloading the history. Two workers appending to the
+    same conversation at the same moment may number a turn alike; the later
+    one is dropped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        cache: MemoryConversationStore,
+        ttl_seconds: float,
+        batch_size: int = 256,
+        sweep_interval: float = 60.0,
+        close_timeout: float = 10.0,
+    ):
+        self.path = path
+        self.cache = cache
+        self.max_turns = cache.max_turns
+        self.ttl_seconds = ttl_seconds
+        self.batch_size = batch_size
+        self.sweep_interval = sweep_interval
+        self.close_timeout = close_timeout
+        self._queue: "queue.SimpleQueue[Tuple[str, Tuple[Any, ...], Optional[asyncio.Future]]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        # Set by aclose; later appends stay in the cache only and creates and deletes fail.
+        self._closed = False
+        self._readers = threading.local()
+        self._reader_connections: List[sqlite3.Connection] = []
+        self.batches = 0
+        self.writes = 0
+        self.write_errors = 0
+        self.dropped_writes = 0
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    async def open(self) -> None:
+        if self._writer is not None:
+            return
+        await asyncio.to_thread(self._init_db)
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="conversation-writer", daemon=True)
+        self._writer.start()
+
+    async def aclose(self) -> None:
+        self._closed = True
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            await asyncio.to_thread(self._writer.join, self.close_timeout)
+            if self._writer.is_alive():
+                logger.warning(
+                    "Conversation writer did not finish within %.0fs; %d writes may be lost",
+                    self.close_timeout, self._queue.qsize(),
+                )
+            self._writer = None
+        for connection in self._reader_connections:
+            connection.close()
+        self._reader_connections.clear()
+        self._readers = threading.local()
+
+    async def create(self) -> Conversation:
+        conversation = await self.cache.create()
+        await self._write("create", (conversation.id, time.time()))
+        return conversation
+
+    async def get(self, conversation_id: str) -> Optional[Conversation]:
+        cached = self.cache.lookup(conversation_id)
+        after = cached.next_seq if cached is not None else 0
+        try:
+            loaded = await asyncio.to_thread(self._load, conversation_id, after)
+        except sqlite3.Error as exc:
+            logger.error("Conversation store read failed: %s", exc)
+            raise _unavailable()
+        if loaded is None:
+            self.cache.discard(conversation_id)
+            return None
+        updated_at, rows = loaded
+        if updated_at + self.ttl_seconds <= time.time():
+            self.cache.discard(conversation_id)
+            self._queue.put(("delete", (conversation_id,), None))
+            return None
+        conversation = cached or Conversation(id=conversation_id)
+        for seq, role, content, tokens, model in rows:
+            self.cache.push(conversation, Turn(seq=seq, role=role, content=content, tokens=tokens, model=model))
+        if cached is None:
+            self.cache.add(conversation)
+        return conversation
+
+    async def delete(self, conversation_id: str) -> bool:
+        self.cache.discard(conversation_id)
+        return await self._write("delete", (conversation_id,))
+
+    def append(self, conversation: Conversation, role: str, content: str, model: Optional[str] = None) -> Turn:
+        turn = self.cache.append(conversation, role, content, model)
+        if self._closed:
+            # A producer finishing during shutdown; the writer may already be gone.
+            self.dropped_writes += 1
+            logger.debug("Conversation store closed; not persisting turn %d of %s", turn.seq, conversation.id)
+        else:
+            self._queue.put(("append", (conversation.id, turn, time.time()), None))
+        return turn
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "pending_writes": self._queue.qsize(),
+            "batches": self.batches,
+            "writes": self.writes,
+            "write_errors": self.write_errors,
+            "dropped_writes": self.dropped_writes,
+        }
+
+    async def _write(self, kind: str, args: Tuple[Any, ...]) -> Any:
+        if self._closed:
+            raise _unavailable()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put((kind, args, future))
+        try:
+            return await future
+        except sqlite3.Error:
+            raise _unavailable()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, cached_statements=64)
+        connection.execute("PRAGMA busy_timeout = 5000")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def _load(self, conversation_id: str, after: int) -> Optional[Tuple[float, List[Tuple[Any, ...]]]]:
+        """Runs in a worker thread, each with its own connection."""
+        connection = getattr(self._readers, "connection", None)
+        if connection is None:
+            connection = self._readers.connection = self._connect()
+            self._reader_connections.append(connection)
+        row = connection.execute(SELECT_CONVERSATION, (conversation_id,)).fetchone()
+        if row is None:
+            return None
+        return row[0], connection.execute(SELECT_TURNS, (conversation_id, after)).fetchall()
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        last_sweep = time.monotonic()
+        stop = False
+        try:
+            while True:
+                try:
+                    batch = [self._queue.get(timeout=self.sweep_interval)]
+                except queue.Empty:
+                    batch = []
+                # Whatever queued up during the previous commit goes into this one.
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                # Sticky: writes queued behind the stop marker are drained, then the writer exits.
+                stop = stop or _STOP in batch
+                self._commit(connection, [item for item in batch if item is not _STOP])
+                if time.monotonic() - last_sweep >= self.sweep_interval:
+                    self._sweep(connection)
+                    last_sweep = time.monotonic()
+                if stop and self._queue.empty():
+                    return
+        finally:
+            connection.close()
+
+    def _commit(self, connection: sqlite3.Connection, batch: List[Tuple[str, Tuple[Any, ...], Any]]) -> None:
+        if not batch:
+            return
+        results = []
+        try:
+            with connection:
+                for kind, args, future in batch:
+                    results.append(self._apply(connection, kind, args))
+        except sqlite3.Error as exc:
+            self.write_errors += len(batch)
+            logger.error("Conversation store write of %d operations failed: %s", len(batch), exc)
+            for _, _, future in batch:
+                if future is not None:
+                    future.get_loop().call_soon_threadsafe(_resolve, future, None, exc)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        for (_, _, future), result in zip(batch, results):
+            if future is not None:
+                future.get_loop().call_soon_threadsafe(_resolve, future, result, None)
+
+    def _apply(self, connection: sqlite3.Connection, kind: str, args: Tuple[Any, ...]) -> Any:
+        if kind == "append":
+            conversation_id, turn, now = args
+            connection.execute(
+                INSERT_TURN,
+                (conversation_id, turn.seq, turn.role, turn.content, turn.tokens, turn.model, conversation_id),
+            )
+            connection.execute(TOUCH_CONVERSATION, (now, conversation_id))
+            if turn.seq >= self.max_turns:
+                connection.execute(TRIM_TURNS, (conversation_id, turn.seq + 1 - self.max_turns))
+            return None
+        if kind == "create":
+            connection.execute(INSERT_CONVERSATION, args)
+            return None
+        if kind == "delete":
+            connection.execute(DELETE_TURNS, args)
+            return connection.execute(DELETE_CONVERSATION, args).rowcount > 0
+        raise ValueError(f"Unknown conversation store operation {kind!r}")
+
+    def _sweep(self, connection: sqlite3.Connection) -> None:
+        """Delete conversations idle past the TTL, a bounded number at a time."""
+        try:
+            with connection:
+                expired = connection.execute(SELECT_EXPIRED, (time.time() - self.ttl_seconds,)).fetchall()
+                connection.executemany(DELETE_TURNS, expired)
+                connection.executemany(DELETE_CONVERSATION, expired)
+        except sqlite3.Error as exc:
+            logger.error("Conversation store sweep failed: %s", exc)
+
+
+def _resolve(future: asyncio.Future, result: Any, exc: Optional[BaseException]) -> None:
+    if future.done():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+def _unavailable() -> HTTPException:
+    return HTTPException(status_code=503, detail="Conversation storage is unavailable. Please try again.")
@@ -0,0 +1,226 @@
+"""
+Server-side conversation sessions with a token-budgeted context window.
+"""
+
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from app.schemas.chat import ChatRequest, ModelName
+from app.services.tokenizer import get_tokenizer
+
+# Rough per-turn bookkeeping cost (Turn object, deque slot) on top of its text.
+TURN_OVERHEAD_BYTES = 200
+
+
+def message_tokens(content: str, model: Optional[str] = None) -> int:
+    """Prompt tokens for one stored message, counted with its author's tokenizer.
+
+    User turns are shared by both models and are counted with the gpt-4
+    tokenizer; the two vocabularies differ by a few percent at most.
+    """
+    return get_tokenizer(ModelName(model or ModelName.GPT4)).message_tokens(content)
+
+
+@dataclass
+class Turn:
+    # Position in the conversation, counted from 0 and never reused after trimming.
+    seq: int
+    role: str
+    content: str
+    # Counted once when the turn is stored, so building a context never re-tokenizes history.
+    tokens: int
+    # Assistant turns belong to the model that wrote them; user turns are shared.
+    model: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return sys.getsizeof(self.content) + TURN_OVERHEAD_BYTES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"role": self.role, "content": self.content, "model": self.model}
+
+
+@dataclass
+class Conversation:
+    id: str
+    turns: Deque[Turn] = field(default_factory=deque)
+    next_seq: int = 0
+    size: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+    def context(self, model: str, budget: int) -> List[Turn]:
+        """The newest turns visible to ``model`` that fit in ``budget`` tokens, oldest first.
+
+        Walks back from the latest turn and stops at the first one that does
+        not fit, so the model always sees a contiguous tail of the
+        conversation. A leading assistant turn is dropped since its question
+        fell outside the window.
+        """
+        selected: List[Turn] = []
+        for turn in reversed(self.turns):
+            if turn.model is not None and turn.model != model:
+                continue
+            if turn.tokens > budget:
+                break
+            budget -= turn.tokens
+            selected.append(turn)
+        while selected and selected[-1].role == "assistant":
+            selected.pop()
+        selected.reverse()
+        return selected
+
+
+class ConversationStore:
+    """Where conversations live between requests.
+
+    Lookups, creation and deletion are async because a backend may need I/O
+    for them. ``append`` is synchronous and O(1): it updates the in-memory
+    conversation and leaves any persistence to happen in the background, so
+    recording a reply never waits on storage.
+    """
+
+    async def open(self) -> None:
+        """Prepare the backend; called once from the app lifespan."""
+
+    async def aclose(self) -> None:
+        """Flush pending writes and release resources."""
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    async def create(self) -> Conversation:
+        raise NotImplementedError
+
+    async def get(self, conversation_id: str) -> Optional[Conversation]:
+        raise NotImplementedError
+
+    async def delete(self, conversation_id: str) -> bool:
+        raise NotImplementedError
+
+    def append(self, conversation: Conversation, role: str, content: str, model: Optional[str] = None) -> Turn:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryConversationStore(ConversationStore):
+    """In-process conversations in an LRU bounded by ``max_bytes``, expiring after ``ttl_seconds`` idle.
+
+    Each conversation keeps at most ``max_turns`` turns; older ones are
+    dropped as new ones arrive. Also used as the hot cache in front of
+    persistent backends. All access happens on the event loop, so no locking
+    is needed.
+    """
+
+    def __init__(self, max_bytes: int, max_turns: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        self.ttl_seconds = ttl_seconds
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    async def create(self) -> Conversation:
+        conversation = Conversation(id=uuid.uuid4().hex)
+        self.add(conversation)
+        return conversation
+
+    async def get(self, conversation_id: str) -> Optional[Conversation]:
+        return self.lookup(conversation_id)
+
+    async def delete(self, conversation_id: str) -> bool:
+        return self.discard(conversation_id)
+
+    def append(self, conversation: Conversation, role: str, content: str, model: Optional[str] = None) -> Turn:
+        tokens = message_tokens(content, model)
+        turn = Turn(seq=conversation.next_seq, role=role, content=content, tokens=tokens, model=model)
+        self.push(conversation, turn)
+        return turn
+
+    def lookup(self, conversation_id: str) -> Optional[Conversation]:
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        if conversation.last_used + self.ttl_seconds <= time.monotonic():
+            self.discard(conversation_id)
+            self.expirations += 1
+            return None
+        conversation.last_used = time.monotonic()
+        self._conversations.move_to_end(conversation_id)
+        return conversation
+
+    def add(self, conversation: Conversation) -> None:
+        self.discard(conversation.id)
+        self._expire()
+        conversation.last_used = time.monotonic()
+        self._conversations[conversation.id] = conversation
+        self._bytes += conversation.size
+        self._evict()
+
+    def discard(self, conversation_id: str) -> bool:
+        conversation = self._conversations.pop(conversation_id, None)
+        if conversation is None:
+            return False
+        self._bytes -= conversation.size
+        return True
+
+    def push(self, conversation: Conversation, turn: Turn) -> None:
+        """Add an already numbered turn, trimming the oldest ones past ``max_turns``."""
+        delta = turn.size
+        conversation.turns.append(turn)
+        conversation.next_seq = turn.seq + 1
+        while len(conversation.turns) > self.max_turns:
+            delta -= conversation.turns.popleft().size
+        conversation.size += delta
+        conversation.last_used = time.monotonic()
+        # The conversation may have been evicted while its request was in flight.
+        if self._conversations.get(conversation.id) is conversation:
+            self._bytes += delta
+            self._conversations.move_to_end(conversation.id)
+            self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "conversations": len(self._conversations),
+            "bytes": self._bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _evict(self) -> None:
+        # Never evict the most recently used conversation, even if it alone exceeds the budget.
+        while self._bytes > self.max_bytes and len(self._conversations) > 1:
+            _, oldest = self._conversations.popitem(last=False)
+            self._bytes -= oldest.size
+            self.evictions += 1
+
+    def _expire(self) -> None:
+        # Least recently used first, so expired conversations sit at the front.
+        now = time.monotonic()
+        while self._conversations:
+            oldest = next(iter(self._conversations.values()))
+            if oldest.last_used + self.ttl_seconds > now:
+                break
+            self.discard(oldest.id)
+            self.expirations += 1
+
+
+def add_context(request: ChatRequest, conversation: Conversation, budget: int) -> None:
+    """Fill in the earlier turns the request's model sees, within a prompt budget of ``budget`` tokens."""
+    fixed = get_tokenizer(request.model).prompt_tokens(request)
+    history = conversation.context(request.model.value, max(0, budget - fixed))
+    request._history = [{"role": turn.role, "content": turn.content} for turn in history]
+    request._history_tokens = sum(turn.tokens for turn in history)
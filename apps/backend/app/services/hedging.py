@@ -0,0 +1,224 @@
+"""
+Hedged requests: fire a backup call when the primary provider is slow.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Deque, Dict, Optional
+
+from app.schemas.chat import ChatRequest
+from app.services.llm_service import STREAM_ERROR_PREFIX, BaseLLMService
+from app.services.timing import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Rolling window of recent latencies for one provider and call kind."""
+
+    def __init__(self, window: int = 512, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th percentile, or None until enough samples are collected."""
+        if len(self._samples) < self.min_samples:
+            return None
+        return percentile(sorted(self._samples), p)
+
+
+class HedgeBudget:
+    """Caps hedges to ``ratio`` of requests, allowing a short burst of ``burst`` hedges."""
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._credits = burst
+
+    def record_request(self) -> None:
+        self._credits = min(self.burst, self._credits + self.ratio)
+
+    def try_acquire(self) -> bool:
+        if self._credits >= 1:
+            self._credits -= 1
+            return True
+        return False
+
+
+class HedgePolicy:
+    """Shared hedging state: per-provider latency trackers, the hedge budget and counters."""
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_delay: float = 0.5,
+        default_delay: float = 2.0,
+        budget_ratio: float = 0.1,
+        budget_burst: float = 10.0,
+        window: int = 512,
+        min_samples: int = 20,
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.budget = HedgeBudget(budget_ratio, budget_burst)
+        self.trackers: Dict[str, LatencyTracker] = {}
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def tracker(self, name: str) -> LatencyTracker:
+        tracker = self.trackers.get(name)
+        if tracker is None:
+            tracker = self.trackers[name] = LatencyTracker(self.window, self.min_samples)
+        return tracker
+
+    def delay(self, name: str) -> float:
+        observed = self.tracker(name).percentile(self.percentile)
+        if observed is None:
+            return self.default_delay
+        return max(self.min_delay, observed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "delays": {name: self.delay(name) for name in self.trackers},
+        }
+
+
+async def _cancel(task: "asyncio.Future[Any]") -> None:
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+class HedgedLLMService(BaseLLMService):
+    """Races a backup provider against the primary once the primary exceeds its hedge delay.
+
+    The delay is the configured percentile of the primary's recent latency
+    (completion time, or time to first token when streaming). Whichever call
+    answers first without an error wins and the other is cancelled; an error
+    is only surfaced when both attempts fail. A cancelled loser still records
+    its elapsed time, so the delay percentile is not biased towards winners.
+    """
+
+    def __init__(self, primary: BaseLLMService, backup: BaseLLMService, policy: HedgePolicy):
+        self.primary = primary
+        self.backup = backup
+        self.policy = policy
+        self.deployment = primary.deployment
+
+    async def get_completion(self, request: ChatRequest) -> Dict[str, Any]:
+        self.policy.requests += 1
+        self.policy.budget.record_request()
+        primary = asyncio.ensure_future(self._timed_completion(self.primary, request))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.policy.delay(f"{self.primary.deployment}:completion"))
+            if done or not self.policy.budget.try_acquire():
+                return await primary
+
+            self.policy.hedges_fired += 1
+            logger.info("Hedging %s completion to %s", self.primary.deployment, self.backup.deployment)
+            backup = asyncio.ensure_future(self._timed_completion(self.backup, request))
+            tasks.add(backup)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.policy.hedges_won += 1
+                        return task.result()
+            # Both attempts failed; surface the primary's error.
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    await _cancel(task)
+
+    async def get_streaming_completion(self, request: ChatRequest) -> AsyncGenerator[str, None]:
+        self.policy.requests += 1
+        self.policy.budget.record_request()
+        started = {self.primary: time.monotonic()}
+        streams = {self.primary: self.primary.get_streaming_completion(request)}
+        firsts = {asyncio.ensure_future(streams[self.primary].__anext__()): self.primary}
+        failed: Dict[BaseLLMService, "asyncio.Future[str]"] = {}
+        try:
+            done, _ = await asyncio.wait(firsts, timeout=self.policy.delay(f"{self.primary.deployment}:ttft"))
+            if not done and self.policy.budget.try_acquire():
+                self.policy.hedges_fired += 1
+                logger.info("Hedging %s stream to %s", self.primary.deployment, self.backup.deployment)
+                started[self.backup] = time.monotonic()
+                streams[self.backup] = self.backup.get_streaming_completion(request)
+                firsts[asyncio.ensure_future(streams[self.backup].__anext__())] = self.backup
+
+            # The first attempt to produce a real first chunk wins; an error, an
+            # in-band error chunk or an empty stream loses while the other is pending.
+            winner = None
+            while firsts and winner is None:
+                done, _ = await asyncio.wait(firsts, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    service = firsts.pop(task)
+                    if winner is None and not _failed_first_chunk(task):
+                        winner, first_chunk = service, task.result()
+                    else:
+                        failed[service] = task
+                        await streams.pop(service).aclose()
+
+            now = time.monotonic()
+            for task, service in firsts.items():
+                # Still waiting when it lost: its time to first token is at least this long.
+                self.policy.tracker(f"{service.deployment}:ttft").observe(now - started[service])
+                await _cancel(task)
+                await streams.pop(service).aclose()
+            firsts.clear()
+
+            if winner is None:
+                # Every attempt failed; surface the primary's outcome.
+                outcome = failed[self.primary]
+                if isinstance(outcome.exception(), StopAsyncIteration):
+                    return
+                yield outcome.result()
+                return
+
+            if winner is self.backup:
+                self.policy.hedges_won += 1
+            self.policy.tracker(f"{winner.deployment}:ttft").observe(now - started[winner])
+            yield first_chunk
+            async for chunk in streams[winner]:
+                yield chunk
+        finally:
+            for task in firsts:
+                if not task.done():
+                    await _cancel(task)
+            for stream in streams.values():
+                await stream.aclose()
+
+    async def _timed_completion(self, service: BaseLLMService, request: ChatRequest) -> Dict[str, Any]:
+        start = time.monotonic()
+        try:
+            result = await service.get_completion(request)
+        except asyncio.CancelledError:
+            # Cancelled as the losing attempt: its latency is at least this long.
+            self.policy.tracker(f"{service.deployment}:completion").observe(time.monotonic() - start)
+            raise
+        self.policy.tracker(f"{service.deployment}:completion").observe(time.monotonic() - start)
+        return result
+
+
+def _failed_first_chunk(task: "asyncio.Future[str]") -> bool:
+    if task.exception() is not None:
+        return True
+    return task.result().startswith(STREAM_ERROR_PREFIX)
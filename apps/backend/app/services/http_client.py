@@ -0,0 +1,50 @@
+"""
+Shared, tuned HTTP connection pools for the upstream LLM providers.
+"""
+
+import importlib.util
+import logging
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.services.llm_service import REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build one provider's pooled client from the HTTP_* settings.
+
+    HTTP/2 needs the optional ``h2`` package; without it the client falls
+    back to HTTP/1.1 keep-alive.
+    """
+    http2 = settings.HTTP2_ENABLED
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed; using HTTP/1.1")
+        http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+    )
+
+
+async def prewarm(client: httpx.AsyncClient, url: Optional[str]) -> None:
+    """Open a pooled connection to ``url`` so DNS and TLS are done before the first request.
+
+    Any HTTP status counts as success; only the connection matters.
+    """
+    if not url:
+        return
+    try:
+        await client.head(url, timeout=settings.HTTP_CONNECT_TIMEOUT_SECONDS)
+        logger.info("Pre-warmed connection to %s", httpx.URL(url).host)
+    except httpx.HTTPError as e:
+        logger.warning("Connection pre-warm to %s failed: %s", url, e)
@@ -1,60 +1,166 @@
 import time
 import logging
 import asyncio
-from typing import AsyncGenerator, Dict, Any
+from contextlib import aclosing
+from typing import AsyncGenerator, Dict, Any, Optional, Tuple
+import httpx
 from fastapi import HTTPException
-from openai import AsyncAzureOpenAI, AsyncOpenAI, APIError, APITimeoutError
+from openai import AsyncAzureOpenAI, AsyncOpenAI, APIError, APITimeoutError, RateLimitError
 from app.core.config import settings
-from app.schemas.chat import ChatRequest
+from app.schemas.chat import ChatRequest, ModelName
+from app.services.timing import StreamTimer, completion_timings, llm_tokens, timing_registry
+from app.services.tokenizer import size_request
 
 logger = logging.getLogger(__name__)
 
 REQUEST_TIMEOUT = 60  # seconds
+# Streams report upstream failures in-band, as a final delta starting with this.
+STREAM_ERROR_PREFIX = "\n\n[Error: "
+
+
+class StreamStats:
+    """Outcomes of upstream streams, used to estimate what early cancellation saves.
+
+    Savings are estimated against the average length of streams that ran to
+    completion, since the true length of an abandoned answer is unknown.
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.completed_tokens = 0
+        self.cancelled = 0
+        self.tokens_saved = 0
+
+    def record_completed(self, tokens: int) -> None:
+        self.completed += 1
+        self.completed_tokens += tokens
+
+    def record_cancelled(self, tokens: int) -> int:
+        average = self.completed_tokens / self.completed if self.completed else 0
+        saved = max(0, round(average) - tokens)
+        self.cancelled += 1
+        self.tokens_saved += saved
+        return saved
 
 
 class BaseLLMService:
+    name: str = ""
+    deployment: str = ""
+    # Set on providers only; their timings are recorded under this model.
+    model: Optional[ModelName] = None
+    # Completion token cap sent upstream; None lets the deployment decide.
+    max_tokens: Optional[int] = None
+    # Prompt plus completion tokens the deployment accepts; None skips the pre-dispatch check.
+    context_window: Optional[int] = None
+    client: Any = None
+
+    def open(self, http_client: Optional[httpx.AsyncClient] = None) -> None:
+        """Create the upstream SDK client; called once from the app lifespan."""
+
+    async def aclose(self) -> None:
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    def _require_client(self) -> Any:
+        if self.client is None:
+            raise HTTPException(status_code=503, detail=f"{self.name} is not configured.")
+        return self.client
+
+    def _size(self, request: ChatRequest) -> Tuple[int, Optional[int]]:
+        """Prompt tokens and the max_tokens to send; raises 400 when the prompt leaves no room for a reply."""
+        return size_request(request, self.model, self.context_window, self.max_tokens, self.name)
+
     async def get_completion(self, request: ChatRequest) -> Dict[str, Any]:
         raise NotImplementedError
 
     async def get_streaming_completion(self, request: ChatRequest) -> AsyncGenerator[str, None]:
         raise NotImplementedError
 
+    def get_cached_completion(self, request: ChatRequest) -> Optional[Dict[str, Any]]:
+        """A stored result for ``request``, without calling upstream; only caching layers have one."""
+        return None
+
+    async def _relay(self, stream: Any, timer: StreamTimer) -> AsyncGenerator[str, None]:
+        """Yield content deltas from an SDK stream, closing it as soon as the consumer goes away."""
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    # Streamed chunks carry roughly one token each.
+                    timer.token()
+                    yield chunk.choices[0].delta.content
+        except (GeneratorExit, asyncio.CancelledError):
+            await stream.close()
+            saved = self.stream_stats.record_cancelled(timer.tokens)
+            logger.info(
+                "%s stream closed by client after %d tokens (~%d tokens saved)", self.name, timer.tokens, saved
+            )
+            raise
+        self.stream_stats.record_completed(timer.tokens)
+        timing_registry.record(self.model.value, "upstream", timer.summary())
+
+    def _completion_result(self, response: Any, reply: str, start_time: float) -> Dict[str, Any]:
+        latency = time.perf_counter() - start_time
+        usage = response.usage.model_dump() if response.usage else None
+        timings = completion_timings(latency, usage.get("completion_tokens") if usage else None)
+        timing_registry.record(self.model.value, "upstream", timings)
+        if usage and usage.get("prompt_tokens"):
+            llm_tokens.labels(self.model.value, "prompt").inc(usage["prompt_tokens"])
+        return {
+            "reply": reply,
+            "model": self.deployment,
+            "usage": usage,
+            "latency": round(latency, 3),
+            "timings": timings,
+        }
+
 
 class AzureOpenAIService(BaseLLMService):
     """Azure AI Foundry - gpt-4o-mini."""
 
+    name = "Azure AI Foundry"
+    model = ModelName.GPT4
+
     def __init__(self):
+        self.endpoint = settings.AZURE_ENDPOINT.rstrip("/") if settings.AZURE_ENDPOINT else ""
+        self.deployment = settings.AZURE_DEPLOYMENT
+        self.max_tokens = settings.AZURE_MAX_COMPLETION_TOKENS
+        self.context_window = settings.AZURE_CONTEXT_WINDOW
+        self.stream_stats = StreamStats()
+
+    def open(self, http_client: Optional[httpx.AsyncClient] = None) -> None:
+        if not (self.endpoint and settings.AZURE_KEY):
+            logger.warning("Azure AI Foundry credentials are not set; gpt-4 requests will fail")
+            return
         self.client = AsyncAzureOpenAI(
             api_version=settings.AZURE_API_VERSION,
-            azure_endpoint=settings.AZURE_ENDPOINT.rstrip("/") if settings.AZURE_ENDPOINT else "",
+            azure_endpoint=self.endpoint,
             api_key=settings.AZURE_KEY,
             timeout=REQUEST_TIMEOUT,
+            http_client=http_client,
         )
-        self.deployment = settings.AZURE_DEPLOYMENT
 
     async def get_completion(self, request: ChatRequest) -> Dict[str, Any]:
-        start_time = time.time()
+        client = self._require_client()
+        _, max_tokens = self._size(request)
+        start_time = time.perf_counter()
         try:
-            response = await self.client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.deployment,
-                messages=[
-                    {"role": "system", "content": request.system_prompt or ""},
-                    {"role": "user", "content": request.message},
-                ],
-                max_tokens=4096,
+                messages=request.to_messages(),
+                max_tokens=max_tokens,
                 temperature=0.7,
                 top_p=1.0,
             )
-            latency = time.time() - start_time
-            return {
-                "reply": response.choices[0].message.content or "",
-                "model": self.deployment,
-                "usage": response.usage.model_dump() if response.usage else None,
-                "latency": round(latency, 3),
-            }
+            return self._completion_result(response, response.choices[0].message.content or "", start_time)
         except APITimeoutError:
             logger.error("Azure AI Foundry request timed out")
             raise HTTPException(status_code=504, detail="Azure AI Foundry request timed out. Please try again.")
+        except RateLimitError:
+            logger.warning("Azure AI Foundry rate limit reached")
+            raise HTTPException(
+                status_code=429, detail="Azure AI Foundry rate limit reached. Please try again shortly."
+            )
         except APIError as e:
             logger.error("Azure AI Foundry API error: status=%s", e.status_code)
             raise HTTPException(status_code=502, detail="Azure AI Foundry service error. Please try again.")
@@ -63,65 +169,82 @@ class AzureOpenAIService(BaseLLMService):
             raise HTTPException(status_code=500, detail="An unexpected error occurred with Azure AI Foundry.")
 
     async def get_streaming_completion(self, request: ChatRequest) -> AsyncGenerator[str, None]:
+        client = self._require_client()
+        _, max_tokens = self._size(request)
+        timer = StreamTimer()
         try:
-            stream = await self.client.chat.completions.create(
+            stream = await client.chat.completions.create(
                 model=self.deployment,
-                messages=[
-                    {"role": "system", "content": request.system_prompt or ""},
-                    {"role": "user", "content": request.message},
-                ],
+                messages=request.to_messages(),
+                max_tokens=max_tokens,
                 stream=True,
             )
-            async for chunk in stream:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            timer.connect()
+            async with aclosing(self._relay(stream, timer)) as deltas:
+                async for delta in deltas:
+                    yield delta
         except APITimeoutError:
             logger.error("Azure AI Foundry stream timed out")
-            yield "\n\n[Error: Request timed out. Please try again.]"
+            yield f"{STREAM_ERROR_PREFIX}Request timed out. Please try again.]"
+        except RateLimitError:
+            # Raised rather than yielded so upstream layers can see the 429.
+            logger.warning("Azure AI Foundry stream rate limit reached")
+            raise HTTPException(
+                status_code=429, detail="Azure AI Foundry rate limit reached. Please try again shortly."
+            )
         except APIError as e:
             logger.error("Azure AI Foundry stream API error: status=%s", e.status_code)
-            yield "\n\n[Error: Azure AI Foundry service error.]"
+            yield f"{STREAM_ERROR_PREFIX}Azure AI Foundry service error.]"
         except Exception:
             logger.exception("Unexpected Azure AI Foundry stream error")
-            yield "\n\n[Error: An unexpected error occurred.]"
+            yield f"{STREAM_ERROR_PREFIX}An unexpected error occurred.]"
 
 
 class DeepSeekService(BaseLLMService):
     """Azure AI Foundry - DeepSeek-R1 (OpenAI-compatible API)."""
 
+    name = "DeepSeek"
+    model = ModelName.DEEPSEEK
+
     def __init__(self):
         endpoint = (settings.DEEPSEEK_ENDPOINT or "").rstrip("/")
         if endpoint and "/openai/v1" not in endpoint:
             endpoint = f"{endpoint}/openai/v1"
+        self.endpoint = endpoint
+        self.deployment = settings.DEEPSEEK_DEPLOYMENT
+        self.max_tokens = settings.DEEPSEEK_MAX_COMPLETION_TOKENS
+        self.context_window = settings.DEEPSEEK_CONTEXT_WINDOW
+        self.stream_stats = StreamStats()
+
+    def open(self, http_client: Optional[httpx.AsyncClient] = None) -> None:
         api_key = settings.DEEPSEEK_API_KEY or settings.AZURE_KEY
+        if not (self.endpoint and api_key):
+            logger.warning("DeepSeek credentials are not set; deepseek requests will fail")
+            return
         self.client = AsyncOpenAI(
-            base_url=f"{endpoint}/" if endpoint else "",
+            base_url=f"{self.endpoint}/",
             api_key=api_key,
             timeout=REQUEST_TIMEOUT,
+            http_client=http_client,
         )
-        self.deployment = settings.DEEPSEEK_DEPLOYMENT
 
     async def get_completion(self, request: ChatRequest) -> Dict[str, Any]:
-        start_time = time.time()
+        client = self._require_client()
+        _, max_tokens = self._size(request)
+        start_time = time.perf_counter()
         try:
-            completion = await self.client.chat.completions.create(
+            completion = await client.chat.completions.create(
                 model=self.deployment,
-                messages=[
-                    {"role": "system", "content": request.system_prompt or ""},
-                    {"role": "user", "content": request.message},
-                ],
+                messages=request.to_messages(),
+                max_tokens=max_tokens,
             )
-            latency = time.time() - start_time
-            msg = completion.choices[0].message
-            return {
-                "reply": msg.content or "",
-                "model": self.deployment,
-                "usage": completion.usage.model_dump() if completion.usage else None,
-                "latency": round(latency, 3),
-            }
+            return self._completion_result(completion, completion.choices[0].message.content or "", start_time)
         except APITimeoutError:
             logger.error("DeepSeek request timed out")
             raise HTTPException(status_code=504, detail="DeepSeek request timed out. Please try again.")
+        except RateLimitError:
+            logger.warning("DeepSeek rate limit reached")
+            raise HTTPException(status_code=429, detail="DeepSeek rate limit reached. Please try again shortly.")
         except APIError as e:
             logger.error("DeepSeek API error: status=%s", e.status_code)
             raise HTTPException(status_code=502, detail="DeepSeek service error. Please try again.")
@@ -130,24 +253,30 @@ class DeepSeekService(BaseLLMService):
             raise HTTPException(status_code=500, detail="An unexpected error occurred with DeepSeek.")
 
     async def get_streaming_completion(self, request: ChatRequest) -> AsyncGenerator[str, None]:
+        client = self._require_client()
+        _, max_tokens = self._size(request)
+        timer = StreamTimer()
         try:
-            stream = await self.client.chat.completions.create(
+            stream = await client.chat.completions.create(
                 model=self.deployment,
-                messages=[
-                    {"role": "system", "content": request.system_prompt or ""},
-                    {"role": "user", "content": request.message},
-                ],
+                messages=request.to_messages(),
+                max_tokens=max_tokens,
                 stream=True,
             )
-            async for chunk in stream:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            timer.connect()
+            async with aclosing(self._relay(stream, timer)) as deltas:
+                async for delta in deltas:
+                    yield delta
         except APITimeoutError:
             logger.error("DeepSeek stream timed out")
-            yield "\n\n[Error: Request timed out. Please try again.]"
+            yield f"{STREAM_ERROR_PREFIX}Request timed out. Please try again.]"
+        except RateLimitError:
+            # Raised rather than yielded so upstream layers can see the 429.
+            logger.warning("DeepSeek stream rate limit reached")
+            raise HTTPException(status_code=429, detail="DeepSeek rate limit reached. Please try again shortly.")
         except APIError as e:
             logger.error("DeepSeek stream API error: status=%s", e.status_code)
-            yield "\n\n[Error: DeepSeek service error.]"
+            yield f"{STREAM_ERROR_PREFIX}DeepSeek service error.]"
         except Exception:
             logger.exception("Unexpected DeepSeek stream error")
-            yield "\n\n[Error: An unexpected error occurred.]"
+            yield f"{STREAM_ERROR_PREFIX}An unexpected error occurred.]"
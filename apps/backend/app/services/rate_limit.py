@@ -0,0 +1,220 @@
+"""
+Client-side TPM/RPM rate limiting.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.schemas.chat import ChatRequest
+from app.services.llm_service import BaseLLMService
+from app.services.tokenizer import CHARS_PER_TOKEN, estimate_tokens, size_request
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to one minute of quota.
+
+    The level may go negative when a reconciled call used more than was
+    reserved; later callers then wait for the debt to be refilled.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def give(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self) -> None:
+        self._refill()
+        self.level = min(self.level, 0.0)
+
+
+@dataclass
+class Reservation:
+    tokens: int
+    prompt_tokens: int
+
+
+class DeploymentRateLimiter:
+    """Schedules calls to one deployment against its tokens- and requests-per-minute quota.
+
+    Each call reserves its counted prompt tokens plus an expected completion
+    size before dispatch, and the reservation is reconciled against the real
+    usage afterwards, so a longer reply is charged then. Callers wait in FIFO order for quota to refill; a call
+    that would wait longer than ``max_wait`` seconds, or that finds
+    ``max_queue`` callers already waiting, is shed with a 429 locally
+    instead of being sent upstream to collect one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tpm: Optional[int] = None,
+        rpm: Optional[int] = None,
+        max_wait: float = 5.0,
+        max_queue: int = 256,
+    ):
+        self.name = name
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._lock = asyncio.Lock()
+        self._waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.upstream_429s = 0
+
+    async def reserve(self, tokens: int, prompt_tokens: int) -> Reservation:
+        if self.tokens is not None:
+            # A reservation larger than the whole quota could never be admitted.
+            tokens = min(tokens, int(self.tokens.capacity))
+        if self._waiting >= self.max_queue:
+            self.shed += 1
+            raise self._shed(self.max_wait)
+
+        self._waiting += 1
+        try:
+            async with self._lock:
+                wait = self._wait_time(tokens)
+                if wait > self.max_wait:
+                    self.shed += 1
+                    raise self._shed(wait)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if self.tokens is not None:
+                    self.tokens.take(tokens)
+                if self.requests is not None:
+                    self.requests.take(1)
+        finally:
+            self._waiting -= 1
+        self.admitted += 1
+        return Reservation(tokens, prompt_tokens)
+
+    def reconcile(self, reservation: Reservation, used_tokens: int) -> None:
+        """Refund unused reserved tokens, or charge the overrun."""
+        if self.tokens is not None:
+            self.tokens.give(reservation.tokens - used_tokens)
+
+    def rate_limited(self) -> None:
+        """Upstream returned 429 anyway: assume the quota is exhausted for now."""
+        self.upstream_429s += 1
+        if self.tokens is not None:
+            self.tokens.drain()
+        if self.requests is not None:
+            self.requests.drain()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tokens_available": None if self.tokens is None else int(self.tokens.level),
+            "requests_available": None if self.requests is None else int(self.requests.level),
+            "waiting": self._waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "upstream_429s": self.upstream_429s,
+        }
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        return wait
+
+    def _shed(self, wait: float) -> HTTPException:
+        return HTTPException(
+            status_code=429,
+            detail=f"{self.name} is over its token quota. Please try again shortly.",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+
+class RateLimitedLLMService(BaseLLMService):
+    """Reserves quota on a DeploymentRateLimiter before every upstream call."""
+
+    def __init__(self, inner: BaseLLMService, limiter: DeploymentRateLimiter, expected_completion_tokens: int):
+        self.inner = inner
+        self.limiter = limiter
+        self.expected_completion_tokens = expected_completion_tokens
+        self.name = inner.name
+        self.deployment = inner.deployment
+        self.model = inner.model
+        self.context_window = inner.context_window
+        self.max_tokens = inner.max_tokens
+
+    async def get_completion(self, request: ChatRequest) -> Dict[str, Any]:
+        reservation = await self._reserve(request)
+        try:
+            result = await self.inner.get_completion(request)
+        except Exception as e:
+            self._failed(reservation, e)
+            raise
+        usage = result.get("usage") or {}
+        used = usage.get("total_tokens") or reservation.prompt_tokens + estimate_tokens(result.get("reply", ""))
+        self.limiter.reconcile(reservation, used)
+        return result
+
+    async def get_streaming_completion(self, request: ChatRequest) -> AsyncGenerator[str, None]:
+        reservation = await self._reserve(request)
+        # Streams carry no usage block, so estimate the completion from the text.
+        completion_chars = 0
+        failed = False
+        stream = self.inner.get_streaming_completion(request)
+        try:
+            async for chunk in stream:
+                completion_chars += len(chunk)
+                yield chunk
+        except Exception as e:
+            failed = True
+            self._failed(reservation, e)
+            raise
+        finally:
+            await stream.aclose()
+            if not failed:
+                # Also reached when the client disconnects mid-stream.
+                completion_tokens = math.ceil(completion_chars / CHARS_PER_TOKEN)
+                self.limiter.reconcile(reservation, reservation.prompt_tokens + completion_tokens)
+
+    def _failed(self, reservation: Reservation, error: Exception) -> None:
+        if isinstance(error, HTTPException) and error.status_code == 429:
+            self.limiter.rate_limited()
+        else:
+            # Failed calls are not billed.
+            self.limiter.reconcile(reservation, 0)
+
+    async def _reserve(self, request: ChatRequest) -> Reservation:
+        # Over-context prompts are rejected here, before they take any quota.
+        prompt_tokens, max_tokens = size_request(
+            request, self.model, self.context_window, self.max_tokens, self.name
+        )
+        # Reserving the hard cap (up to 32k for DeepSeek) would admit only a call or two per minute of
+        # quota; most replies are far shorter, and reconcile charges any overrun afterwards.
+        completion_tokens = min(max_tokens or self.expected_completion_tokens, self.expected_completion_tokens)
+        return await self.limiter.reserve(prompt_tokens + completion_tokens, prompt_tokens)
@@ -0,0 +1,325 @@
+"""
+Semantic response cache: serves paraphrases of recent prompts, matched by local embeddings.
+
+Embeddings are signed hashed character n-grams of the message's content
+words, computed with NumPy on the CPU; nothing leaves the process. Near neighbours
+are found with random-hyperplane LSH: each entry is bucketed under ``tables``
+codes of ``bits`` bits, a lookup scores only the entries sharing a bucket
+with the query, and the best one is served if its cosine similarity reaches
+the threshold. Recall is probabilistic (a paraphrase at cosine 0.9 lands in
+a shared bucket ~83% of the time with the defaults, one at 0.95 ~98%) and
+a miss just goes upstream.
+
+Only prompts with the same model, system prompt, conversation history and
+numbers can match: n-gram overlap cannot tell "2+2" from "2+3". For the same
+reason a match must also have the same content words in the same order, so
+paraphrases only differ in case, punctuation, contractions, plurals and
+filler words: "sorting in rust" never serves "sorting in python", nor "CSV
+to JSON" serve "JSON to CSV".
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+from app.schemas.chat import ChatRequest
+from app.services.cache import cache_hit, capture_stream
+from app.services.llm_service import BaseLLMService
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZES = (3, 4, 5)
+# Words that carry no topic; paraphrases add and drop them freely. Question
+# words, modals and words of direction, stance or negation (to, from, for,
+# against, not, no, without) are kept: "why is the sky blue" and "when is the
+# sky blue", or "from mysql to postgres" and "from postgres to mysql", are
+# different questions.
+STOP_WORDS = frozenset(
+    "a about am an and any are as at be do does give have hey hi i in is it me my of "
+    "on or please so tell than that the there this use using was we with you your".split()
+)
+_HASH_PRIME = 0x100000001B3
+_HASH_MIX = 0x9E3779B97F4A7C15
+
+_CONTRACTIONS = [
+    (re.compile(pattern), replacement)
+    for pattern, replacement in (
+        (r"\bcan't\b", "can not"),
+        (r"\bwon't\b", "will not"),
+        (r"n't\b", " not"),
+        (r"'re\b", " are"),
+        (r"'ve\b", " have"),
+        (r"'ll\b", " will"),
+        (r"'d\b", " would"),
+        (r"'m\b", " am"),
+        (r"\b(what|where|who|how|when|why|that|there|it|here)'s\b", r"\1 is"),
+    )
+]
+_NON_WORD = re.compile(r"[^\w]+")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, expand common contractions and reduce punctuation to single spaces."""
+    text = text.lower().replace("’", "'")
+    for pattern, replacement in _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def content_words(normalized: str) -> List[str]:
+    """The topic words of a normalized message in order, with a plural ``s`` folded away."""
+    return [
+        word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+        for word in normalized.split()
+        if word not in STOP_WORDS
+    ]
+
+
+class HashedNgramEmbedder:
+    """Unit-length ``dim``-dimensional bag of signed, hashed character n-grams.
+
+    Hashing is a vectorized polynomial rolling hash over the UTF-8 bytes, so
+    embedding a short prompt is a handful of NumPy calls rather than a Python
+    loop per n-gram.
+    """
+
+    def __init__(self, dim: int = 256):
+        if np is None:
+            raise RuntimeError("The semantic cache needs numpy; install it with `pip install numpy`.")
+        self.dim = dim
+
+    def embed(self, normalized: str) -> "np.ndarray":
+        """Embed text already passed through ``normalize``."""
+        data = np.frombuffer(f" {normalized} ".encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+        vector = np.zeros(self.dim, dtype=np.float64)
+        for n in NGRAM_SIZES:
+            count = len(data) - n + 1
+            if count <= 0:
+                continue
+            hashes = np.zeros(count, dtype=np.uint64)
+            for offset in range(n):
+                hashes = hashes * np.uint64(_HASH_PRIME) + data[offset:offset + count]
+            hashes ^= hashes >> np.uint64(29)
+            hashes *= np.uint64(_HASH_MIX)
+            hashes ^= hashes >> np.uint64(32)
+            signs = np.where(hashes & np.uint64(1), 1.0, -1.0)
+            buckets = ((hashes >> np.uint64(1)) % np.uint64(self.dim)).astype(np.intp)
+            vector += np.bincount(buckets, weights=signs, minlength=self.dim)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.astype(np.float32)
+
+
+class SemanticCache:
+    """Array-backed vector index of cached completions with LSH buckets, TTL and LRU eviction.
+
+    Vectors live in one preallocated ``(max_entries, dim)`` float32 matrix;
+    a slot is reused once its entry is evicted or expired. Buckets are keyed
+    by ``(table, namespace, code)``, so entries from other models and
+    contexts are never even scored. All access happens on the event loop, so
+    no locking is needed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        threshold: float,
+        dim: int = 256,
+        max_chars: int = 2000,
+        tables: int = 20,
+        bits: int = 16,
+        seed: int = 0,
+    ):
+        self.embedder = HashedNgramEmbedder(dim)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.max_chars = max_chars
+        self.tables = tables
+        self.bits = bits
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((dim, tables * bits)).astype(np.float32)
+        self._powers = 1 << np.arange(bits, dtype=np.int64)
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._values: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        # What a match must equal exactly: the ordered content words, or the whole message without any.
+        self._words: List[Optional[Tuple[str, ...]]] = [None] * max_entries
+        self._slot_keys: List[Optional[List[Tuple[int, str, int]]]] = [None] * max_entries
+        self._buckets: Dict[Tuple[int, str, int], List[int]] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._free = list(range(max_entries - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def key(self, deployment: str, request: ChatRequest) -> Optional[Tuple[str, "np.ndarray", Tuple[str, ...]]]:
+        """The request's namespace, embedding and content words, or None if it is too long to match on meaning."""
+        if len(request.message) > self.max_chars:
+            return None
+        context = json.dumps(
+            [deployment, request.system_prompt or "", request.to_messages()[1:-1], _NUMBER.findall(request.message)],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        namespace = hashlib.blake2b(context.encode("utf-8"), digest_size=16).hexdigest()
+        normalized = normalize(request.message)
+        words = content_words(normalized)
+        # Embedding only the topic words keeps paraphrases that differ in filler words together.
+        return namespace, self.embedder.embed(" ".join(words) or normalized), tuple(words) or (normalized,)
+
+    def lookup(
+        self, namespace: str, vector: "np.ndarray", words: Tuple[str, ...]
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """The closest live entry at or above the threshold with the same content words, with its similarity."""
+        candidates = set()
+        for key in self._bucket_keys(namespace, vector):
+            bucket = self._buckets.get(key)
+            if bucket:
+                candidates.update(bucket)
+        if not candidates:
+            self.misses += 1
+            return None
+
+        slots = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+        scores = self._vectors[slots] @ vector
+        expired = self._expires[slots] <= time.monotonic()
+        if expired.any():
+            scores[expired] = -1.0
+            for slot in slots[expired].tolist():
+                self._remove(slot)
+                self.expirations += 1
+        close = np.flatnonzero(scores >= self.threshold)
+        for index in close[np.argsort(-scores[close])].tolist():
+            slot = int(slots[index])
+            if self._words[slot] == words:
+                self._lru.move_to_end(slot)
+                self.hits += 1
+                return self._values[slot], float(scores[index])
+        self.misses += 1
+        return None
+
+    def store(self, namespace: str, vector: "np.ndarray", words: Tuple[str, ...], value: Dict[str, Any]) -> None:
+        slot = self._allocate()
+        keys = self._bucket_keys(namespace, vector)
+        self._vectors[slot] = vector
+        self._expires[slot] = time.monotonic() + self.ttl_seconds
+        self._values[slot] = value
+        self._words[slot] = words
+        self._slot_keys[slot] = keys
+        for key in keys:
+            self._buckets.setdefault(key, []).append(slot)
+        self._lru[slot] = None
+
+    def clear(self) -> None:
+        for slot in list(self._lru):
+            self._remove(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._lru),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _bucket_keys(self, namespace: str, vector: "np.ndarray") -> List[Tuple[int, str, int]]:
+        signs = (vector @ self._planes > 0).reshape(self.tables, self.bits)
+        return [(table, namespace, code) for table, code in enumerate((signs @ self._powers).tolist())]
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        # Least recently used first; an expired entry there is simply reused.
+        slot = next(iter(self._lru))
+        if self._expires[slot] <= time.monotonic():
+            self.expirations += 1
+        else:
+            self.evictions += 1
+        self._remove(slot)
+        return self._free.pop()
+
+    def _remove(self, slot: int) -> None:
+        for key in self._slot_keys[slot]:
+            bucket = self._buckets[key]
+            bucket.remove(slot)
+            if not bucket:
+                del self._buckets[key]
+        self._slot_keys[slot] = None
+        self._values[slot] = None
+        self._words[slot] = None
+        del self._lru[slot]
+        self._free.append(slot)
+
+
+class SemanticCachedLLMService(BaseLLMService):
+    """Serves completions for paraphrases of recently answered prompts before calling the wrapped service.
+
+    Like ``CachedLLMService``, completed streams are stored and stream hits
+    are left to callers of ``get_cached_completion``.
+    """
+
+    def __init__(self, inner: BaseLLMService, cache: SemanticCache):
+        self.inner = inner
+        self.cache = cache
+        self.deployment = inner.deployment
+
+    async def get_completion(self, request: ChatRequest) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        key = self.cache.key(self.deployment, request)
+        if key is not None:
+            found = self._lookup(key)
+            if found is not None:
+                return cache_hit(found, start_time)
+
+        result = await self.inner.get_completion(request)
+        if key is not None and not result.get("cached"):
+            self.cache.store(*key, result)
+        return result
+
+    def get_cached_completion(self, request: ChatRequest) -> Optional[Dict[str, Any]]:
+        start_time = time.perf_counter()
+        key = self.cache.key(self.deployment, request)
+        found = self._lookup(key) if key is not None else None
+        if found is not None:
+            return cache_hit(found, start_time)
+        return self.inner.get_cached_completion(request)
+
+    async def get_streaming_completion(self, request: ChatRequest) -> AsyncGenerator[str, None]:
+        chunks = self.inner.get_streaming_completion(request)
+        key = self.cache.key(self.deployment, request)
+        if key is None:
+            async with aclosing(chunks) as stream:
+                async for chunk in stream:
+                    yield chunk
+            return
+        chunks = capture_stream(chunks, self.deployment, lambda result: self.cache.store(*key, result))
+        async with aclosing(chunks) as stream:
+            async for chunk in stream:
+                yield chunk
+
+    def _lookup(self, key: Tuple[str, "np.ndarray", Tuple[str, ...]]) -> Optional[Dict[str, Any]]:
+        found = self.cache.lookup(*key)
+        if found is None:
+            return None
+        value, similarity = found
+        logger.info("Semantic cache hit on %s (similarity %.3f)", self.deployment, similarity)
+        return value
@@ -0,0 +1,162 @@
+"""
+Fan-out of one upstream token stream to concurrent identical subscribers.
+"""
+
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Set
+
+from app.schemas.chat import ChatRequest
+from app.services.cache import make_request_key
+from app.services.llm_service import BaseLLMService
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class _Subscriber:
+    __slots__ = ("queue", "position", "lagging")
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.position = 0
+        # A lagging subscriber reads from the shared buffer instead of its queue.
+        # New subscribers start lagging so they replay everything produced so far.
+        self.lagging = True
+
+    def offer(self, item: object) -> None:
+        if self.lagging:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.lagging = True
+
+
+class _Broadcast:
+    def __init__(self):
+        self.buffer: List[str] = []
+        self.subscribers: Set[_Subscriber] = set()
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional["asyncio.Task[None]"] = None
+
+
+class StreamHub:
+    """Shares one upstream stream per key among all concurrent subscribers.
+
+    The first subscriber for a key starts the producer. Every chunk is kept
+    in a per-stream buffer so late subscribers can replay what they missed
+    before switching to live delivery. Each subscriber has its own bounded
+    queue; one that falls behind is switched back to reading the buffer
+    rather than blocking the producer or the other subscribers. The producer
+    is cancelled as soon as the last subscriber goes away.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._streams: Dict[str, _Broadcast] = {}
+        self.producers = 0
+        self.joined = 0
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    async def subscribe(
+        self, key: str, factory: Callable[[], AsyncGenerator[str, None]]
+    ) -> AsyncGenerator[str, None]:
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.ensure_future(self._produce(key, broadcast, factory))
+            self.producers += 1
+        else:
+            self.joined += 1
+
+        subscriber = _Subscriber(self.queue_size)
+        broadcast.subscribers.add(subscriber)
+        try:
+            while True:
+                if subscriber.lagging:
+                    # Everything still queued is also in the buffer.
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    while subscriber.position < len(broadcast.buffer):
+                        chunk = broadcast.buffer[subscriber.position]
+                        subscriber.position += 1
+                        yield chunk
+                    if broadcast.done:
+                        break
+                    # Caught up: no await between the check above and here, so
+                    # the producer cannot have appended anything in between.
+                    subscriber.lagging = False
+
+                item = await subscriber.queue.get()
+                if item is _END:
+                    break
+                subscriber.position += 1
+                yield item
+
+            if broadcast.error is not None:
+                raise broadcast.error
+        finally:
+            broadcast.subscribers.discard(subscriber)
+            if not broadcast.subscribers and not broadcast.done and broadcast.task is not None:
+                logger.info("Last subscriber left; cancelling upstream stream")
+                self._forget(key, broadcast)
+                broadcast.task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active_streams": len(self._streams),
+            "subscribers": sum(len(b.subscribers) for b in self._streams.values()),
+            "producers": self.producers,
+            "joined": self.joined,
+        }
+
+    async def _produce(
+        self, key: str, broadcast: _Broadcast, factory: Callable[[], AsyncGenerator[str, None]]
+    ) -> None:
+        stream = factory()
+        try:
+            async for chunk in stream:
+                broadcast.buffer.append(chunk)
+                for subscriber in broadcast.subscribers:
+                    subscriber.offer(chunk)
+        except Exception as e:
+            logger.exception("Upstream stream failed")
+            broadcast.error = e
+        finally:
+            await stream.aclose()
+            broadcast.done = True
+            self._forget(key, broadcast)
+            for subscriber in broadcast.subscribers:
+                subscriber.offer(_END)
+
+    def _forget(self, key: str, broadcast: _Broadcast) -> None:
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
+
+
+class FanOutLLMService(BaseLLMService):
+    """Serves concurrent identical streaming requests from one upstream stream."""
+
+    def __init__(self, inner: BaseLLMService, hub: StreamHub):
+        self.inner = inner
+        self.hub = hub
+        self.deployment = inner.deployment
+
+    async def get_completion(self, request: ChatRequest) -> Dict[str, Any]:
+        return await self.inner.get_completion(request)
+
+    async def get_streaming_completion(self, request: ChatRequest) -> AsyncGenerator[str, None]:
+        key = make_request_key(self.deployment, request)
+        subscription = self.hub.subscribe(key, lambda: self.inner.get_streaming_completion(request))
+        # Close the subscription as soon as the caller stops reading so the
+        # hub can cancel the upstream stream once nobody is left.
+        async with aclosing(subscription) as chunks:
+            async for chunk in chunks:
+                yield chunk
@@ -0,0 +1,246 @@
+"""
+Resumable SSE streams: recent frames are kept server-side so a client that
+reconnects with ``Last-Event-ID`` picks up where it left off instead of
+re-running the generation.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import aclosing
+from typing import AsyncGenerator, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ResumableStream:
+    """Frames of one generation, numbered from 1, plus its producer task."""
+
+    def __init__(self, stream_id: str):
+        self.id = stream_id
+        self.frames: Deque[bytes] = deque()
+        # Sequence number of frames[0]; older frames have been trimmed.
+        self.first_seq = 1
+        self.next_seq = 1
+        self.size = 0
+        self.done = False
+        self.expires_at = float("inf")
+        self.subscribers = 0
+        # Next sequence number each attached client will read; frames before the lowest are delivered.
+        self.readers: Dict[object, int] = {}
+        # Cleared when the stream is dropped from the store to respect max_streams: it keeps
+        # running for its clients but buffers only frames they have not read yet.
+        self.resumable = True
+        self.task: Optional["asyncio.Task[None]"] = None
+        self.idle_handle: Optional[asyncio.TimerHandle] = None
+        # Replaced after every append so waiters wake up exactly once per change.
+        self.changed = asyncio.Event()
+
+
+class ResumableStreams:
+    """Recent SSE streams kept for replay, bounded in count, bytes and age.
+
+    Each generation runs on its own task and appends ``id:``-tagged frames to
+    a per-stream ring capped at ``max_stream_bytes``. Clients attach to a
+    stream to replay frames after a given sequence number and then follow the
+    live tail. When the last client detaches mid-generation the producer keeps
+    running for ``idle_timeout`` seconds so a reconnect can still resume; if
+    nobody comes back it is cancelled. Finished streams are kept for
+    ``ttl_seconds``.
+
+    ``max_streams`` and ``max_bytes`` are hard caps on what is held for
+    resumption. Over either, the oldest finished streams are evicted first.
+    Past the stream count, the oldest running streams then stop being
+    resumable. Past the byte budget, running streams are trimmed to a fair
+    share of it from their oldest frames, so their resume window shrinks.
+    Frames an attached client has not read yet are never trimmed by the
+    global budget, only by ``max_stream_bytes``.
+
+    All access happens on the event loop, so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        max_streams: int,
+        max_bytes: int,
+        max_stream_bytes: int,
+        ttl_seconds: float,
+        idle_timeout: float,
+    ):
+        self.max_streams = max_streams
+        self.max_bytes = max_bytes
+        self.max_stream_bytes = max_stream_bytes
+        self.ttl_seconds = ttl_seconds
+        self.idle_timeout = idle_timeout
+        self._streams: "OrderedDict[str, ResumableStream]" = OrderedDict()
+        self._bytes = 0
+        self.started = 0
+        self.resumed = 0
+        self.resume_misses = 0
+        self.abandoned = 0
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def start(self, frames: AsyncGenerator[bytes, None]) -> ResumableStream:
+        """Start producing ``frames`` into a new stream and return it."""
+        self._expire()
+        stream = ResumableStream(uuid.uuid4().hex)
+        self._streams[stream.id] = stream
+        stream.task = asyncio.ensure_future(self._produce(stream, frames))
+        self.started += 1
+        self._evict()
+        return stream
+
+    def find(self, last_event_id: Optional[str]) -> Optional[Tuple[ResumableStream, int]]:
+        """Resolve a ``Last-Event-ID`` header to a stream and the last sequence number the client saw.
+
+        Returns None when the stream is unknown, expired, or has already
+        dropped frames the client still needs.
+        """
+        if not last_event_id:
+            return None
+        stream_id, _, seq = last_event_id.partition(":")
+        stream = self._streams.get(stream_id)
+        if stream is not None and stream.expires_at <= time.monotonic():
+            self._remove(stream)
+            stream = None
+        if stream is None or not seq.isdigit() or not stream.first_seq - 1 <= int(seq) < stream.next_seq:
+            self.resume_misses += 1
+            return None
+        self.resumed += 1
+        return stream, int(seq)
+
+    async def attach(self, stream: ResumableStream, after: int = 0) -> AsyncGenerator[bytes, None]:
+        """Yield the frames numbered after ``after``, then the live tail until the stream ends."""
+        stream.subscribers += 1
+        if stream.idle_handle is not None:
+            stream.idle_handle.cancel()
+            stream.idle_handle = None
+        position = after + 1
+        reader = object()
+        stream.readers[reader] = position
+        try:
+            while True:
+                changed = stream.changed
+                while position < stream.next_seq:
+                    if position < stream.first_seq:
+                        # This client fell further behind than the ring holds;
+                        # it can reconnect, which starts a fresh generation.
+                        logger.warning("Client fell behind stream %s by more than the buffer; closing", stream.id)
+                        return
+                    frame = stream.frames[position - stream.first_seq]
+                    position += 1
+                    stream.readers[reader] = position
+                    yield frame
+                if stream.done:
+                    return
+                await changed.wait()
+        finally:
+            del stream.readers[reader]
+            stream.subscribers -= 1
+            if not stream.subscribers and not stream.done:
+                loop = asyncio.get_running_loop()
+                stream.idle_handle = loop.call_later(self.idle_timeout, self._abandon, stream)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "streams": len(self._streams),
+            "bytes": self._bytes,
+            "started": self.started,
+            "resumed": self.resumed,
+            "resume_misses": self.resume_misses,
+            "abandoned": self.abandoned,
+        }
+
+    async def _produce(self, stream: ResumableStream, frames: AsyncGenerator[bytes, None]) -> None:
+        try:
+            async with aclosing(frames) as source:
+                async for frame in source:
+                    self._append(stream, frame)
+        except Exception:
+            logger.exception("Resumable stream %s failed", stream.id)
+        finally:
+            stream.done = True
+            stream.expires_at = time.monotonic() + self.ttl_seconds
+            self._notify(stream)
+            # A stream that finished over budget is evicted now, not when the next one starts.
+            self._evict()
+
+    def _append(self, stream: ResumableStream, frame: bytes) -> None:
+        frame = b"id: " + f"{stream.id}:{stream.next_seq}".encode("ascii") + b"\n" + frame
+        stream.frames.append(frame)
+        stream.next_seq += 1
+        stream.size += len(frame)
+        if stream.resumable:
+            self._bytes += len(frame)
+        while stream.size > self.max_stream_bytes and len(stream.frames) > 1:
+            self._drop_oldest(stream)
+        if not stream.resumable:
+            self._trim(stream, 0)
+        elif self._bytes > self.max_bytes:
+            self._evict()
+        self._notify(stream)
+
+    @staticmethod
+    def _notify(stream: ResumableStream) -> None:
+        stream.changed.set()
+        stream.changed = asyncio.Event()
+
+    def _abandon(self, stream: ResumableStream) -> None:
+        stream.idle_handle = None
+        if stream.subscribers or stream.done:
+            return
+        logger.info(
+            "No client reattached to stream %s within %.0fs; cancelling generation", stream.id, self.idle_timeout
+        )
+        self.abandoned += 1
+        self._remove(stream)
+        if stream.task is not None:
+            stream.task.cancel()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for stream in [s for s in self._streams.values() if s.expires_at <= now]:
+            self._remove(stream)
+
+    def _evict(self) -> None:
+        for stream in [s for s in self._streams.values() if s.done]:
+            if len(self._streams) <= self.max_streams and self._bytes <= self.max_bytes:
+                return
+            self._remove(stream)
+        # Only running streams are left, oldest first.
+        while len(self._streams) > self.max_streams:
+            _, stream = self._streams.popitem(last=False)
+            self._bytes -= stream.size
+            stream.resumable = False
+            self._trim(stream, 0)
+        if self._bytes > self.max_bytes:
+            # Trim to three quarters of a fair share, so the next few appends do not trim again.
+            share = self.max_bytes * 3 // 4 // len(self._streams)
+            for stream in self._streams.values():
+                self._trim(stream, share)
+
+    def _trim(self, stream: ResumableStream, target: int) -> None:
+        """Drop the oldest frames down to ``target`` bytes, keeping any an attached client has yet to read."""
+        unread = min(stream.readers.values(), default=stream.next_seq)
+        while stream.size > target and stream.first_seq < unread:
+            self._drop_oldest(stream)
+
+    def _drop_oldest(self, stream: ResumableStream) -> None:
+        dropped = len(stream.frames.popleft())
+        stream.first_seq += 1
+        stream.size -= dropped
+        if stream.resumable:
+            self._bytes -= dropped
+
+    def _remove(self, stream: ResumableStream) -> None:
+        if self._streams.get(stream.id) is stream:
+            del self._streams[stream.id]
+            self._bytes -= stream.size
@@ -0,0 +1,149 @@
+"""
+Latency instrumentation for completions: connect time, time to first token,
+inter-token gaps and throughput, all measured on the monotonic clock.
+"""
+
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from app.core.metrics import registry
+
+llm_duration = registry.histogram(
+    "llm_request_duration_seconds", "Completion duration per model and stage.", ("model", "stage")
+)
+llm_connect = registry.histogram(
+    "llm_connect_seconds", "Time until upstream stream response headers arrived.", ("model",)
+)
+llm_ttft = registry.histogram("llm_ttft_seconds", "Time to first token per model and stage.", ("model", "stage"))
+llm_tokens = registry.counter("llm_tokens_total", "Tokens used per model, by prompt or completion.", ("model", "type"))
+
+
+def percentile(ordered: Sequence[float], p: float) -> float:
+    """Nearest-rank p-th percentile of an already sorted, non-empty sequence."""
+    rank = math.ceil(p / 100 * len(ordered))
+    return ordered[min(len(ordered), max(rank, 1)) - 1]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+class StreamTimer:
+    """Timestamps of one streamed completion, taken with ``time.perf_counter``.
+
+    ``connect`` marks when the upstream response headers arrived, ``token``
+    each content delta (roughly one token each). Splitting the two separates
+    network and queueing time from the model's own prefill and decode time.
+    """
+
+    __slots__ = ("start", "connected", "first_token", "last_token", "tokens", "_gaps")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.connected: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.last_token: Optional[float] = None
+        self.tokens = 0
+        self._gaps: List[float] = []
+
+    def connect(self) -> None:
+        self.connected = time.perf_counter()
+
+    def token(self) -> None:
+        now = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now
+        else:
+            self._gaps.append(now - self.last_token)
+        self.last_token = now
+        self.tokens += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Timings in seconds, plus token count and decode throughput (tokens after the first per second)."""
+        end = time.perf_counter()
+        gaps = sorted(self._gaps)
+        decode = (self.last_token - self.first_token) if self.tokens > 1 else 0.0
+        return {
+            "connect": _round(None if self.connected is None else self.connected - self.start),
+            "ttft": _round(None if self.first_token is None else self.first_token - self.start),
+            "total": _round(end - self.start),
+            "tokens": self.tokens,
+            "tokens_per_second": round((self.tokens - 1) / decode, 1) if decode > 0 else None,
+            "gap_p50": _round(percentile(gaps, 50)) if gaps else None,
+            "gap_p95": _round(percentile(gaps, 95)) if gaps else None,
+        }
+
+
+def completion_timings(total: float, tokens: Optional[int]) -> Dict[str, Any]:
+    """Timings for a non-streamed completion, where the whole reply arrives at once."""
+    return {
+        "connect": None,
+        "ttft": _round(total),
+        "total": _round(total),
+        "tokens": tokens,
+        "tokens_per_second": round(tokens / total, 1) if tokens and total > 0 else None,
+        "gap_p50": None,
+        "gap_p95": None,
+    }
+
+
+class TimingRegistry:
+    """Rolling windows of recent timings per model and stage.
+
+    ``upstream`` timings are taken by the providers around the SDK call;
+    ``client`` timings are taken by the endpoints as frames leave the server,
+    so the difference between the two is time spent in this service.
+    All access happens on the event loop, so no locking is needed.
+    """
+
+    FIELDS = ("connect", "ttft", "total", "tokens_per_second", "gap_p50", "gap_p95")
+
+    def __init__(self, window: int = 512):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Dict[str, Deque[float]]] = {}
+        self._counts: Dict[Tuple[str, str], int] = {}
+        self._tokens: Dict[Tuple[str, str], int] = {}
+
+    def record(self, model: str, stage: str, timings: Dict[str, Any]) -> None:
+        key = (model, stage)
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = {field: deque(maxlen=self.window) for field in self.FIELDS}
+        for field in self.FIELDS:
+            value = timings.get(field)
+            if value is not None:
+                samples[field].append(value)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._tokens[key] = self._tokens.get(key, 0) + (timings.get("tokens") or 0)
+
+        if timings.get("total") is not None:
+            llm_duration.labels(model, stage).observe(timings["total"])
+        if timings.get("ttft") is not None:
+            llm_ttft.labels(model, stage).observe(timings["ttft"])
+        if stage == "upstream":
+            if timings.get("connect") is not None:
+                llm_connect.labels(model).observe(timings["connect"])
+            if timings.get("tokens"):
+                llm_tokens.labels(model, "completion").inc(timings["tokens"])
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """p50/p95 of each field per model and stage, over the recent window."""
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (model, stage), samples in self._samples.items():
+            summary: Dict[str, Any] = {"count": self._counts[(model, stage)], "tokens": self._tokens[(model, stage)]}
+            for field, values in samples.items():
+                if values:
+                    ordered = sorted(values)
+                    summary[field] = {"p50": percentile(ordered, 50), "p95": percentile(ordered, 95)}
+            result.setdefault(model, {})[stage] = summary
+        return result
+
+    def clear(self) -> None:
+        self._samples.clear()
+        self._counts.clear()
+        self._tokens.clear()
+
+
+timing_registry = TimingRegistry()
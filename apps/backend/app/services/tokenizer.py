@@ -0,0 +1,176 @@
+"""
+Prompt token counting and completion sizing against each deployment's context window.
+
+Counting is exact when a BPE vocabulary for the model is available locally
+and the matching optional library is installed: ``tiktoken`` for ``.tiktoken``
+rank files (GPT models), ``tokenizers`` for Hugging Face ``tokenizer.json``
+files (DeepSeek). Otherwise a fast character-based estimate is used. Nothing
+is ever downloaded.
+"""
+
+import functools
+import logging
+import math
+import os
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.schemas.chat import ChatRequest, ModelName
+
+logger = logging.getLogger(__name__)
+
+# Rough OpenAI-style accounting: ~4 characters per token, a few tokens of
+# framing per chat message and a few more to prime the reply.
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4
+REPLY_PRIMING_TOKENS = 3
+# A prompt that leaves less room than this for the reply is rejected outright.
+MIN_COMPLETION_TOKENS = 256
+
+# Pre-tokenization patterns for tiktoken rank files, which do not carry their own.
+TIKTOKEN_PATTERNS = {
+    "o200k_base": "|".join([
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]*[\p{Ll}\p{Lm}\p{Lo}\p{M}]+(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",  # noqa: E501
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]+[\p{Ll}\p{Lm}\p{Lo}\p{M}]*(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",  # noqa: E501
+        r"""\p{N}{1,3}""",
+        r""" ?[^\s\p{L}\p{N}]+[\r\n/]*""",
+        r"""\s*[\r\n]+""",
+        r"""\s+(?!\S)""",
+        r"""\s+""",
+    ]),
+    "cl100k_base": (
+        r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]++[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""  # noqa: E501
+    ),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class ApproximateCounter:
+    """Characters divided by four; within ~10-20% for English prose and free to compute."""
+
+    exact = False
+
+    def count(self, text: str) -> int:
+        return estimate_tokens(text)
+
+
+class TiktokenCounter:
+    exact = True
+
+    def __init__(self, path: str, encoding: str):
+        import tiktoken
+        from tiktoken.load import load_tiktoken_bpe
+
+        self._encoding = tiktoken.Encoding(
+            name=encoding,
+            pat_str=TIKTOKEN_PATTERNS[encoding],
+            mergeable_ranks=load_tiktoken_bpe(path),
+            special_tokens={},
+        )
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode_ordinary(text))
+
+
+class HuggingFaceCounter:
+    exact = True
+
+    def __init__(self, path: str):
+        from tokenizers import Tokenizer as HFTokenizer
+
+        self._tokenizer = HFTokenizer.from_file(path)
+
+    def count(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def load_counter(path: Optional[str], encoding: str = "o200k_base"):
+    """An exact counter for the vocabulary at ``path``, or the approximate one if it cannot be loaded."""
+    if not path:
+        return ApproximateCounter()
+    if not os.path.isfile(path):
+        logger.warning("Tokenizer vocabulary %s not found; using approximate token counts", path)
+        return ApproximateCounter()
+    try:
+        if path.endswith(".json"):
+            return HuggingFaceCounter(path)
+        return TiktokenCounter(path, encoding)
+    except ImportError as e:
+        logger.warning("Cannot load %s without the optional %r package; using approximate token counts", path, e.name)
+    except Exception:
+        logger.exception("Failed to load tokenizer vocabulary %s; using approximate token counts", path)
+    return ApproximateCounter()
+
+
+class Tokenizer:
+    """Counts chat prompt tokens for one model.
+
+    System prompts repeat across nearly every request, so their counts are
+    memoized. Recent message counts are memoized too, so the rate limiter and
+    the provider sizing the same request only tokenize it once.
+    """
+
+    def __init__(self, counter, cache_size: int = 256):
+        self.counter = counter
+        self.exact = counter.exact
+        self.system_tokens = functools.lru_cache(maxsize=cache_size)(self.message_tokens)
+        self._recent_tokens = functools.lru_cache(maxsize=cache_size)(self.message_tokens)
+
+    def count(self, text: str) -> int:
+        return self.counter.count(text)
+
+    def message_tokens(self, content: str) -> int:
+        """Tokens for one chat message, framing included."""
+        return self.count(content) + TOKENS_PER_MESSAGE
+
+    def prompt_tokens(self, request: ChatRequest) -> int:
+        """Prompt tokens for the full ``messages`` list, reusing the conversation's stored turn counts."""
+        return (
+            self.system_tokens(request.system_prompt or "")
+            + request._history_tokens
+            + self._recent_tokens(request.message)
+            + REPLY_PRIMING_TOKENS
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(model: Optional[ModelName] = None) -> Tokenizer:
+    """The model's tokenizer, loaded on first use; ``None`` gives the approximate one."""
+    if model is None:
+        return Tokenizer(ApproximateCounter())
+    path = settings.AZURE_TOKENIZER_PATH if model == ModelName.GPT4 else settings.DEEPSEEK_TOKENIZER_PATH
+    return Tokenizer(load_counter(path, settings.TOKENIZER_TIKTOKEN_ENCODING))
+
+
+def size_request(
+    request: ChatRequest,
+    model: Optional[ModelName],
+    context_window: Optional[int],
+    max_tokens: Optional[int],
+    name: str = "The model",
+) -> Tuple[int, Optional[int]]:
+    """Return ``(prompt_tokens, max_tokens)`` for a request, before anything is sent upstream.
+
+    ``max_tokens`` is the deployment's completion cap shrunk to whatever the
+    prompt leaves of the context window. A prompt that leaves less than
+    ``MIN_COMPLETION_TOKENS`` is rejected with a 400, saving the round trip
+    and the quota reservation.
+    """
+    prompt_tokens = get_tokenizer(model).prompt_tokens(request)
+    if context_window is None:
+        return prompt_tokens, max_tokens
+    remaining = context_window - prompt_tokens
+    if remaining < MIN_COMPLETION_TOKENS:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"The message is too long for {name}: about {prompt_tokens} tokens of a "
+                f"{context_window}-token context window. Please shorten it or start a new conversation."
+            ),
+        )
+    return prompt_tokens, remaining if max_tokens is None else min(max_tokens, remaining)
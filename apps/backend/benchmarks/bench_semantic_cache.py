@@ -0,0 +1,159 @@
+"""
+Microbenchmark: semantic cache hit rate and lookup latency.
+
+Fills one namespace (the worst case: same model, system prompt and no
+history) with synthetic questions, then looks up paraphrases of cached
+questions, which should hit, and questions differing only in their subject,
+their question word or modal, or (in longer prompts) their direction,
+stance, negation or word order, which should not.
+
+    cd apps/backend && python -m benchmarks.bench_semantic_cache --entries 100000
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, List, Tuple
+
+from app.schemas.chat import ChatRequest
+from app.services.semantic_cache import SemanticCache
+from app.services.timing import percentile
+
+TEMPLATES = [
+    "What is {}?",
+    "How do I get started with {}?",
+    "Explain {} in simple terms.",
+    "What are the main benefits of {}?",
+    "Give me a short summary of {}.",
+    "What are common mistakes with {}?",
+    "How does {} work under the hood?",
+    "Compare {} with the alternatives.",
+]
+ADJECTIVES = (
+    "async distributed embedded functional reactive relational columnar streaming serverless incremental "
+    "lock-free persistent immutable probabilistic vectorized concurrent declarative typed compiled sharded"
+).split()
+NOUNS = (
+    "caching queues databases compilers schedulers allocators indexes parsers routers proxies "
+    "tokenizers profilers loggers sockets pipelines hashing consensus replication transactions iterators "
+    "generators closures coroutines actors graphs tries heaps"
+).split()
+DOMAINS = (
+    "python rust go java kotlin swift haskell elixir scala typescript zig julia ocaml erlang clojure "
+    "linux kubernetes postgres redis kafka spark nginx envoy sqlite"
+).split()
+# Cached question, then one that differs only in its question word or modal.
+QUESTION_WORD_PAIRS = [
+    ("Why is {} slow?", "When is {} slow?"),
+    ("How do I install {}?", "Should I install {}?"),
+    ("Can I use {} in production?", "Should I use {} in production?"),
+    ("What is {} used for?", "Who is {} used for?"),
+    ("Could {} replace a database?", "Would {} replace a database?"),
+]
+# Longer prompts where one direction, stance or negation word, or the word order, changes the answer.
+LONG_PROMPT_PAIRS = [
+    ("What is the safest way to migrate {} from MySQL to PostgreSQL?",
+     "What is the safest way to migrate {} from PostgreSQL to MySQL?"),
+    ("Write a script that converts the exported {} data from CSV to JSON",
+     "Write a script that converts the exported {} data from JSON to CSV"),
+    ("Summarize the strongest arguments for adopting {} in a large team",
+     "Summarize the strongest arguments against adopting {} in a large team"),
+    ("Is it safe to upgrade {} in production during business hours?",
+     "Is it not safe to upgrade {} in production during business hours?"),
+    ("Explain how {} authenticates the connection between client and server",
+     "Explain how {} authenticates the connection between server and client"),
+]
+
+
+def subjects() -> List[str]:
+    return [f"{adj} {noun} in {domain}" for adj in ADJECTIVES for noun in NOUNS for domain in DOMAINS]
+
+
+PARAPHRASES: List[Callable[[str], str]] = [
+    lambda q: q.lower(),
+    lambda q: q.upper(),
+    lambda q: q.rstrip("?.") + "??",
+    lambda q: q.replace("What is", "What's").replace("How do I", "How do i"),
+    lambda q: "  " + q.replace(" ", "  ") + "  ",
+    lambda q: q.rstrip("?.") + ", please?",
+    lambda q: "Hey, " + q,
+    lambda q: q.replace(" in ", " using ", 1),
+]
+
+
+def _pair_false_hit_rate(cache: SemanticCache, pairs: List[Tuple[str, str]], sample: List[str]) -> float:
+    """Cache the first question of each pair per subject, then look up the second; any hit is wrong."""
+    questions = [(cached.format(subject), other.format(subject)) for subject in sample for cached, other in pairs]
+    for cached, _ in questions:
+        cache.store(*cache.key("bench", ChatRequest(message=cached)), {"reply": cached})
+    hits = sum(1 for _, other in questions if cache.lookup(*cache.key("bench", ChatRequest(message=other))) is not None)
+    return hits / len(questions)
+
+
+def _timed_lookups(cache: SemanticCache, keys) -> List[float]:
+    latencies = []
+    for key in keys:
+        start = time.perf_counter()
+        cache.lookup(*key)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    questions = [template.format(subject) for subject in subjects() for template in TEMPLATES]
+    rng.shuffle(questions)
+    if len(questions) < args.entries + args.queries:
+        raise SystemExit(f"Only {len(questions):,} distinct questions available")
+    cached, unseen = questions[:args.entries], questions[args.entries:args.entries + args.queries]
+
+    cache = SemanticCache(
+        max_entries=args.entries, ttl_seconds=3600, threshold=args.threshold, dim=args.dim, max_chars=2000
+    )
+    start = time.perf_counter()
+    for question in cached:
+        cache.store(*cache.key("bench", ChatRequest(message=question)), {"reply": question})
+    fill_seconds = time.perf_counter() - start
+
+    sample = rng.sample(cached, args.queries)
+    start = time.perf_counter()
+    paraphrase_keys = [cache.key("bench", ChatRequest(message=rng.choice(PARAPHRASES)(q))) for q in sample]
+    embed_seconds = (time.perf_counter() - start) / args.queries
+    unseen_keys = [cache.key("bench", ChatRequest(message=q)) for q in unseen]
+
+    correct = sum(
+        1 for key, question in zip(paraphrase_keys, sample)
+        if (found := cache.lookup(*key)) is not None and found[0]["reply"] == question
+    )
+    false_hits = sum(1 for key in unseen_keys if cache.lookup(*key) is not None)
+    hit_latencies = _timed_lookups(cache, paraphrase_keys)
+    miss_latencies = _timed_lookups(cache, unseen_keys)
+    # Stored last: at capacity they evict entries the latency runs above look up.
+    pair_subjects = rng.sample(subjects(), args.queries // 5)
+    question_word_rate = _pair_false_hit_rate(cache, QUESTION_WORD_PAIRS, pair_subjects)
+    long_prompt_rate = _pair_false_hit_rate(cache, LONG_PROMPT_PAIRS, pair_subjects)
+
+    print(f"Semantic cache: {len(cache):,} entries, dim {args.dim}, threshold {args.threshold}")
+    print(f"  fill:          {args.entries / fill_seconds:>10,.0f} inserts/sec (embedding included)")
+    print(f"  key + embed:   {embed_seconds * 1e6:>10,.1f} us per prompt")
+    print(f"  paraphrase hit rate:  {correct / args.queries:>7.1%}  (served the right answer)")
+    print(f"  false hit rate:       {false_hits / args.queries:>7.1%}  (unseen question, cached template)")
+    print(f"  false hit rate:       {question_word_rate:>7.1%}  (other question word or modal)")
+    print(f"  false hit rate:       {long_prompt_rate:>7.1%}  (long prompt, other direction/stance/negation/order)")
+    for label, latencies in (("hit", hit_latencies), ("miss", miss_latencies)):
+        print(
+            f"  lookup {label:<4}   p50 {percentile(latencies, 50) * 1e6:>8,.1f} us"
+            f"   p99 {percentile(latencies, 99) * 1e6:>8,.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
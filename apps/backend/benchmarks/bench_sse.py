@@ -0,0 +1,55 @@
+"""
+Microbenchmark: SSE delta frames per second on one core.
+
+Compares the original path (json.dumps + f-string, then str -> bytes as
+Starlette does for str chunks) with the pre-encoded ``app.core.sse`` path.
+
+    cd apps/backend && python -m benchmarks.bench_sse
+"""
+
+import json
+import random
+import string
+import time
+
+from app.core import sse
+
+FRAMES = 200_000
+
+
+def _tokens(count: int):
+    rng = random.Random(0)
+    alphabet = string.ascii_letters + "  .,'\"\n"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 8))) for _ in range(count)]
+
+
+def legacy_frame(chunk: str) -> bytes:
+    payload = json.dumps({"type": "delta", "content": chunk})
+    return f"data: {payload}\n\n".encode("utf-8")
+
+
+def _bench(encode, tokens) -> float:
+    start = time.perf_counter()
+    for token in tokens:
+        encode(token)
+    return len(tokens) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    tokens = _tokens(FRAMES)
+    delta = sse.DeltaEncoder()
+    backend = "orjson" if sse.orjson is not None else "stdlib json"
+    # Warm up both paths before timing.
+    _bench(legacy_frame, tokens[:10_000])
+    _bench(delta, tokens[:10_000])
+
+    before = max(_bench(legacy_frame, tokens) for _ in range(3))
+    after = max(_bench(delta, tokens) for _ in range(3))
+    print(f"SSE delta frames/sec/core over {FRAMES:,} tokens (JSON backend: {backend})")
+    print(f"  before (json.dumps + f-string + encode): {before:>12,.0f}")
+    print(f"  after  (app.core.sse.DeltaEncoder):      {after:>12,.0f}")
+    print(f"  speedup: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""
+Load generator for /api/v1/chat/completions and /api/v1/chat/stream.
+
+Drives the backend with a configurable concurrency, arrival rate and prompt
+mix, and reports throughput, p50/p95/p99 latency and TTFT per endpoint. When
+it starts the backend itself (``--spawn``, against the local mock LLM) it
+also reports the server's memory per open stream and CPU time per frame.
+Results are written as JSON; pass ``--baseline`` to compare against an
+earlier run and fail on regressions.
+
+    cd apps/backend && python -m benchmarks.load_test --spawn --endpoint stream --concurrency 50 --requests 500
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --rate 20 --duration 60 \\
+        --baseline benchmarks/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.services.timing import percentile
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+PROMPTS = {
+    "short": "Say hello in one sentence.",
+    "medium": "Explain how HTTP keep-alive and connection pooling reduce latency for API clients. " * 4,
+    "long": "Summarize the following notes about event loops, backpressure and streaming responses. " * 40,
+}
+
+
+@dataclass
+class LoadConfig:
+    base_url: str = "http://127.0.0.1:8000"
+    endpoint: str = "stream"
+    concurrency: int = 20
+    # Requests per second for open-loop arrivals; 0 runs closed-loop workers instead.
+    rate: float = 0.0
+    requests: int = 200
+    duration: Optional[float] = None
+    mix: Dict[str, float] = field(default_factory=lambda: {"short": 0.6, "medium": 0.3, "long": 0.1})
+    models: List[str] = field(default_factory=lambda: ["gpt-4", "deepseek"])
+    # Append a request number to each prompt so the response cache and stream fan-out do not absorb the load.
+    unique: bool = True
+    timeout: float = 120.0
+    seed: int = 0
+
+
+@dataclass
+class Result:
+    endpoint: str
+    status: int
+    latency: float
+    ttft: Optional[float] = None
+    frames: int = 0
+    error: Optional[str] = None
+
+
+class _Tracker:
+    """Counts streams that are currently open, for the memory-per-stream estimate."""
+
+    def __init__(self):
+        self.open_streams = 0
+
+    def opened(self) -> None:
+        self.open_streams += 1
+
+    def closed(self) -> None:
+        self.open_streams -= 1
+
+
+def _body(config: LoadConfig, rng: random.Random, number: int) -> Dict[str, Any]:
+    kind = rng.choices(list(config.mix), weights=list(config.mix.values()))[0]
+    message = PROMPTS[kind]
+    if config.unique:
+        message = f"{message} [load-test #{number}]"
+    return {"message": message, "model": config.models[number % len(config.models)]}
+
+
+async def _completion(client: httpx.AsyncClient, body: Dict[str, Any]) -> Result:
+    start = time.perf_counter()
+    try:
+        response = await client.post("/api/v1/chat/completions", json=body)
+        latency = time.perf_counter() - start
+        error = None if response.status_code == 200 else response.text[:200]
+        return Result("completions", response.status_code, latency, ttft=latency, frames=1, error=error)
+    except httpx.HTTPError as e:
+        return Result("completions", 0, time.perf_counter() - start, error=repr(e))
+
+
+async def _stream(client: httpx.AsyncClient, body: Dict[str, Any], tracker: _Tracker) -> Result:
+    start = time.perf_counter()
+    ttft = None
+    frames = 0
+    error = None
+    tracker.opened()
+    try:
+        async with client.stream("POST", "/api/v1/chat/stream", json=body) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                frames += 1
+                event = json.loads(line[len("data: "):])
+                if event.get("type") == "delta" and ttft is None:
+                    ttft = time.perf_counter() - start
+                elif event.get("type") == "error":
+                    error = event.get("content")
+            status = response.status_code
+    except httpx.HTTPError as e:
+        status, error = 0, repr(e)
+    finally:
+        tracker.closed()
+    return Result("stream", status, time.perf_counter() - start, ttft=ttft, frames=frames, error=error)
+
+
+async def run_load(client: httpx.AsyncClient, config: LoadConfig, tracker: Optional[_Tracker] = None) -> List[Result]:
+    """Issue the configured load through ``client`` and return one Result per request."""
+    tracker = tracker or _Tracker()
+    rng = random.Random(config.seed)
+    endpoints = ["completions", "stream"] if config.endpoint == "both" else [config.endpoint]
+    deadline = None if config.duration is None else time.monotonic() + config.duration
+    results: List[Result] = []
+    counter = iter(range(sys.maxsize))
+
+    def next_number() -> Optional[int]:
+        number = next(counter)
+        if deadline is not None:
+            return number if time.monotonic() < deadline else None
+        return number if number < config.requests else None
+
+    async def one(number: int) -> None:
+        body = _body(config, rng, number)
+        if endpoints[number % len(endpoints)] == "stream":
+            results.append(await _stream(client, body, tracker))
+        else:
+            results.append(await _completion(client, body))
+
+    if config.rate <= 0:
+        async def worker() -> None:
+            while (number := next_number()) is not None:
+                await one(number)
+
+        await asyncio.gather(*(worker() for _ in range(config.concurrency)))
+        return results
+
+    # Open loop: Poisson arrivals at the configured rate, capped at `concurrency` in flight.
+    slots = asyncio.Semaphore(config.concurrency)
+    tasks = []
+
+    async def limited(number: int) -> None:
+        try:
+            await one(number)
+        finally:
+            slots.release()
+
+    while (number := next_number()) is not None:
+        await asyncio.sleep(rng.expovariate(config.rate))
+        await slots.acquire()
+        tasks.append(asyncio.ensure_future(limited(number)))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def _distribution(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": round(percentile(ordered, 50), 4),
+        "p95": round(percentile(ordered, 95), 4),
+        "p99": round(percentile(ordered, 99), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def summarize(results: List[Result], elapsed: float) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    for endpoint in sorted({r.endpoint for r in results}):
+        subset = [r for r in results if r.endpoint == endpoint]
+        ok = [r for r in subset if r.status == 200 and r.error is None]
+        statuses: Dict[str, int] = {}
+        for r in subset:
+            statuses[str(r.status)] = statuses.get(str(r.status), 0) + 1
+        summary[endpoint] = {
+            "requests": len(subset),
+            "errors": len(subset) - len(ok),
+            "status_codes": statuses,
+            "throughput_rps": round(len(ok) / elapsed, 2) if elapsed > 0 else None,
+            "latency": _distribution([r.latency for r in ok]),
+            "ttft": _distribution([r.ttft for r in ok if r.ttft is not None]),
+            "frames": sum(r.frames for r in ok),
+        }
+    return summary
+
+
+# ---- Server process sampling (Linux /proc) ---------------------------------
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    # utime and stime are the 14th and 15th fields of the full line.
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+async def _sample_rss(pid: int, tracker: _Tracker, samples: List[tuple], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        rss = _rss_bytes(pid)
+        if rss is not None:
+            samples.append((tracker.open_streams, rss))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+
+
+def server_stats(
+    cpu_before: Optional[float], cpu_after: Optional[float], rss_samples: List[tuple], frames: int
+) -> Optional[Dict[str, Any]]:
+    if cpu_before is None or cpu_after is None or not rss_samples:
+        return None
+    baseline = rss_samples[0][1]
+    peak_rss = max(rss for _, rss in rss_samples)
+    busiest = max(streams for streams, _ in rss_samples)
+    cpu = cpu_after - cpu_before
+    return {
+        "cpu_seconds": round(cpu, 3),
+        "cpu_per_frame_us": round(cpu / frames * 1e6, 2) if frames else None,
+        "rss_baseline_mb": round(baseline / 2**20, 1),
+        "rss_peak_mb": round(peak_rss / 2**20, 1),
+        "peak_open_streams": busiest,
+        "memory_per_stream_kb": round((peak_rss - baseline) / busiest / 1024, 1) if busiest else None,
+    }
+
+
+# ---- Regression check ------------------------------------------------------
+
+# (path into an endpoint summary, True if higher is better)
+TRACKED = [
+    (("throughput_rps",), True),
+    (("latency", "p95"), False),
+    (("latency", "p99"), False),
+    (("ttft", "p95"), False),
+]
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every tracked metric that got worse than ``baseline`` by more than ``tolerance`` (a fraction)."""
+    regressions = []
+    for endpoint, summary in current["endpoints"].items():
+        before_summary = baseline.get("endpoints", {}).get(endpoint)
+        if before_summary is None:
+            continue
+        for path, higher_is_better in TRACKED:
+            now, before = summary, before_summary
+            for key in path:
+                now = (now or {}).get(key)
+                before = (before or {}).get(key)
+            if not now or not before:
+                continue
+            change = (now - before) / before
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{endpoint} {'.'.join(path)}: {before} -> {now} ({change:+.0%})")
+    return regressions
+
+
+# ---- Spawned stack ---------------------------------------------------------
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_up(url: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+                await asyncio.sleep(0.2)
+
+
+def _spawn(mock_args: List[str]) -> tuple:
+    """Start the mock LLM and the backend (pointed at it) as subprocesses."""
+    backend_dir = Path(__file__).resolve().parent.parent
+    mock_port, backend_port = _free_port(), _free_port()
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_llm", "--port", str(mock_port), *mock_args], cwd=backend_dir
+    )
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    env = {
+        **os.environ,
+        "AZURE_ENDPOINT": mock_url,
+        "AZURE_KEY": "mock",
+        "DEEPSEEK_ENDPOINT": mock_url,
+        "DEEPSEEK_API_KEY": "mock",
+        "HTTP_PREWARM": "false",
+    }
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(backend_port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=env,
+    )
+    return mock, mock_url, backend, f"http://127.0.0.1:{backend_port}"
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    config = LoadConfig(
+        base_url=args.base_url,
+        endpoint=args.endpoint,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        requests=args.requests,
+        duration=args.duration,
+        mix={kind: float(weight) for kind, weight in (item.split("=") for item in args.mix.split(","))},
+        models=args.models.split(","),
+        unique=not args.allow_cache,
+        seed=args.seed,
+    )
+    processes = []
+    server_pid = args.server_pid
+    if args.spawn:
+        mock, mock_url, backend, config.base_url = _spawn(args.mock_args.split())
+        processes = [backend, mock]
+        server_pid = backend.pid
+        await _wait_until_up(mock_url)
+        await _wait_until_up(f"{config.base_url}/health")
+
+    try:
+        tracker = _Tracker()
+        rss_samples: List[tuple] = []
+        stop = asyncio.Event()
+        limits = httpx.Limits(max_connections=config.concurrency, max_keepalive_connections=config.concurrency)
+        async with httpx.AsyncClient(base_url=config.base_url, limits=limits, timeout=config.timeout) as client:
+            sampler = asyncio.ensure_future(_sample_rss(server_pid, tracker, rss_samples, stop)) if server_pid else None
+            cpu_before = _cpu_seconds(server_pid) if server_pid else None
+            start = time.perf_counter()
+            results = await run_load(client, config, tracker)
+            elapsed = time.perf_counter() - start
+            cpu_after = _cpu_seconds(server_pid) if server_pid else None
+            stop.set()
+            if sampler is not None:
+                await sampler
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+
+    endpoints = summarize(results, elapsed)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": asdict(config),
+        "elapsed_seconds": round(elapsed, 3),
+        "endpoints": endpoints,
+        "server": server_stats(cpu_before, cpu_after, rss_samples, sum(e["frames"] for e in endpoints.values())),
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+def main() -> None:
+    defaults = LoadConfig()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default=defaults.base_url)
+    parser.add_argument("--endpoint", choices=["completions", "stream", "both"], default=defaults.endpoint)
+    parser.add_argument("--concurrency", type=int, default=defaults.concurrency)
+    parser.add_argument("--rate", type=float, default=defaults.rate, help="arrivals per second; 0 = closed loop")
+    parser.add_argument("--requests", type=int, default=defaults.requests)
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of --requests")
+    parser.add_argument("--mix", default="short=0.6,medium=0.3,long=0.1", help="prompt mix weights")
+    parser.add_argument("--models", default="gpt-4,deepseek")
+    parser.add_argument("--allow-cache", action="store_true", help="repeat identical prompts")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--spawn", action="store_true", help="start the mock LLM and the backend as subprocesses")
+    parser.add_argument("--mock-args", default="--ttft-ms 300 --tokens-per-second 50 --response-tokens 150")
+    parser.add_argument("--server-pid", type=int, help="backend pid to sample CPU and memory from (Linux)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed regression as a fraction")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
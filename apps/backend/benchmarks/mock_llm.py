@@ -0,0 +1,162 @@
+"""
+Local OpenAI-compatible mock LLM server for load and latency testing.
+
+Serves chat completions on both the Azure deployment path used for gpt-4
+and the ``/openai/v1`` path used for DeepSeek, streaming and non-streaming,
+with configurable time to first token, token rate, jitter, error and 429
+injection and response size. Point the backend at it with::
+
+    cd apps/backend && python -m benchmarks.mock_llm --port 9100 --ttft-ms 400 --tokens-per-second 60
+    AZURE_ENDPOINT=http://127.0.0.1:9100 AZURE_KEY=mock \\
+    DEEPSEEK_ENDPOINT=http://127.0.0.1:9100 DEEPSEEK_API_KEY=mock python run.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, fields
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the model streams tokens at a steady pace while the client renders each delta as it arrives "
+    "so latency stays low and throughput stays high under concurrent load"
+).split()
+
+
+@dataclass
+class MockConfig:
+    ttft_ms: float = 300.0
+    tokens_per_second: float = 50.0
+    # Each delay is scaled by a random factor in [1 - jitter, 1 + jitter].
+    jitter: float = 0.2
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_seconds: int = 1
+    response_tokens: int = 200
+    seed: Optional[int] = None
+
+
+def _error(status: int, message: str, kind: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status, content={"error": {"message": message, "type": kind, "code": str(status)}}, headers=headers
+    )
+
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    config = config or MockConfig()
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Mock LLM")
+    app.state.config = config
+    app.state.requests = 0
+
+    def delay(seconds: float) -> float:
+        return max(0.0, seconds * (1 + rng.uniform(-config.jitter, config.jitter)))
+
+    def reply_tokens(body: Dict[str, Any]) -> list:
+        count = config.response_tokens
+        if body.get("max_tokens"):
+            count = min(count, body["max_tokens"])
+        return [WORDS[i % len(WORDS)] + " " for i in range(count)]
+
+    def usage(body: Dict[str, Any], completion_tokens: int) -> Dict[str, int]:
+        prompt = sum(len(str(m.get("content") or "")) for m in body.get("messages", [])) // 4
+        return {
+            "prompt_tokens": prompt,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt + completion_tokens,
+        }
+
+    async def completions(request: Request, model: Optional[str] = None):
+        app.state.requests += 1
+        body = await request.json()
+        model = model or body.get("model", "mock")
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            retry_after = {"Retry-After": str(config.retry_after_seconds)}
+            return _error(429, "Rate limit exceeded (injected).", "rate_limit_exceeded", headers=retry_after)
+        if roll < config.rate_limit_rate + config.error_rate:
+            return _error(500, "Internal server error (injected).", "server_error")
+
+        tokens = reply_tokens(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        token_delay = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay(config.ttft_ms / 1000) + delay(token_delay * max(0, len(tokens) - 1)))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage(body, len(tokens)),
+            }
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n"
+
+        async def stream() -> AsyncGenerator[bytes, None]:
+            yield chunk({"role": "assistant", "content": ""})
+            await asyncio.sleep(delay(config.ttft_ms / 1000))
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(delay(token_delay))
+                yield chunk({"content": token})
+            yield chunk({}, finish_reason="stop")
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def azure_completions(deployment: str, request: Request):
+        return await completions(request, model=deployment)
+
+    @app.post("/openai/v1/chat/completions")
+    async def v1_completions(request: Request):
+        return await completions(request)
+
+    @app.api_route("/", methods=["GET", "HEAD"])
+    async def root():
+        return {"status": "ok", "requests": app.state.requests}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    for field in fields(MockConfig):
+        parser.add_argument(
+            f"--{field.name.replace('_', '-')}",
+            type=int if field.name in ("retry_after_seconds", "response_tokens", "seed") else float,
+            default=getattr(defaults, field.name),
+        )
+    args = parser.parse_args()
+    config = MockConfig(**{field.name: getattr(args, field.name) for field in fields(MockConfig)})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
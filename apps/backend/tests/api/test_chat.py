@@ -19,3 +19,193 @@ def test_chat_completions_empty_message(client):
         json={"message": "", "model": "gpt-4"},
     )
     assert response.status_code == 422
+
+
+def test_chat_completions_marks_cache_hits(client, monkeypatch):
+    """A repeated completion should be served from cache with an X-Cache header."""
+    from app.api.v1.endpoints import chat
+
+    calls = []
+
+    async def fake_completion(request):
+        calls.append(request)
+        return {"reply": "cached reply", "model": "gpt-4o-mini", "usage": None, "latency": 0.5}
+
+    chat.response_cache.clear()
+    monkeypatch.setattr(chat.azure_provider, "get_completion", fake_completion)
+    body = {"message": "What is FastAPI?", "model": "gpt-4"}
+
+    first = client.post("/api/v1/chat/completions", json=body)
+    second = client.post("/api/v1/chat/completions", json=body)
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json()["cached"] is True
+    assert len(calls) == 1
+
+
+def test_dual_completion_queries_both_models_concurrently(client, monkeypatch):
+    """The dual endpoint should take about as long as the slower model, not the sum."""
+    import asyncio
+    from app.api.v1.endpoints import chat
+
+    def fake(model, delay):
+        async def get_completion(request):
+            await asyncio.sleep(delay)
+            return {"reply": f"{model} says hi", "model": model, "usage": None, "latency": delay}
+        return get_completion
+
+    monkeypatch.setattr(chat.azure_provider, "get_completion", fake("gpt-4o-mini", 0.2))
+    monkeypatch.setattr(chat.deepseek_provider, "get_completion", fake("DeepSeek-R1", 0.2))
+
+    response = client.post("/api/v1/chat/dual", json={"message": "Dual concurrency check"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["responses"]["gpt-4"]["reply"] == "gpt-4o-mini says hi"
+    assert data["responses"]["deepseek"]["reply"] == "DeepSeek-R1 says hi"
+    assert data["errors"] == {}
+    assert data["latency"] < 0.35
+
+
+def test_dual_stream_tags_frames_with_model(client, monkeypatch):
+    """The dual stream should multiplex both models into one SSE channel."""
+    import json
+    from app.api.v1.endpoints import chat
+
+    def fake(text):
+        async def get_streaming_completion(request):
+            for word in text.split():
+                yield word
+        return get_streaming_completion
+
+    monkeypatch.setattr(chat.azure_provider, "get_streaming_completion", fake("alpha beta"))
+    monkeypatch.setattr(chat.deepseek_provider, "get_streaming_completion", fake("gamma delta"))
+
+    response = client.post("/api/v1/chat/dual/stream", json={"message": "Dual stream check"})
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+    deltas = {"gpt-4": [], "deepseek": []}
+    for event in events:
+        if event["type"] == "delta":
+            deltas[event["model"]].append(event["content"])
+    assert deltas == {"gpt-4": ["alpha", "beta"], "deepseek": ["gamma", "delta"]}
+    assert sorted(e["model"] for e in events if e["type"] == "done") == ["deepseek", "gpt-4"]
+    assert all(e["timings"]["tokens"] == 2 for e in events if e["type"] == "done")
+    assert events[-1]["type"] == "end"
+
+
+def test_stream_resumes_from_last_event_id(client, monkeypatch):
+    """Reconnecting with Last-Event-ID should replay only the missed frames without regenerating."""
+    from app.api.v1.endpoints import chat
+
+    calls = []
+
+    async def fake_stream(request):
+        calls.append(request)
+        for word in ("one", "two", "three"):
+            yield word
+
+    monkeypatch.setattr(chat.azure_provider, "get_streaming_completion", fake_stream)
+    body = {"message": "Resumable stream check", "model": "gpt-4"}
+
+    first = client.post("/api/v1/chat/stream", json=body)
+    ids = [line[len("id: "):] for line in first.text.splitlines() if line.startswith("id: ")]
+    assert len(ids) == 4
+    assert all(event_id.startswith(first.headers["X-Stream-Id"] + ":") for event_id in ids)
+
+    resumed = client.post("/api/v1/chat/stream", json=body, headers={"Last-Event-ID": ids[1]})
+    data = [line for line in resumed.text.splitlines() if line.startswith("data: ")]
+    assert '"three"' in data[0]
+    assert '"done"' in data[1]
+    assert len(data) == 2
+    assert len(calls) == 1
+
+
+def test_repeated_stream_is_replayed_from_cache(client, monkeypatch):
+    """A completed stream should be cached and replayed without calling upstream again."""
+    import json
+    from app.api.v1.endpoints import chat
+
+    calls = []
+
+    async def fake_stream(request):
+        calls.append(request)
+        for word in ("cached ", "stream ", "reply"):
+            yield word
+
+    chat.response_cache.clear()
+    monkeypatch.setattr(chat.azure_provider, "get_streaming_completion", fake_stream)
+    body = {"message": "Stream cache check", "model": "gpt-4"}
+
+    def frames(response):
+        return [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+    first = frames(client.post("/api/v1/chat/stream", json=body))
+    second = frames(client.post("/api/v1/chat/stream", json=body))
+
+    assert first[-1]["type"] == "done" and first[-1]["cached"] is False
+    assert [frame["content"] for frame in second[:-1]] == ["cached stream reply"]
+    assert second[-1]["type"] == "done" and second[-1]["cached"] is True
+    assert len(calls) == 1
+
+
+def test_conversation_sends_history_and_records_turns(client, monkeypatch):
+    """Follow-up messages should only carry the new turn; the server adds the earlier ones."""
+    from app.api.v1.endpoints import chat
+
+    sent = []
+
+    async def fake_completion(request):
+        sent.append(request.to_messages())
+        return {"reply": f"reply {len(sent)}", "model": "gpt-4o-mini", "usage": None, "latency": 0.1}
+
+    monkeypatch.setattr(chat.azure_provider, "get_completion", fake_completion)
+    created = client.post("/api/v1/chat/conversations")
+    assert created.status_code == 201
+    conversation_id = created.json()["conversation_id"]
+
+    body = {"model": "gpt-4", "conversation_id": conversation_id}
+    first = client.post("/api/v1/chat/completions", json={**body, "message": "First conversation turn"})
+    second = client.post("/api/v1/chat/completions", json={**body, "message": "Second conversation turn"})
+
+    assert first.json()["conversation_id"] == conversation_id
+    assert second.json()["reply"] == "reply 2"
+    assert [m["content"] for m in sent[1][1:]] == ["First conversation turn", "reply 1", "Second conversation turn"]
+    turns = client.get(f"/api/v1/chat/conversations/{conversation_id}").json()["turns"]
+    assert [(t["role"], t["model"]) for t in turns] == [
+        ("user", None), ("assistant", "gpt-4"), ("user", None), ("assistant", "gpt-4")
+    ]
+
+    assert client.delete(f"/api/v1/chat/conversations/{conversation_id}").status_code == 204
+    missing = client.post("/api/v1/chat/completions", json={**body, "message": "Third conversation turn"})
+    assert missing.status_code == 404
+
+
+def test_stream_errors_are_not_recorded_in_conversation(client, monkeypatch):
+    """An in-band provider error must not become an assistant turn sent back as history."""
+    from app.api.v1.endpoints import chat
+    from app.services.llm_service import STREAM_ERROR_PREFIX
+
+    async def failing_stream(request):
+        yield "partial "
+        yield f"{STREAM_ERROR_PREFIX}Request timed out. Please try again.]"
+
+    async def healthy_stream(request):
+        yield "DeepSeek reply"
+
+    monkeypatch.setattr(chat.azure_provider, "get_streaming_completion", failing_stream)
+    monkeypatch.setattr(chat.deepseek_provider, "get_streaming_completion", healthy_stream)
+    conversation_id = client.post("/api/v1/chat/conversations").json()["conversation_id"]
+
+    client.post(
+        "/api/v1/chat/stream",
+        json={"message": "Failing stream turn", "model": "gpt-4", "conversation_id": conversation_id},
+    )
+    assert client.get(f"/api/v1/chat/conversations/{conversation_id}").json()["turns"] == []
+
+    client.post("/api/v1/chat/dual/stream", json={"message": "Dual stream turn", "conversation_id": conversation_id})
+    turns = client.get(f"/api/v1/chat/conversations/{conversation_id}").json()["turns"]
+    assert [(t["role"], t["model"], t["content"]) for t in turns] == [
+        ("user", None, "Dual stream turn"), ("assistant", "deepseek", "DeepSeek reply")
+    ]
@@ -0,0 +1,30 @@
+"""
+Tests for the debug endpoints' gating.
+"""
+
+from app.core.config import settings
+
+
+def test_debug_endpoints_are_hidden_by_default(client):
+    assert client.get("/api/v1/debug/loop").status_code == 404
+    assert client.post("/api/v1/debug/profile").status_code == 404
+
+
+def test_profiler_requires_admin_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+
+    assert client.post("/api/v1/debug/profile?seconds=0.05").status_code == 403
+    denied = client.post("/api/v1/debug/profile?seconds=0.05", headers={"X-Admin-Token": "wrong"})
+    assert denied.status_code == 403
+
+    response = client.post("/api/v1/debug/profile?seconds=0.05", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "thread:MainThread;" in response.text or "task:" in response.text
+
+
+def test_profiler_stays_off_without_an_admin_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+    assert client.post("/api/v1/debug/profile", headers={"X-Admin-Token": ""}).status_code == 404
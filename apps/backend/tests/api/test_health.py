@@ -17,3 +17,14 @@ def test_health_endpoint(client):
     data = response.json()
     assert data["status"] == "healthy"
     assert "models" in data
+
+
+def test_metrics_endpoint_exports_prometheus_text(client):
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in text
+    assert "# TYPE event_loop_lag_seconds histogram" in text
+    assert 'response_cache_requests_total{result="hit"}' in text
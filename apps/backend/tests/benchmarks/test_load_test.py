@@ -0,0 +1,61 @@
+"""
+Tests for the load generator, run in-process against the backend app.
+"""
+
+import asyncio
+
+import httpx
+
+from benchmarks.load_test import LoadConfig, compare, run_load, server_stats, summarize
+
+
+def _fake_providers(monkeypatch):
+    from app.api.v1.endpoints import chat
+
+    async def completion(request):
+        return {"reply": "ok", "model": "mock", "usage": None, "latency": 0.01}
+
+    async def stream(request):
+        for word in ("a", "b", "c"):
+            yield word
+
+    for provider in (chat.azure_provider, chat.deepseek_provider):
+        monkeypatch.setattr(provider, "get_completion", completion)
+        monkeypatch.setattr(provider, "get_streaming_completion", stream)
+
+
+def test_closed_loop_run_reports_both_endpoints(monkeypatch):
+    from app.main import app
+
+    _fake_providers(monkeypatch)
+    config = LoadConfig(endpoint="both", concurrency=4, requests=12)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://backend") as client:
+            return await run_load(client, config)
+
+    results = asyncio.run(run())
+    summary = summarize(results, elapsed=1.0)
+    assert summary["completions"]["requests"] == 6
+    assert summary["stream"]["requests"] == 6
+    assert summary["stream"]["errors"] == 0
+    # Three deltas and a done frame per stream.
+    assert summary["stream"]["frames"] == 24
+    assert summary["stream"]["ttft"]["p50"] <= summary["stream"]["latency"]["p50"]
+    assert set(summary["stream"]["latency"]) == {"mean", "p50", "p95", "p99", "max"}
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"endpoints": {"stream": {"throughput_rps": 100.0, "latency": {"p95": 1.0, "p99": 2.0}, "ttft": None}}}
+    current = {"endpoints": {"stream": {"throughput_rps": 95.0, "latency": {"p95": 1.5, "p99": 1.0}, "ttft": None}}}
+    assert compare(current, baseline, tolerance=0.1) == ["stream latency.p95: 1.0 -> 1.5 (+50%)"]
+
+
+def test_server_stats_derive_per_stream_memory_and_per_frame_cpu():
+    samples = [(0, 100 * 1024 * 1024), (10, 110 * 1024 * 1024), (4, 105 * 1024 * 1024)]
+    stats = server_stats(1.0, 1.5, samples, frames=1000)
+    assert stats["cpu_per_frame_us"] == 500.0
+    assert stats["peak_open_streams"] == 10
+    assert stats["memory_per_stream_kb"] == 1024.0
+    assert server_stats(None, None, [], frames=0) is None
@@ -0,0 +1,53 @@
+"""
+Tests for the mock LLM server, driven through the real provider services.
+"""
+
+import asyncio
+
+import httpx
+
+from app.core.config import settings
+from app.schemas.chat import ChatRequest
+from app.services.llm_service import AzureOpenAIService, DeepSeekService
+from benchmarks.mock_llm import MockConfig, create_app
+
+FAST = MockConfig(ttft_ms=0, tokens_per_second=0, jitter=0, response_tokens=5, seed=1)
+
+
+def _open(service_cls, monkeypatch, config=FAST):
+    monkeypatch.setattr(settings, "AZURE_ENDPOINT", "http://mock-llm")
+    monkeypatch.setattr(settings, "AZURE_KEY", "mock")
+    monkeypatch.setattr(settings, "DEEPSEEK_ENDPOINT", "http://mock-llm")
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "mock")
+    service = service_cls()
+    service.open(httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(config))))
+    return service
+
+
+def test_azure_path_serves_completions(monkeypatch):
+    service = _open(AzureOpenAIService, monkeypatch)
+    result = asyncio.run(service.get_completion(ChatRequest(message="hello there", model="gpt-4")))
+    assert result["reply"] == "the model streams tokens at "
+    assert result["usage"]["completion_tokens"] == 5
+
+
+def test_openai_v1_path_streams_tokens(monkeypatch):
+    service = _open(DeepSeekService, monkeypatch)
+
+    async def run():
+        return [delta async for delta in service.get_streaming_completion(ChatRequest(message="hi", model="deepseek"))]
+
+    assert asyncio.run(run()) == ["the ", "model ", "streams ", "tokens ", "at "]
+
+
+def test_injected_rate_limit_returns_429_with_retry_after():
+    app = create_app(MockConfig(rate_limit_rate=1.0, retry_after_seconds=3))
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://mock") as client:
+            return await client.post("/openai/v1/chat/completions", json={"model": "m", "messages": []})
+
+    response = asyncio.run(run())
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert response.json()["error"]["type"] == "rate_limit_exceeded"
@@ -2,12 +2,15 @@
 Shared test fixtures for backend tests.
 """
 
+from typing import Iterator
+
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 
 
 @pytest.fixture()
-def client() -> TestClient:
-    """Provides a synchronous test client for FastAPI."""
-    return TestClient(app)
+def client() -> Iterator[TestClient]:
+    """Provides a synchronous test client for FastAPI, with the app lifespan running."""
+    with TestClient(app) as test_client:
+        yield test_client
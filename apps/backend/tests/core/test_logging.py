@@ -0,0 +1,125 @@
+"""
+Tests for the logging configuration.
+"""
+
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueListener
+
+from app.core import logging as app_logging
+from app.core.logging import DrainingQueueListener, DroppingQueueHandler
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    logger = logging.getLogger("tests.dropping")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        for i in range(5):
+            logger.warning("record %d", i)
+    finally:
+        logger.removeHandler(handler)
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_records_are_formatted_on_listener_thread():
+    log_queue = queue.Queue()
+    target = ListHandler()
+    listener = QueueListener(log_queue, target)
+    handler = DroppingQueueHandler(log_queue)
+    logger = logging.getLogger("tests.listener")
+    logger.addHandler(handler)
+    logger.propagate = False
+    listener.start()
+    try:
+        logger.warning("hello %s", "world")
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+    assert target.messages == ["hello world"]
+
+
+class BlockingHandler(ListHandler):
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+
+    def emit(self, record):
+        self.unblock.wait()
+        super().emit(record)
+
+
+def _fill(log_queue, target, **options):
+    """Start a listener stuck on its first record with ``log_queue`` full behind it."""
+    listener = DrainingQueueListener(log_queue, target, **options)
+    handler = DroppingQueueHandler(log_queue)
+    listener.start()
+    handler.handle(logging.makeLogRecord({"msg": "record 0"}))
+    while not log_queue.empty():
+        time.sleep(0.001)
+    for i in range(1, 3):
+        handler.handle(logging.makeLogRecord({"msg": f"record {i}"}))
+    assert log_queue.full()
+    return listener
+
+
+def test_stop_waits_for_room_on_a_full_queue():
+    target = BlockingHandler()
+    listener = _fill(queue.Queue(maxsize=2), target)
+    threading.Timer(0.05, target.unblock.set).start()
+    listener.stop()
+    assert target.messages == ["record 0", "record 1", "record 2"]
+
+
+def test_stop_gives_up_on_a_stuck_listener():
+    target = BlockingHandler()
+    listener = _fill(queue.Queue(maxsize=2), target, stop_timeout=0.05)
+    started = time.monotonic()
+    listener.stop()
+    assert time.monotonic() - started < 1
+    target.unblock.set()
+
+
+def test_prepare_snapshots_the_record():
+    handler = DroppingQueueHandler(queue.Queue())
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.getLogger("tests.prepare").makeRecord(
+            "tests.prepare", logging.ERROR, __file__, 1, "failed %s", ("job",), sys.exc_info()
+        )
+    prepared = handler.prepare(record)
+    assert prepared is not record and record.args == ("job",) and record.exc_info
+    assert prepared.msg == "failed job" and prepared.args is None
+    assert prepared.exc_info is None and "ValueError: boom" in prepared.exc_text
+    formatted = logging.Formatter().format(prepared)
+    assert formatted.startswith("failed job\nTraceback") and formatted.count("ValueError: boom") == 1
+
+
+def test_shutdown_flushes_and_restores_direct_handler():
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    try:
+        app_logging.setup_logging(use_queue=True, queue_size=100)
+        assert isinstance(root.handlers[0], DroppingQueueHandler)
+        app_logging.shutdown_logging()
+        assert root.handlers and not isinstance(root.handlers[0], DroppingQueueHandler)
+        assert app_logging.dropped_log_records() == 0
+    finally:
+        app_logging.shutdown_logging()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
@@ -0,0 +1,59 @@
+"""
+Tests for the event-loop lag monitor.
+"""
+
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.loop_monitor import LoopLagMonitor
+
+
+def _block_for(seconds):
+    # Stands in for a blocking call made on the event loop.
+    time.sleep(seconds)
+
+
+def test_blocking_call_is_recorded_with_its_stack():
+    monitor = LoopLagMonitor(interval=0.01, slow_threshold=0.05)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        _block_for(0.3)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(run())
+    assert monitor.max_lag >= 0.25
+    assert len(monitor.recent) == 1
+    entry = monitor.snapshot()["slow_callbacks"][0]
+    assert entry["duration"] >= 0.25
+    assert any("_block_for" in sample["stack"] for sample in entry["stacks"])
+
+
+def test_idle_loop_records_no_slow_callbacks():
+    monitor = LoopLagMonitor(interval=0.01, slow_threshold=0.1)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+
+    asyncio.run(run())
+    assert not monitor.recent
+    assert monitor.max_lag < 0.1
+
+
+def test_debug_loop_endpoint_reports_snapshot(monkeypatch):
+    from app.api.v1.endpoints import debug
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "DEBUG_ENDPOINTS_ENABLED", True)
+    app = FastAPI()
+    app.include_router(debug.router, prefix="/debug")
+    with TestClient(app) as client:
+        data = client.get("/debug/loop").json()
+    assert {"last_lag", "max_lag", "slow_callbacks"} <= set(data)
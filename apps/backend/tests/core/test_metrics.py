@@ -0,0 +1,55 @@
+"""
+Tests for the in-process metrics registry.
+"""
+
+from app.core.metrics import MetricsRegistry
+
+
+def test_counters_and_gauges_render_in_prometheus_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("model",))
+    active = registry.gauge("active", "Active streams.")
+    requests.labels("gpt-4").inc()
+    requests.labels("gpt-4").inc(2)
+    requests.labels('we"ird').inc()
+    active.inc()
+    active.inc()
+    active.dec()
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{model="gpt-4"} 3' in text
+    assert 'requests_total{model="we\\"ird"} 1' in text
+    assert "active 1" in text.splitlines()
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", ("model",), buckets=(0.1, 1.0))
+    child = latency.labels("deepseek")
+    for value in (0.05, 0.5, 0.7, 5.0):
+        child.observe(value)
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{model="deepseek",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{model="deepseek",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{model="deepseek",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{model="deepseek"} 4' in lines
+    assert 'latency_seconds_sum{model="deepseek"} 6.25' in lines
+
+
+def test_collectors_are_read_at_scrape_time():
+    registry = MetricsRegistry()
+    state = {"hits": 0}
+
+    @registry.collector
+    def collect():
+        yield "cache_hits_total", "counter", "Cache hits.", [({}, state["hits"])]
+
+    state["hits"] = 7
+    assert "cache_hits_total 7" in registry.render().splitlines()
+
+
+def test_registering_the_same_name_returns_the_existing_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("x_total", "X.") is registry.counter("x_total", "X.")
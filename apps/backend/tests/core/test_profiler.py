@@ -0,0 +1,63 @@
+"""
+Tests for the built-in sampling profiler.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.profiler import ProfilerBusy, SamplingProfiler
+
+
+def _spin(stop):
+    while not stop.is_set():
+        time.sleep(0.001)
+
+
+async def _waiting_handler():
+    await asyncio.sleep(10)
+
+
+def test_profile_collects_thread_and_task_stacks():
+    profiler = SamplingProfiler(interval=0.005, task_interval=0.02)
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin, args=(stop,), name="busy-worker")
+    worker.start()
+
+    async def run():
+        task = asyncio.ensure_future(_waiting_handler())
+        await asyncio.sleep(0)
+        try:
+            return await profiler.profile(0.2)
+        finally:
+            task.cancel()
+
+    try:
+        output = asyncio.run(run())
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = output.splitlines()
+    assert lines
+    for line in lines:
+        stack, _, count = line.rpartition(" ")
+        assert stack and int(count) >= 1
+    assert any(line.startswith("thread:busy-worker;") and "_spin" in line for line in lines)
+    assert any(line.startswith("task:_waiting_handler;") for line in lines)
+    assert not profiler.running
+
+
+def test_only_one_profile_runs_at_a_time():
+    profiler = SamplingProfiler(interval=0.01)
+
+    async def run():
+        first = asyncio.ensure_future(profiler.profile(0.1))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(0.1)
+        await first
+
+    asyncio.run(run())
@@ -0,0 +1,138 @@
+"""
+Tests for SSE helpers.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.core import sse
+from app.core.sse import coalesce
+
+
+async def _ticks(chunks, delay):
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+def _run(gen):
+    async def collect():
+        return [frame async for frame in gen]
+    return asyncio.run(collect())
+
+
+def test_disabled_window_passes_chunks_through():
+    frames = _run(coalesce(_ticks(["a", "b", "c"], 0), window=0, max_bytes=100))
+    assert frames == ["a", "b", "c"]
+
+
+def test_first_chunk_flushes_immediately_then_bursts_merge():
+    frames = _run(coalesce(_ticks(list("abcdef"), 0.001), window=0.05, max_bytes=1000))
+    assert frames[0] == "a"
+    assert "".join(frames) == "abcdef"
+    assert len(frames) < 6
+
+
+def test_window_flushes_without_waiting_for_next_chunk():
+    async def slow_tail():
+        yield "first"
+        yield "x"
+        await asyncio.sleep(0.2)
+        yield "y"
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        timings = []
+        async for frame in coalesce(slow_tail(), window=0.02, max_bytes=1000):
+            timings.append((frame, loop.time() - start))
+        return timings
+
+    timings = asyncio.run(run())
+    assert [frame for frame, _ in timings] == ["first", "x", "y"]
+    assert timings[1][1] < 0.1
+
+
+def test_byte_threshold_flushes_early():
+    frames = _run(coalesce(_ticks(["h", "aaaa", "bbbb", "cc"], 0), window=10, max_bytes=8))
+    assert frames == ["h", "aaaabbbb", "cc"]
+
+
+def _parse(frame: bytes):
+    fields = {}
+    for line in frame.decode("utf-8").rstrip("\n").split("\n"):
+        key, _, value = line.partition(": ")
+        fields[key] = value
+    return fields
+
+
+def test_replay_sends_whole_reply_or_paces_it_by_word():
+    assert _run(sse.replay("Hello there, world.")) == ["Hello there, world."]
+    frames = _run(sse.replay("Hello there, world. ", words_per_second=1000))
+    assert frames == ["Hello", " there,", " world.", " "]
+
+
+def test_encode_produces_bytes_frame_with_optional_fields():
+    plain = sse.encode({"type": "done", "latency": 1.5})
+    assert plain.endswith(b"\n\n")
+    assert json.loads(_parse(plain)["data"]) == {"type": "done", "latency": 1.5}
+
+    fields = _parse(sse.encode({"type": "done"}, id="abc:3", event="message", retry=2000))
+    assert fields["id"] == "abc:3"
+    assert fields["event"] == "message"
+    assert fields["retry"] == "2000"
+
+
+def test_delta_encoder_matches_full_json_encoding():
+    encode_delta = sse.DeltaEncoder(model="gpt-4")
+    content = 'quote " newline \n unicode é 漢字'
+    frame = encode_delta(content, id="7")
+    fields = _parse(frame)
+    assert fields["id"] == "7"
+    assert json.loads(fields["data"]) == {"type": "delta", "model": "gpt-4", "content": content}
+
+
+def test_cancel_on_disconnect_stops_producer_while_upstream_is_silent():
+    stopped = []
+
+    async def frames():
+        try:
+            yield b"first"
+            await asyncio.sleep(10)  # e.g. a model reasoning without emitting content
+            yield b"never"
+        finally:
+            stopped.append(True)
+
+    async def run():
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        received = []
+        async for frame in sse.cancel_on_disconnect(receive, frames()):
+            received.append(frame)
+            disconnected.set()
+        return received
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=2)) == [b"first"]
+    assert stopped == [True]
+
+
+def test_cancel_on_disconnect_relays_all_frames_and_errors():
+    async def never_disconnects():
+        await asyncio.sleep(10)
+
+    async def failing():
+        yield b"a"
+        raise RuntimeError("boom")
+
+    async def run(frames):
+        return [frame async for frame in sse.cancel_on_disconnect(never_disconnects, frames)]
+
+    assert asyncio.run(run(_ticks([b"x", b"y"], 0))) == [b"x", b"y"]
+    with pytest.raises(RuntimeError):
+        asyncio.run(run(failing()))
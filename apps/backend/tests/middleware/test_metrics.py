@@ -0,0 +1,39 @@
+"""
+Tests for the request metrics middleware.
+"""
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.metrics import MetricsMiddleware, active_streams, http_requests
+
+
+def test_counts_requests_per_route_template_and_tracks_open_streams():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    seen_open = []
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/events")
+    async def events():
+        async def body():
+            await asyncio.sleep(0.01)
+            seen_open.append(active_streams.labels("/events").value)
+            yield b"data: x\n\n"
+
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    with TestClient(app) as client:
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/events")
+
+    assert http_requests.labels("GET", "/items/{item_id}", "200").value == 2
+    assert seen_open == [1]
+    assert active_streams.labels("/events").value == 0
@@ -0,0 +1,53 @@
+"""
+Tests for the request logging middleware.
+"""
+
+import asyncio
+import logging
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.request_logging import RequestLoggingMiddleware
+
+LOGGER = "app.middleware.request_logging"
+
+
+def _last_record(caplog):
+    return [r for r in caplog.records if r.name == LOGGER][-1]
+
+
+def _stream_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestLoggingMiddleware)
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            for _ in range(3):
+                await asyncio.sleep(0.05)
+                yield b"data: x\n\n"
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    return app
+
+
+def test_logs_status_and_bytes(client, caplog):
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        response = client.get("/health")
+    record = _last_record(caplog)
+    assert record.args[:3] == ("GET", "/health", 200)
+    assert record.args[-1] == len(response.content)
+
+
+def test_stream_duration_covers_whole_body(caplog):
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        response = TestClient(_stream_app()).get("/stream")
+    assert response.text.count("data: x") == 3
+
+    _, _, status, duration_ms, headers_ms, first_byte_ms, bytes_sent = _last_record(caplog).args
+    assert status == 200
+    assert headers_ms < first_byte_ms < duration_ms
+    assert duration_ms >= 150
+    assert bytes_sent == len(response.content)
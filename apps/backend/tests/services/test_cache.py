@@ -0,0 +1,117 @@
+"""
+Tests for the exact-match response cache.
+"""
+
+import asyncio
+
+from app.schemas.chat import ChatRequest
+from app.services.cache import CachedLLMService, ResponseCache, make_request_key
+from app.services.llm_service import STREAM_ERROR_PREFIX, BaseLLMService
+
+
+class FakeService(BaseLLMService):
+    deployment = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def get_completion(self, request):
+        self.calls += 1
+        return {"reply": f"echo: {request.message}", "model": self.deployment, "usage": None, "latency": 1.5}
+
+    async def get_streaming_completion(self, request):
+        self.calls += 1
+        for word in request.message.split():
+            yield word + " "
+        if "fail" in request.message:
+            yield f"{STREAM_ERROR_PREFIX}Service error.]"
+
+
+def _collect(stream, limit=None):
+    async def run():
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk)
+            if len(chunks) == limit:
+                break
+        await stream.aclose()
+        return chunks
+    return asyncio.run(run())
+
+
+def test_request_key_depends_on_prompt_and_deployment():
+    a = ChatRequest(message="hi")
+    b = ChatRequest(message="hi", system_prompt="Be terse.")
+    assert make_request_key("x", a) == make_request_key("x", ChatRequest(message="hi"))
+    assert make_request_key("x", a) != make_request_key("x", b)
+    assert make_request_key("x", a) != make_request_key("y", a)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, max_bytes=10_000, ttl_seconds=60)
+    cache.set("a", {"reply": "1"})
+    cache.set("b", {"reply": "2"})
+    cache.get("a")
+    cache.set("c", {"reply": "3"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.evictions == 1
+
+
+def test_cache_respects_byte_budget():
+    cache = ResponseCache(max_entries=100, max_bytes=200, ttl_seconds=60)
+    for i in range(10):
+        cache.set(str(i), {"reply": "x" * 50})
+    assert cache.size_bytes <= 200
+    assert len(cache) < 10
+
+
+def test_cache_expires_entries():
+    cache = ResponseCache(max_entries=10, max_bytes=10_000, ttl_seconds=0)
+    cache.set("a", {"reply": "1"})
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+
+
+def test_cached_service_serves_repeats_from_cache():
+    inner = FakeService()
+    service = CachedLLMService(inner, ResponseCache(max_entries=10, max_bytes=10_000, ttl_seconds=60))
+    request = ChatRequest(message="hello")
+
+    first = asyncio.run(service.get_completion(request))
+    second = asyncio.run(service.get_completion(request))
+
+    assert inner.calls == 1
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["reply"] == first["reply"]
+    assert second["latency"] < first["latency"]
+    assert service.cache.hits == 1 and service.cache.misses == 1
+
+
+def test_completed_streams_are_cached_for_both_endpoints():
+    inner = FakeService()
+    service = CachedLLMService(inner, ResponseCache(max_entries=10, max_bytes=10_000, ttl_seconds=60))
+    request = ChatRequest(message="stream me please")
+
+    assert service.get_cached_completion(request) is None
+    assert "".join(_collect(service.get_streaming_completion(request))) == "stream me please "
+
+    hit = service.get_cached_completion(request)
+    assert hit["reply"] == "stream me please "
+    assert hit["cached"] is True
+    assert asyncio.run(service.get_completion(request))["cached"] is True
+    assert inner.calls == 1
+
+
+def test_failed_or_abandoned_streams_are_not_cached():
+    service = CachedLLMService(FakeService(), ResponseCache(max_entries=10, max_bytes=10_000, ttl_seconds=60))
+    failed = ChatRequest(message="this will fail")
+    abandoned = ChatRequest(message="client goes away early")
+
+    _collect(service.get_streaming_completion(failed))
+    _collect(service.get_streaming_completion(abandoned), limit=2)
+
+    assert service.get_cached_completion(failed) is None
+    assert service.get_cached_completion(abandoned) is None
+    assert len(service.cache) == 0
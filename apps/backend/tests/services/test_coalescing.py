@@ -0,0 +1,99 @@
+"""
+Tests for single-flight request coalescing.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.chat import ChatRequest
+from app.services.coalescing import CoalescingLLMService, SingleFlight
+from app.services.llm_service import BaseLLMService
+
+
+class SlowService(BaseLLMService):
+    deployment = "slow"
+
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def get_completion(self, request):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return {"reply": request.message, "model": self.deployment, "usage": None, "latency": self.delay}
+
+
+def test_concurrent_duplicates_share_one_upstream_call():
+    inner = SlowService()
+    service = CoalescingLLMService(inner, SingleFlight())
+
+    async def run():
+        return await asyncio.gather(*(service.get_completion(ChatRequest(message="same")) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert inner.calls == 1
+    assert all(r["reply"] == "same" for r in results)
+    assert service.flight.followers == 9
+    assert len(service.flight) == 0
+
+
+def test_failures_propagate_to_every_waiter():
+    inner = SlowService(error=HTTPException(status_code=502, detail="boom"))
+    service = CoalescingLLMService(inner, SingleFlight())
+
+    async def run():
+        return await asyncio.gather(
+            *(service.get_completion(ChatRequest(message="x")) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert inner.calls == 1
+    assert all(isinstance(r, HTTPException) and r.status_code == 502 for r in results)
+
+
+def test_cancelling_leader_does_not_cancel_followers():
+    inner = SlowService()
+    service = CoalescingLLMService(inner, SingleFlight())
+
+    async def run():
+        leader = asyncio.ensure_future(service.get_completion(ChatRequest(message="x")))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(service.get_completion(ChatRequest(message="x")))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run())["reply"] == "x"
+    assert inner.cancelled is False
+
+
+def test_upstream_cancelled_when_all_waiters_leave():
+    inner = SlowService(delay=1)
+    service = CoalescingLLMService(inner, SingleFlight())
+
+    async def run():
+        task = asyncio.ensure_future(service.get_completion(ChatRequest(message="x")))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert inner.cancelled is True
+    assert len(service.flight) == 0
+
+
+def test_waiter_timeout_returns_504():
+    service = CoalescingLLMService(SlowService(delay=1), SingleFlight(), wait_timeout=0.01)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.get_completion(ChatRequest(message="x")))
+    assert exc.value.status_code == 504
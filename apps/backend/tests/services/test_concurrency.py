@@ -0,0 +1,163 @@
+"""
+Tests for the adaptive per-provider concurrency limiter.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.chat import ChatRequest
+from app.services.concurrency import AdaptiveLimiter, ConcurrencyLimitedLLMService
+from app.services.llm_service import BaseLLMService
+
+
+class GatedService(BaseLLMService):
+    deployment = "gated"
+
+    def __init__(self, error=None):
+        self.gate = asyncio.Event()
+        self.active = 0
+        self.peak = 0
+        self.error = error
+
+    async def get_completion(self, request):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await self.gate.wait()
+            if self.error:
+                raise self.error
+            return {"reply": "ok", "model": self.deployment, "usage": None, "latency": 0}
+        finally:
+            self.active -= 1
+
+
+def test_limit_bounds_concurrency_and_queues_excess():
+    async def run():
+        inner = GatedService()
+        limiter = AdaptiveLimiter("test", initial_limit=2, max_queue=10)
+        service = ConcurrencyLimitedLLMService(inner, limiter)
+        tasks = [asyncio.ensure_future(service.get_completion(ChatRequest(message="x"))) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        queued = limiter.queued
+        inner.gate.set()
+        await asyncio.gather(*tasks)
+        return inner.peak, queued, limiter.in_flight
+
+    peak, queued, in_flight = asyncio.run(run())
+    assert peak == 2
+    assert queued == 3
+    assert in_flight == 0
+
+
+def test_full_queue_rejects_fast_with_503():
+    async def run():
+        inner = GatedService()
+        limiter = AdaptiveLimiter("test", initial_limit=1, max_queue=1)
+        service = ConcurrencyLimitedLLMService(inner, limiter)
+        running = [asyncio.ensure_future(service.get_completion(ChatRequest(message="x"))) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as exc:
+            await service.get_completion(ChatRequest(message="x"))
+        inner.gate.set()
+        await asyncio.gather(*running)
+        return exc.value, limiter.rejected
+
+    error, rejected = asyncio.run(run())
+    assert error.status_code == 503
+    assert rejected == 1
+
+
+def test_queue_timeout_rejects():
+    async def run():
+        limiter = AdaptiveLimiter("test", initial_limit=1, queue_timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(HTTPException):
+            await limiter.acquire()
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.timeouts == 1
+    assert limiter.queued == 0
+
+
+def test_rate_limit_shrinks_limit_multiplicatively():
+    async def run():
+        inner = GatedService(error=HTTPException(status_code=429, detail="slow down"))
+        limiter = AdaptiveLimiter("test", initial_limit=8, backoff=0.5)
+        service = ConcurrencyLimitedLLMService(inner, limiter)
+        inner.gate.set()
+        with pytest.raises(HTTPException):
+            await service.get_completion(ChatRequest(message="x"))
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.limit == 4
+    assert limiter.decreases == 1
+
+
+def test_limit_grows_additively_when_saturated_and_drops_on_sustained_slowness():
+    limiter = AdaptiveLimiter("test", initial_limit=1, max_limit=4, latency_tolerance=2.0, backoff=0.5)
+
+    async def run(latency, calls):
+        for _ in range(calls):
+            await limiter.acquire()
+            limiter.release("completion", latency=latency)
+
+    asyncio.run(run(1.0, 3))
+    # Grows from 1 to 2 while saturated, then stops: one call at a time never fills 2 slots.
+    assert limiter.limit == 2
+
+    # A single slow call only nudges the smoothed latency; a slow spell backs off once.
+    asyncio.run(run(5.0, 1))
+    assert limiter.limit == 2
+    asyncio.run(run(5.0, 1))
+    assert limiter.limit == pytest.approx(1.0)
+    assert limiter.decreases == 1
+
+
+def test_varied_reply_lengths_without_load_keep_the_limit():
+    """Long answers on an idle service are not overload: completions are judged per output token."""
+    random = __import__("random").Random(0)
+    limiter = AdaptiveLimiter("test", initial_limit=16)
+
+    async def run():
+        for _ in range(200):
+            tokens = random.randint(25, 1000)
+            latency = 0.3 + tokens * 0.02 * random.uniform(0.8, 1.2)  # 0.5 s to 20 s
+            await limiter.acquire()
+            limiter.release("completion", latency=latency / tokens)
+
+    asyncio.run(run())
+    assert limiter.limit == 16
+    assert limiter.decreases == 0
+
+
+def test_lowered_limit_recovers_once_load_is_gone():
+    limiter = AdaptiveLimiter("test", initial_limit=8, backoff=0.5)
+    for _ in range(2):
+        limiter._decrease("test")
+    assert int(limiter.limit) == 2
+
+    async def run():
+        for _ in range(40):
+            await limiter.acquire()
+            limiter.release("ttft", latency=0.4)
+
+    asyncio.run(run())
+    assert limiter.limit == 8
+
+
+def test_completion_latency_is_measured_per_output_token():
+    class TokenService(BaseLLMService):
+        deployment = "tokens"
+
+        async def get_completion(self, request):
+            await asyncio.sleep(0.02)
+            return {"reply": "ok", "model": self.deployment, "usage": {"completion_tokens": 100}, "latency": 0.02}
+
+    limiter = AdaptiveLimiter("test")
+    asyncio.run(ConcurrencyLimitedLLMService(TokenService(), limiter).get_completion(ChatRequest(message="x")))
+    (sample,) = limiter._samples["completion"]
+    assert 0.0002 <= sample < 0.001
@@ -0,0 +1,139 @@
+"""
+Tests for the SQLite conversation store.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.conversation_sqlite import _STOP, SQLiteConversationStore
+from app.services.conversations import MemoryConversationStore
+
+
+def _store(path, **overrides) -> SQLiteConversationStore:
+    cache = MemoryConversationStore(max_bytes=1_000_000, max_turns=overrides.pop("max_turns", 50), ttl_seconds=60)
+    return SQLiteConversationStore(str(path), cache=cache, ttl_seconds=overrides.pop("ttl_seconds", 60), **overrides)
+
+
+def test_turns_persist_and_reach_other_workers(tmp_path):
+    path = tmp_path / "conversations.db"
+
+    async def scenario():
+        writer, reader = _store(path), _store(path)
+        await writer.open()
+        await reader.open()
+        try:
+            conversation = await writer.create()
+            writer.append(conversation, "user", "hello")
+            writer.append(conversation, "assistant", "hi there", model="gpt-4")
+            # A delete waits for its commit, which also flushes the appends queued before it.
+            await writer.delete("unrelated")
+
+            seen = await reader.get(conversation.id)
+            assert [(t.seq, t.role, t.content, t.model) for t in seen.turns] == [
+                (0, "user", "hello", None), (1, "assistant", "hi there", "gpt-4")
+            ]
+
+            # The reader appends; the writer's cached copy picks up only the new turn.
+            reader.append(seen, "user", "follow-up")
+            await reader.delete("unrelated")
+            refreshed = await writer.get(conversation.id)
+            assert refreshed is conversation
+            assert [t.content for t in refreshed.turns] == ["hello", "hi there", "follow-up"]
+        finally:
+            await writer.aclose()
+            await reader.aclose()
+
+    asyncio.run(scenario())
+    with sqlite3.connect(path) as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_appends_are_batched_and_trimmed(tmp_path):
+    path = tmp_path / "conversations.db"
+
+    async def scenario():
+        store = _store(path, max_turns=3)
+        await store.open()
+        try:
+            conversation = await store.create()
+            for i in range(10):
+                store.append(conversation, "user", str(i))
+        finally:
+            await store.aclose()
+        return store
+
+    store = asyncio.run(scenario())
+    # One create plus appends that queued up while it committed.
+    assert store.writes == 11
+    assert store.batches < store.writes
+    with sqlite3.connect(path) as db:
+        rows = db.execute("SELECT seq, content FROM turns ORDER BY seq").fetchall()
+    assert rows == [(7, "7"), (8, "8"), (9, "9")]
+
+
+def test_deleted_and_expired_conversations_are_gone(tmp_path):
+    async def scenario():
+        store = _store(tmp_path / "conversations.db")
+        expiring = _store(tmp_path / "conversations.db", ttl_seconds=0)
+        await store.open()
+        await expiring.open()
+        try:
+            conversation = await store.create()
+            assert await store.delete(conversation.id) is True
+            assert await store.delete(conversation.id) is False
+            assert await store.get(conversation.id) is None
+
+            stale = await store.create()
+            assert await expiring.get(stale.id) is None
+        finally:
+            await store.aclose()
+            await expiring.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_writes_queued_behind_stop_are_drained_and_writer_exits(tmp_path):
+    path = tmp_path / "conversations.db"
+    store = _store(path, batch_size=4)
+    store._init_db()
+    conversation = asyncio.run(store.cache.create())
+    turns = [store.cache.append(conversation, "user", f"turn {i}") for i in range(5)]
+    store._queue.put(("create", (conversation.id, time.time()), None))
+    for turn in turns[:2]:
+        store._queue.put(("append", (conversation.id, turn, time.time()), None))
+    store._queue.put(_STOP)
+    # Late writes, e.g. from a detached stream finishing during shutdown, land in the next batch.
+    for turn in turns[2:]:
+        store._queue.put(("append", (conversation.id, turn, time.time()), None))
+
+    writer = threading.Thread(target=store._write_loop, daemon=True)
+    writer.start()
+    writer.join(timeout=5)
+
+    assert not writer.is_alive()
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM turns").fetchone()[0] == 5
+
+
+def test_writes_after_close_are_dropped_or_rejected(tmp_path):
+    async def scenario():
+        store = _store(tmp_path / "conversations.db")
+        await store.open()
+        conversation = await store.create()
+        await store.aclose()
+
+        turn = store.append(conversation, "user", "late")
+        with pytest.raises(HTTPException) as exc:
+            await store.create()
+        return store, conversation, turn, exc.value
+
+    store, conversation, turn, error = asyncio.run(scenario())
+    assert conversation.turns[-1] is turn
+    assert store.dropped_writes == 1
+    assert store._queue.empty()
+    assert error.status_code == 503
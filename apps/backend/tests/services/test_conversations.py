@@ -0,0 +1,85 @@
+"""
+Tests for server-side conversations and the token-budgeted context window.
+"""
+
+import asyncio
+
+from app.schemas.chat import ChatRequest, ModelName
+from app.services.conversations import MemoryConversationStore, add_context, message_tokens
+
+
+def _store(**overrides) -> MemoryConversationStore:
+    options = {"max_bytes": 1_000_000, "max_turns": 50, "ttl_seconds": 60}
+    options.update(overrides)
+    return MemoryConversationStore(**options)
+
+
+def test_context_only_includes_the_models_own_replies():
+    store = _store()
+    conversation = asyncio.run(store.create())
+    store.append(conversation, "user", "hi")
+    store.append(conversation, "assistant", "gpt says hi", model="gpt-4")
+    store.append(conversation, "assistant", "deepseek says hi", model="deepseek")
+
+    request = ChatRequest(message="and then?", model=ModelName.DEEPSEEK)
+    add_context(request, conversation, budget=10_000)
+
+    assert [m["content"] for m in request.to_messages()] == [
+        "You are a helpful assistant.", "hi", "deepseek says hi", "and then?"
+    ]
+
+
+def test_context_keeps_the_newest_turns_within_budget():
+    store = _store()
+    conversation = asyncio.run(store.create())
+    for i in range(5):
+        store.append(conversation, "user", f"question {i} " + "x" * 40)
+        store.append(conversation, "assistant", f"answer {i} " + "y" * 40, model="gpt-4")
+
+    per_turn = conversation.turns[-1].tokens
+    history = conversation.context("gpt-4", budget=per_turn * 3)
+
+    # Three turns fit, but the oldest of them is an answer without its question.
+    assert [turn.content.split()[:2] for turn in history] == [["question", "4"], ["answer", "4"]]
+
+
+def test_turn_tokens_are_counted_once_on_append():
+    store = _store()
+    conversation = asyncio.run(store.create())
+    turn = store.append(conversation, "user", "a" * 400)
+    assert turn.tokens == message_tokens("a" * 400) == 104
+    assert turn.seq == 0
+
+
+def test_store_trims_turns_and_keeps_numbering():
+    store = _store(max_turns=3)
+    conversation = asyncio.run(store.create())
+    for i in range(5):
+        store.append(conversation, "user", str(i))
+    assert [(turn.seq, turn.content) for turn in conversation.turns] == [(2, "2"), (3, "3"), (4, "4")]
+    assert conversation.size == sum(turn.size for turn in conversation.turns)
+    assert store.size_bytes == conversation.size
+
+
+def test_store_evicts_least_recently_used_past_byte_budget():
+    store = _store(max_bytes=3_000)
+    first, second = asyncio.run(store.create()), asyncio.run(store.create())
+    store.append(first, "user", "a" * 1_000)
+    store.append(second, "user", "b" * 1_000)
+    asyncio.run(store.get(first.id))
+
+    third = asyncio.run(store.create())
+    store.append(third, "user", "c" * 1_000)
+
+    assert asyncio.run(store.get(second.id)) is None
+    assert asyncio.run(store.get(first.id)) is first
+    assert store.evictions == 1
+    assert store.size_bytes <= 3_000
+
+
+def test_idle_conversations_expire():
+    store = _store(ttl_seconds=0)
+    conversation = asyncio.run(store.create())
+    assert asyncio.run(store.get(conversation.id)) is None
+    assert store.expirations == 1
+    assert store.size_bytes == 0
@@ -0,0 +1,142 @@
+"""
+Tests for hedged requests.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.chat import ChatRequest
+from app.services.hedging import HedgeBudget, HedgedLLMService, HedgePolicy, LatencyTracker
+from app.services.llm_service import STREAM_ERROR_PREFIX, BaseLLMService
+
+
+class DelayedService(BaseLLMService):
+    def __init__(self, deployment, delay, error=None):
+        self.deployment = deployment
+        self.delay = delay
+        # An exception to raise, or an in-band error chunk to yield, once the delay has passed.
+        self.error = error
+        self.cancelled = False
+
+    async def get_completion(self, request):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {"reply": self.deployment, "model": self.deployment, "usage": None, "latency": self.delay}
+
+    async def get_streaming_completion(self, request):
+        try:
+            await asyncio.sleep(self.delay)
+            if isinstance(self.error, Exception):
+                raise self.error
+            if self.error is not None:
+                yield self.error
+                return
+            for word in ("from", self.deployment):
+                yield word
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled = True
+            raise
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker(window=100, min_samples=10)
+    assert tracker.percentile(95) is None
+    for i in range(1, 101):
+        tracker.observe(i / 100)
+    assert tracker.percentile(50) == 0.5
+    assert tracker.percentile(95) == 0.95
+
+
+def test_hedge_budget_caps_extra_load():
+    budget = HedgeBudget(ratio=0.1, burst=1)
+    assert budget.try_acquire() is True
+    assert budget.try_acquire() is False
+    for _ in range(11):
+        budget.record_request()
+    assert budget.try_acquire() is True
+
+
+def test_fast_primary_is_not_hedged():
+    policy = HedgePolicy(default_delay=0.1)
+    service = HedgedLLMService(DelayedService("primary", 0.01), DelayedService("backup", 0.01), policy)
+    result = asyncio.run(service.get_completion(ChatRequest(message="x")))
+    assert result["model"] == "primary"
+    assert policy.hedges_fired == 0
+
+
+def test_slow_primary_loses_to_backup_and_is_cancelled():
+    primary = DelayedService("primary", 1.0)
+    policy = HedgePolicy(default_delay=0.02)
+    service = HedgedLLMService(primary, DelayedService("backup", 0.01), policy)
+
+    result = asyncio.run(service.get_completion(ChatRequest(message="x")))
+
+    assert result["model"] == "backup"
+    assert primary.cancelled is True
+    assert policy.hedges_fired == 1 and policy.hedges_won == 1
+
+
+def test_exhausted_budget_waits_for_primary():
+    policy = HedgePolicy(default_delay=0.01, budget_ratio=0, budget_burst=0)
+    service = HedgedLLMService(DelayedService("primary", 0.05), DelayedService("backup", 0.0), policy)
+    result = asyncio.run(service.get_completion(ChatRequest(message="x")))
+    assert result["model"] == "primary"
+    assert policy.hedges_fired == 0
+
+
+def test_stream_hedges_on_first_token():
+    primary = DelayedService("primary", 1.0)
+    policy = HedgePolicy(default_delay=0.02)
+    service = HedgedLLMService(primary, DelayedService("backup", 0.01), policy)
+
+    async def run():
+        return [chunk async for chunk in service.get_streaming_completion(ChatRequest(message="x"))]
+
+    assert asyncio.run(run()) == ["from", "backup"]
+    assert primary.cancelled is True
+    assert policy.hedges_won == 1
+
+
+def _stream(service):
+    async def run():
+        return [chunk async for chunk in service.get_streaming_completion(ChatRequest(message="x"))]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("error", [
+    HTTPException(status_code=429, detail="slow down"),
+    f"{STREAM_ERROR_PREFIX}Primary service error.]",
+])
+def test_failing_primary_stream_does_not_beat_healthy_backup(error):
+    policy = HedgePolicy(default_delay=0.02)
+    service = HedgedLLMService(DelayedService("primary", 0.05, error), DelayedService("backup", 0.1), policy)
+
+    assert _stream(service) == ["from", "backup"]
+    assert policy.hedges_won == 1
+
+
+def test_stream_error_surfaces_only_when_both_attempts_fail():
+    policy = HedgePolicy(default_delay=0.02)
+    primary = DelayedService("primary", 0.05, HTTPException(status_code=429, detail="slow down"))
+    service = HedgedLLMService(primary, DelayedService("backup", 0.05, f"{STREAM_ERROR_PREFIX}Backup error.]"), policy)
+
+    with pytest.raises(HTTPException) as exc:
+        _stream(service)
+    assert exc.value.status_code == 429
+
+
+def test_losing_attempts_record_their_elapsed_time():
+    policy = HedgePolicy(default_delay=0.02)
+    service = HedgedLLMService(DelayedService("primary", 1.0), DelayedService("backup", 0.01), policy)
+
+    asyncio.run(service.get_completion(ChatRequest(message="x")))
+    _stream(service)
+
+    for kind in ("completion", "ttft"):
+        (elapsed,) = policy.tracker(f"primary:{kind}")._samples
+        assert 0.02 <= elapsed < 1.0
@@ -15,3 +15,108 @@ def test_deepseek_service_instantiation():
     """DeepSeekService should instantiate without error."""
     service = DeepSeekService()
     assert service is not None
+
+
+def test_unopened_service_reports_not_configured():
+    """Calls before the lifespan has opened a client should fail with 503."""
+    import asyncio
+
+    import pytest
+    from fastapi import HTTPException
+
+    from app.schemas.chat import ChatRequest
+
+    service = DeepSeekService()
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.get_completion(ChatRequest(message="hi", model="deepseek")))
+    assert exc.value.status_code == 503
+
+
+def test_open_uses_shared_http_client(monkeypatch):
+    """Opening a configured service should build its SDK client on the given pool."""
+    import asyncio
+
+    from app.core.config import settings
+    from app.services.http_client import create_http_client
+
+    monkeypatch.setattr(settings, "DEEPSEEK_ENDPOINT", "https://example.services.ai.azure.com")
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "test-key")
+    http_client = create_http_client()
+    service = DeepSeekService()
+    service.open(http_client)
+    assert service.client is not None
+    assert service.client._client is http_client
+    asyncio.run(service.aclose())
+    assert service.client is None
+
+
+class _FakeStream:
+    """Minimal stand-in for an SDK chat completion stream."""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.closed = False
+
+    async def __aiter__(self):
+        from types import SimpleNamespace
+
+        for part in self.parts:
+            delta = SimpleNamespace(content=part)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    async def close(self):
+        self.closed = True
+
+
+def test_relay_closes_upstream_stream_when_consumer_leaves():
+    """Abandoning the relay should close the SDK stream and record the tokens saved."""
+    import asyncio
+
+    from app.services.timing import StreamTimer
+
+    service = DeepSeekService()
+
+    async def run():
+        async for _ in service._relay(_FakeStream(["a", "b", "c", "d"]), StreamTimer()):
+            pass
+        stream = _FakeStream(["a", "b", "c", "d"])
+        relay = service._relay(stream, StreamTimer())
+        assert await relay.__anext__() == "a"
+        await relay.aclose()
+        return stream
+
+    stream = asyncio.run(run())
+    assert stream.closed
+    assert service.stream_stats.completed == 1
+    assert service.stream_stats.cancelled == 1
+    assert service.stream_stats.tokens_saved == 3
+
+
+def test_max_tokens_is_sized_from_the_context_window():
+    """The provider should send what the prompt leaves of the window, and reject prompts that leave too little."""
+    import asyncio
+    from types import SimpleNamespace
+
+    import pytest
+    from fastapi import HTTPException
+
+    from app.schemas.chat import ChatRequest
+
+    sent = []
+
+    async def create(**kwargs):
+        sent.append(kwargs)
+        message = SimpleNamespace(content="ok")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    service = AzureOpenAIService()
+    service.context_window = 2_000
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    asyncio.run(service.get_completion(ChatRequest(message="x" * 4_000)))
+    assert 0 < sent[0]["max_tokens"] < 1_000
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.get_completion(ChatRequest(message="x" * 8_000)))
+    assert exc.value.status_code == 400
+    assert len(sent) == 1
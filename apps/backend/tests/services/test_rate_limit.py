@@ -0,0 +1,146 @@
+"""
+Tests for the client-side TPM/RPM rate limiter.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.chat import ChatRequest
+from app.services.llm_service import BaseLLMService
+from app.services.rate_limit import (
+    DeploymentRateLimiter,
+    RateLimitedLLMService,
+    TokenBucket,
+)
+from app.services.tokenizer import get_tokenizer
+
+
+class UsageService(BaseLLMService):
+    deployment = "usage"
+    max_tokens = 100
+
+    def __init__(self, total_tokens=30, error=None):
+        self.total_tokens = total_tokens
+        self.error = error
+
+    async def get_completion(self, request):
+        if self.error:
+            raise self.error
+        return {"reply": "ok", "model": self.deployment, "usage": {"total_tokens": self.total_tokens}, "latency": 0}
+
+    async def get_streaming_completion(self, request):
+        for chunk in ("abcd", "efgh"):
+            yield chunk
+
+
+def test_token_bucket_reports_wait_for_refill():
+    bucket = TokenBucket(per_minute=60)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.05)
+
+
+def test_completion_reservation_is_reconciled_against_usage():
+    limiter = DeploymentRateLimiter("test", tpm=10_000)
+    service = RateLimitedLLMService(UsageService(total_tokens=30), limiter, expected_completion_tokens=50)
+
+    asyncio.run(service.get_completion(ChatRequest(message="hello")))
+
+    # The prompt plus 50 expected completion tokens are reserved, then settled at the 30 actually used.
+    assert limiter.tokens.level == pytest.approx(10_000 - 30, abs=1)
+
+
+def test_requests_over_quota_are_shed_locally():
+    limiter = DeploymentRateLimiter("test", rpm=1, max_wait=0.1)
+    service = RateLimitedLLMService(UsageService(), limiter, expected_completion_tokens=50)
+
+    async def run():
+        await service.get_completion(ChatRequest(message="one"))
+        await service.get_completion(ChatRequest(message="two"))
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(run())
+    assert exc.value.status_code == 429
+    assert "Retry-After" in exc.value.headers
+    assert limiter.shed == 1
+
+
+def test_short_waits_are_queued_not_shed():
+    limiter = DeploymentRateLimiter("test", rpm=600, max_wait=1.0)
+    limiter.requests.take(limiter.requests.level)
+    service = RateLimitedLLMService(UsageService(), limiter, expected_completion_tokens=50)
+
+    result = asyncio.run(service.get_completion(ChatRequest(message="queued")))
+    assert result["reply"] == "ok"
+    assert limiter.shed == 0
+
+
+def test_over_context_requests_are_rejected_before_reserving():
+    limiter = DeploymentRateLimiter("test", tpm=10_000)
+    inner = UsageService()
+    inner.context_window = 1_000
+    service = RateLimitedLLMService(inner, limiter, expected_completion_tokens=50)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.get_completion(ChatRequest(message="x" * 4_000)))
+    assert exc.value.status_code == 400
+    assert limiter.tokens.level == pytest.approx(10_000, abs=1)
+
+
+def test_reservation_uses_what_the_context_window_leaves():
+    limiter = DeploymentRateLimiter("test", tpm=10_000)
+    inner = UsageService()
+    inner.max_tokens = 5_000
+    inner.context_window = 1_000
+    service = RateLimitedLLMService(inner, limiter, expected_completion_tokens=2_000)
+
+    reservation = asyncio.run(service._reserve(ChatRequest(message="hello")))
+    assert reservation.tokens == 1_000
+
+
+def test_concurrent_calls_reserve_expected_completion_not_the_cap():
+    """A 32k completion cap must not turn a 50k TPM quota into one call at a time."""
+    limiter = DeploymentRateLimiter("deepseek", tpm=50_000, max_wait=5)
+    inner = UsageService()
+    inner.max_tokens = 32_768
+    inner.context_window = 128_000
+    service = RateLimitedLLMService(inner, limiter, expected_completion_tokens=1_024)
+
+    async def run():
+        return await asyncio.gather(*(service.get_completion(ChatRequest(message="hi")) for _ in range(5)))
+
+    assert len(asyncio.run(run())) == 5
+    assert limiter.admitted == 5 and limiter.shed == 0
+
+
+def test_overrun_beyond_the_reservation_is_charged():
+    limiter = DeploymentRateLimiter("test", tpm=10_000)
+    service = RateLimitedLLMService(UsageService(total_tokens=3_000), limiter, expected_completion_tokens=50)
+
+    asyncio.run(service.get_completion(ChatRequest(message="hello")))
+
+    assert limiter.tokens.level == pytest.approx(10_000 - 3_000, abs=1)
+
+
+def test_upstream_429_drains_the_bucket():
+    limiter = DeploymentRateLimiter("test", tpm=10_000)
+    service = RateLimitedLLMService(
+        UsageService(error=HTTPException(status_code=429, detail="slow down")), limiter, expected_completion_tokens=50
+    )
+    with pytest.raises(HTTPException):
+        asyncio.run(service.get_completion(ChatRequest(message="x")))
+    assert limiter.tokens.level <= 0
+    assert limiter.upstream_429s == 1
+
+
+def test_stream_reconciles_estimated_usage():
+    limiter = DeploymentRateLimiter("test", tpm=10_000)
+    service = RateLimitedLLMService(UsageService(), limiter, expected_completion_tokens=50)
+    request = ChatRequest(message="hello")
+
+    async def run():
+        return [chunk async for chunk in service.get_streaming_completion(request)]
+
+    assert asyncio.run(run()) == ["abcd", "efgh"]
+    assert limiter.tokens.level == pytest.approx(10_000 - get_tokenizer().prompt_tokens(request) - 2, abs=1)
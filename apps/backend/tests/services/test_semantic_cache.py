@@ -0,0 +1,173 @@
+"""
+Tests for the semantic response cache.
+"""
+
+import asyncio
+
+from app.schemas.chat import ChatRequest
+from app.services.cache import CachedLLMService, ResponseCache
+from app.services.llm_service import BaseLLMService
+from app.services.semantic_cache import HashedNgramEmbedder, SemanticCache, SemanticCachedLLMService, normalize
+
+
+class FakeService(BaseLLMService):
+    deployment = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def get_completion(self, request):
+        self.calls += 1
+        return {"reply": f"echo: {request.message}", "model": self.deployment, "usage": None, "latency": 1.5}
+
+    async def get_streaming_completion(self, request):
+        self.calls += 1
+        yield f"echo: {request.message}"
+
+
+def _cache(**overrides) -> SemanticCache:
+    options = {"max_entries": 100, "ttl_seconds": 60, "threshold": 0.9}
+    options.update(overrides)
+    return SemanticCache(**options)
+
+
+def test_normalize_folds_case_punctuation_and_contractions():
+    assert normalize("What's FastAPI?") == normalize("what is fastapi") == "what is fastapi"
+    assert normalize("I can't  STOP!") == "i can not stop"
+
+
+def test_embeddings_are_unit_length_and_deterministic():
+    embedder = HashedNgramEmbedder(dim=64)
+    vector = embedder.embed("hello world")
+    assert vector.shape == (64,)
+    assert abs(float(vector @ vector) - 1.0) < 1e-5
+    assert (embedder.embed("hello world") == vector).all()
+
+
+def test_paraphrase_hits_and_different_question_misses():
+    service = SemanticCachedLLMService(FakeService(), _cache())
+
+    async def run():
+        first = await service.get_completion(ChatRequest(message="What's FastAPI?"))
+        paraphrase = await service.get_completion(ChatRequest(message="what is fastapi"))
+        other = await service.get_completion(ChatRequest(message="What is the capital of France?"))
+        return first, paraphrase, other
+
+    first, paraphrase, other = asyncio.run(run())
+    assert paraphrase["cached"] is True
+    assert paraphrase["reply"] == first["reply"]
+    assert other["reply"] == "echo: What is the capital of France?"
+    assert service.inner.calls == 2
+
+
+def test_semantic_hit_is_reported_through_the_exact_cache():
+    inner = FakeService()
+    semantic = SemanticCachedLLMService(inner, _cache())
+    exact = ResponseCache(max_entries=10, max_bytes=10_000, ttl_seconds=60)
+    service = CachedLLMService(semantic, exact)
+
+    async def run():
+        first = await service.get_completion(ChatRequest(message="what's fastapi?"))
+        second = await service.get_completion(ChatRequest(message="what is fastapi"))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["reply"] == first["reply"]
+    assert inner.calls == 1
+    # The paraphrase was served by the semantic layer, not stored again as an exact entry.
+    assert len(exact) == 1
+
+
+def test_completed_stream_serves_later_paraphrases():
+    service = SemanticCachedLLMService(FakeService(), _cache())
+
+    async def run():
+        return [chunk async for chunk in service.get_streaming_completion(ChatRequest(message="What's FastAPI?"))]
+
+    assert asyncio.run(run()) == ["echo: What's FastAPI?"]
+    hit = service.get_cached_completion(ChatRequest(message="what is fastapi"))
+    assert hit["reply"] == "echo: What's FastAPI?" and hit["cached"] is True
+    assert service.get_cached_completion(ChatRequest(message="What is Flask?")) is None
+
+
+def test_namespaces_separate_models_system_prompts_and_numbers():
+    cache = _cache()
+    cache.store(*cache.key("gpt", ChatRequest(message="What is 2+2?")), {"reply": "4"})
+
+    assert cache.lookup(*cache.key("gpt", ChatRequest(message="what is 2 + 2"))) is not None
+    assert cache.lookup(*cache.key("gpt", ChatRequest(message="What is 2+3?"))) is None
+    assert cache.lookup(*cache.key("deepseek", ChatRequest(message="What is 2+2?"))) is None
+    assert cache.lookup(*cache.key("gpt", ChatRequest(message="What is 2+2?", system_prompt="Be terse."))) is None
+
+
+def test_same_template_about_another_subject_misses():
+    cache = _cache()
+    cache.store(*cache.key("gpt", ChatRequest(message="How do I sort a list of tuples in Python?")), {"reply": "py"})
+
+    assert cache.lookup(*cache.key("gpt", ChatRequest(message="how do i sort lists of tuples in python"))) is not None
+    assert cache.lookup(*cache.key("gpt", ChatRequest(message="How do I sort a list of tuples in Rust?"))) is None
+
+
+def test_questions_differing_in_question_word_or_modal_miss():
+    cache = _cache()
+    for cached, other in (
+        ("why is the sky blue", "when is the sky blue"),
+        ("how do I install python on windows", "should I install python on windows"),
+        ("could I run postgres on a raspberry pi", "would I run postgres on a raspberry pi"),
+    ):
+        cache.store(*cache.key("gpt", ChatRequest(message=cached)), {"reply": cached})
+        assert cache.lookup(*cache.key("gpt", ChatRequest(message=other))) is None, other
+
+
+def test_long_prompts_differing_in_direction_stance_negation_or_order_miss():
+    cache = _cache()
+    for cached, other in (
+        (
+            "What is the safest way to migrate a production database from MySQL to PostgreSQL?",
+            "What is the safest way to migrate a production database from PostgreSQL to MySQL?",
+        ),
+        (
+            "Write a python script to convert a large CSV file to JSON",
+            "Write a python script to convert a large JSON file to CSV",
+        ),
+        (
+            "Summarize the strongest economic arguments for raising interest rates this year",
+            "Summarize the strongest economic arguments against raising interest rates this year",
+        ),
+        (
+            "Is it safe to take ibuprofen together with paracetamol for a headache?",
+            "Is it not safe to take ibuprofen together with paracetamol for a headache?",
+        ),
+        (
+            "Explain how TLS certificates are verified between the client and server",
+            "Explain how TLS certificates are verified between the server and client",
+        ),
+    ):
+        cache.store(*cache.key("gpt", ChatRequest(message=cached)), {"reply": cached})
+        assert cache.lookup(*cache.key("gpt", ChatRequest(message=other))) is None, other
+    paraphrase = "write a Python script to convert large CSV files to JSON"
+    assert cache.lookup(*cache.key("gpt", ChatRequest(message=paraphrase))) is not None
+
+
+def test_capacity_evicts_least_recently_used_and_ttl_expires():
+    cache = _cache(max_entries=2)
+    keys = [cache.key("gpt", ChatRequest(message=text)) for text in ("alpha question", "beta question", "gamma")]
+    cache.store(*keys[0], {"reply": "a"})
+    cache.store(*keys[1], {"reply": "b"})
+    cache.lookup(*keys[0])
+    cache.store(*keys[2], {"reply": "c"})
+    assert cache.lookup(*keys[1]) is None
+    assert cache.lookup(*keys[0])[0] == {"reply": "a"}
+    assert len(cache) == 2 and cache.evictions == 1
+
+    expiring = _cache(ttl_seconds=0)
+    expiring.store(*keys[0], {"reply": "a"})
+    assert expiring.lookup(*keys[0]) is None
+    assert len(expiring) == 0
+
+
+def test_long_messages_are_not_matched_on_meaning():
+    cache = _cache(max_chars=10)
+    assert cache.key("gpt", ChatRequest(message="x" * 11)) is None
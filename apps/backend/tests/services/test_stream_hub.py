@@ -0,0 +1,100 @@
+"""
+Tests for the streaming fan-out hub.
+"""
+
+import asyncio
+
+from app.schemas.chat import ChatRequest
+from app.services.llm_service import BaseLLMService
+from app.services.stream_hub import FanOutLLMService, StreamHub
+
+CHUNKS = [f"tok{i} " for i in range(20)]
+
+
+class TickingService(BaseLLMService):
+    deployment = "ticking"
+
+    def __init__(self, delay=0.001):
+        self.delay = delay
+        self.streams = 0
+        self.closed = False
+
+    async def get_streaming_completion(self, request):
+        self.streams += 1
+        try:
+            for chunk in CHUNKS:
+                await asyncio.sleep(self.delay)
+                yield chunk
+        finally:
+            self.closed = True
+
+
+async def _collect(gen, pause=0.0):
+    out = []
+    async for chunk in gen:
+        out.append(chunk)
+        if pause:
+            await asyncio.sleep(pause)
+    return out
+
+
+def test_concurrent_subscribers_share_one_upstream_stream():
+    inner = TickingService()
+    service = FanOutLLMService(inner, StreamHub())
+
+    async def run():
+        request = ChatRequest(message="same")
+        return await asyncio.gather(*(_collect(service.get_streaming_completion(request)) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert inner.streams == 1
+    assert all(r == CHUNKS for r in results)
+
+
+def test_late_subscriber_replays_buffered_chunks():
+    inner = TickingService(delay=0.002)
+    service = FanOutLLMService(inner, StreamHub())
+
+    async def run():
+        request = ChatRequest(message="same")
+        first = asyncio.ensure_future(_collect(service.get_streaming_completion(request)))
+        await asyncio.sleep(0.015)
+        second = await _collect(service.get_streaming_completion(request))
+        return await first, second
+
+    first, second = asyncio.run(run())
+    assert inner.streams == 1
+    assert first == CHUNKS and second == CHUNKS
+
+
+def test_slow_subscriber_does_not_stall_others():
+    inner = TickingService(delay=0.001)
+    hub = StreamHub(queue_size=1)
+    service = FanOutLLMService(inner, hub)
+
+    async def run():
+        request = ChatRequest(message="same")
+        slow = asyncio.ensure_future(_collect(service.get_streaming_completion(request), pause=0.01))
+        fast = await _collect(service.get_streaming_completion(request))
+        fast_done_while_slow_running = not slow.done()
+        return fast, await slow, fast_done_while_slow_running
+
+    fast, slow, overlapped = asyncio.run(run())
+    assert fast == CHUNKS and slow == CHUNKS
+    assert overlapped
+
+
+def test_upstream_cancelled_when_last_subscriber_leaves():
+    inner = TickingService(delay=0.01)
+    hub = StreamHub()
+    service = FanOutLLMService(inner, hub)
+
+    async def run():
+        gen = service.get_streaming_completion(ChatRequest(message="x"))
+        await gen.__anext__()
+        await gen.aclose()
+        await asyncio.sleep(0.02)
+
+    asyncio.run(run())
+    assert inner.closed is True
+    assert len(hub) == 0
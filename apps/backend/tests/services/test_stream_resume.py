@@ -0,0 +1,143 @@
+"""
+Tests for resumable SSE streams.
+"""
+
+import asyncio
+
+from app.services.stream_resume import ResumableStreams
+
+
+def _store(**overrides):
+    options = dict(max_streams=8, max_bytes=1 << 20, max_stream_bytes=1 << 16, ttl_seconds=60, idle_timeout=0.05)
+    options.update(overrides)
+    return ResumableStreams(**options)
+
+
+async def _frames(count, delay=0.0):
+    for i in range(count):
+        await asyncio.sleep(delay)
+        yield f"data: {i}\n\n".encode()
+
+
+def test_frames_are_numbered_and_replayed_after_last_event_id():
+    store = _store()
+
+    async def run():
+        stream = store.start(_frames(4))
+        first = [frame async for frame in store.attach(stream)]
+        found = store.find(f"{stream.id}:2")
+        assert found == (stream, 2)
+        replay = [frame async for frame in store.attach(*found)]
+        return stream, first, replay
+
+    stream, first, replay = asyncio.run(run())
+    assert first[0] == f"id: {stream.id}:1\ndata: 0\n\n".encode()
+    assert replay == first[2:]
+    assert store.resumed == 1
+
+
+def test_reattaching_follows_live_tail():
+    store = _store()
+
+    async def run():
+        stream = store.start(_frames(6, delay=0.01))
+        first = store.attach(stream)
+        seen = [await first.__anext__(), await first.__anext__()]
+        await first.aclose()
+        stream, after = store.find(f"{stream.id}:2")
+        rest = [frame async for frame in store.attach(stream, after)]
+        return seen + rest
+
+    frames = asyncio.run(run())
+    assert [frame.split(b"\n")[1] for frame in frames] == [f"data: {i}".encode() for i in range(6)]
+
+
+def test_generation_is_cancelled_when_nobody_reattaches():
+    store = _store()
+    stopped = []
+
+    async def endless():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield b"data: tick\n\n"
+        finally:
+            stopped.append(True)
+
+    async def run():
+        stream = store.start(endless())
+        subscription = store.attach(stream)
+        await subscription.__anext__()
+        await subscription.aclose()
+        await asyncio.sleep(0.2)
+        return stream
+
+    stream = asyncio.run(run())
+    assert stopped == [True]
+    assert store.abandoned == 1
+    assert store.find(f"{stream.id}:1") is None
+
+
+def test_unknown_or_trimmed_ids_do_not_resume():
+    store = _store(max_stream_bytes=200)
+
+    async def run():
+        stream = store.start(_frames(20))
+        [frame async for frame in store.attach(stream)]
+        return stream
+
+    stream = asyncio.run(run())
+    assert stream.first_seq > 1
+    assert store.find(f"{stream.id}:1") is None
+    assert store.find("missing:3") is None
+    assert store.find(f"{stream.id}:{stream.next_seq - 1}") is not None
+    assert store.resume_misses == 2
+
+
+def test_finished_streams_are_evicted_to_stay_within_budget():
+    store = _store(max_streams=2)
+
+    async def run():
+        streams = []
+        for _ in range(3):
+            stream = store.start(_frames(1))
+            [frame async for frame in store.attach(stream)]
+            streams.append(stream)
+        return streams
+
+    streams = asyncio.run(run())
+    assert len(store) == 2
+    assert store.find(f"{streams[0].id}:1") is None
+    assert store.size_bytes == sum(s.size for s in streams[1:])
+
+
+def test_budget_holds_with_many_concurrent_live_streams():
+    store = _store(max_streams=10, max_bytes=2000)
+    peaks = {"streams": 0, "bytes": 0}
+
+    async def watch():
+        while True:
+            peaks["streams"] = max(peaks["streams"], len(store))
+            peaks["bytes"] = max(peaks["bytes"], store.size_bytes)
+            await asyncio.sleep(0)
+
+    async def run():
+        watcher = asyncio.ensure_future(watch())
+        streams = [store.start(_frames(50, delay=0.001)) for _ in range(50)]
+
+        async def read(stream):
+            return [frame async for frame in store.attach(stream)]
+
+        received = await asyncio.gather(*(read(stream) for stream in streams))
+        await asyncio.sleep(0)
+        watcher.cancel()
+        return streams, received
+
+    streams, received = asyncio.run(run())
+    assert peaks["streams"] <= 10
+    assert peaks["bytes"] <= 2000
+    assert len(store) <= 10 and store.size_bytes <= 2000
+    # Trimming shrinks resume windows but never drops frames a live client has yet to read.
+    assert all(len(frames) == 50 for frames in received)
+    assert store.find(f"{streams[0].id}:1") is None
+    assert any(stream.first_seq > 1 for stream in streams[-10:])
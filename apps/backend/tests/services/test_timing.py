@@ -0,0 +1,53 @@
+"""
+Tests for completion timing instrumentation.
+"""
+
+import time
+
+from app.services.timing import StreamTimer, TimingRegistry, completion_timings, percentile
+
+
+def test_percentile_uses_nearest_rank():
+    ordered = [1.0, 2.0, 3.0, 4.0]
+    assert percentile(ordered, 50) == 2.0
+    assert percentile(ordered, 95) == 4.0
+    assert percentile(ordered, 0) == 1.0
+
+
+def test_stream_timer_separates_connect_ttft_and_decode():
+    timer = StreamTimer()
+    time.sleep(0.02)
+    timer.connect()
+    time.sleep(0.02)
+    for _ in range(5):
+        timer.token()
+        time.sleep(0.01)
+
+    summary = timer.summary()
+    assert 0.015 <= summary["connect"] < summary["ttft"] <= summary["total"]
+    assert summary["tokens"] == 5
+    assert 0.008 <= summary["gap_p50"] <= summary["gap_p95"]
+    assert summary["tokens_per_second"] > 0
+
+
+def test_stream_timer_without_tokens_reports_none():
+    summary = StreamTimer().summary()
+    assert summary["ttft"] is None
+    assert summary["tokens"] == 0
+    assert summary["tokens_per_second"] is None
+    assert summary["gap_p95"] is None
+
+
+def test_registry_aggregates_per_model_and_stage():
+    registry = TimingRegistry(window=10)
+    for total in (1.0, 2.0, 3.0):
+        registry.record("gpt-4", "upstream", completion_timings(total, 30))
+    registry.record("gpt-4", "client", {"ttft": 0.5, "total": 1.0, "tokens": 4})
+
+    snapshot = registry.snapshot()
+    upstream = snapshot["gpt-4"]["upstream"]
+    assert upstream["count"] == 3
+    assert upstream["tokens"] == 90
+    assert upstream["ttft"] == {"p50": 2.0, "p95": 3.0}
+    assert "connect" not in upstream
+    assert snapshot["gpt-4"]["client"]["ttft"] == {"p50": 0.5, "p95": 0.5}
@@ -0,0 +1,70 @@
+"""
+Tests for prompt token counting and context-window sizing.
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.chat import ChatRequest
+from app.services.tokenizer import (
+    MIN_COMPLETION_TOKENS,
+    ApproximateCounter,
+    Tokenizer,
+    get_tokenizer,
+    load_counter,
+    size_request,
+)
+
+
+class CountingCounter(ApproximateCounter):
+    def __init__(self):
+        self.calls = []
+
+    def count(self, text):
+        self.calls.append(text)
+        return super().count(text)
+
+
+def test_prompt_tokens_grow_with_message_and_system_prompt():
+    tokenizer = get_tokenizer()
+    short = tokenizer.prompt_tokens(ChatRequest(message="hi", system_prompt=""))
+    longer = tokenizer.prompt_tokens(ChatRequest(message="hi " * 100, system_prompt=""))
+    with_system = tokenizer.prompt_tokens(ChatRequest(message="hi", system_prompt="x" * 400))
+    assert short < longer
+    assert with_system - short == 100
+
+
+def test_system_prompt_counts_are_memoized():
+    counter = CountingCounter()
+    tokenizer = Tokenizer(counter)
+    for message in ("one", "two", "three"):
+        tokenizer.prompt_tokens(ChatRequest(message=message, system_prompt="Be terse."))
+    assert counter.calls.count("Be terse.") == 1
+
+
+def test_conversation_history_uses_stored_counts():
+    request = ChatRequest(message="hi", system_prompt="")
+    without = get_tokenizer().prompt_tokens(request)
+    request._history_tokens = 500
+    assert get_tokenizer().prompt_tokens(request) == without + 500
+
+
+def test_missing_vocabulary_falls_back_to_estimate(tmp_path):
+    assert isinstance(load_counter(None), ApproximateCounter)
+    assert isinstance(load_counter(str(tmp_path / "missing.tiktoken")), ApproximateCounter)
+
+
+def test_max_tokens_is_sized_to_the_remaining_window():
+    request = ChatRequest(message="x" * 4_000, system_prompt="")
+    prompt_tokens, max_tokens = size_request(request, None, context_window=2_000, max_tokens=4_096)
+    assert max_tokens == 2_000 - prompt_tokens
+    assert size_request(request, None, context_window=None, max_tokens=4_096) == (prompt_tokens, 4_096)
+    assert size_request(request, None, context_window=100_000, max_tokens=None)[1] == 100_000 - prompt_tokens
+
+
+def test_over_context_prompt_is_rejected():
+    request = ChatRequest(message="x" * 4_000, system_prompt="")
+    prompt_tokens = get_tokenizer().prompt_tokens(request)
+    with pytest.raises(HTTPException) as exc:
+        size_request(request, None, context_window=prompt_tokens + MIN_COMPLETION_TOKENS - 1, max_tokens=None)
+    assert exc.value.status_code == 400